@@ -0,0 +1,82 @@
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from ledger import Ledger, REPORT_DIMENSIONS
+
+# ==========================================
+# 账本基准：批量写入吞吐 + 预聚合报表 vs 直接扫明细
+# ==========================================
+CATEGORIES = ["餐饮", "交通", "购物", "娱乐", "居家", "医疗", "学习", "其他"]
+SENTIMENTS = ["开心", "后悔", "心疼", "期待", "平淡"]
+YEARS = 5
+
+def fake_rows(n, seed):
+    """生成 n 条覆盖最近几年的随机账单：(item, created_at)"""
+    rng = random.Random(seed)
+    now = time.time()
+    span = YEARS * 365 * 86400
+    for i in range(n):
+        yield {
+            "amount": round(rng.lognormvariate(3.5, 1.0), 2),
+            "category": rng.choice(CATEGORIES),
+            "product": f"商品{i % 1000}",
+            "sentiment": rng.choice(SENTIMENTS),
+            "ai_comment": "",
+        }, now - rng.random() * span
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+def main():
+    parser = argparse.ArgumentParser(description="账本写入与报表查询基准")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="明细条数")
+    parser.add_argument("--batch", type=int, default=5000, help="每个写入事务的条数")
+    parser.add_argument("--repeats", type=int, default=5, help="每个查询重复次数，取中位数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_ledger_")
+    try:
+        ledger = Ledger(os.path.join(workdir, "ledger.sqlite3"), write_batch=args.batch)
+        start = time.perf_counter()
+        for item, created_at in fake_rows(args.rows, args.seed):
+            ledger.append(item, created_at=created_at)
+        ledger.flush()
+        write_s = time.perf_counter() - start
+
+        months = [row[0] for row in ledger.report(by="month")]
+        month = months[len(months) // 2]
+        queries = [(f"按{by}", {"by": by}) for by in REPORT_DIMENSIONS]
+        queries.append((f"{month} 按category", {"by": "category", "month": month}))
+
+        rows = []
+        for label, kwargs in queries:
+            fast_ms, fast = timed(lambda: ledger.report(**kwargs), args.repeats)
+            scan_ms, scan = timed(lambda: ledger.scan_report(**kwargs), args.repeats)
+            # 预聚合结果必须和扫明细算出来的一致 (金额允许浮点误差)
+            same = sorted((k, round(t, 2), c) for k, t, c in fast) == sorted((k, round(t, 2), c) for k, t, c in scan)
+            rows.append((label, fast_ms, scan_ms, same))
+        ledger.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"📒 {args.rows} 条明细，每批 {args.batch} 条")
+    print(f"   写入 {write_s:.1f}s ({args.rows / write_s:,.0f} 条/秒，含增量维护预聚合)")
+    print("=" * 64)
+    print(f"{'报表':<22}{'预聚合(ms)':>12}{'扫明细(ms)':>12}{'加速':>8}{'一致':>6}")
+    for label, fast_ms, scan_ms, same in rows:
+        print(f"{label:<22}{fast_ms:>12.3f}{scan_ms:>12.1f}{scan_ms / fast_ms:>7.0f}x{'✅' if same else '❌':>6}")
+    print("=" * 64)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+from openai import AsyncOpenAI
+
+import lesson_04_structure as bookkeeping
+
+# ==========================================
+# 打包 vs 逐条：同一批账单，每 1000 条省下多少 token 和时间
+# ==========================================
+# 离线跑的话先启动 tools/mock_llm_server.py，并把 DEEP_SEEK_API_URL 指向它。
+# 模拟服务加上 --malformed-rate 0.5 (或 --error-rate) 可以顺带检查打包失败后的单条重试：
+# 每条账单都必须按顺序恰好产出一条记录 (成功或失败)，否则以非零状态退出。
+
+SAMPLE_BILLS = [
+    "打车去公司花了35块，有点心疼",
+    "午饭吃了麻辣烫 28 元，好开心",
+    "买了本《三体》59元，期待很久了",
+    "周末看电影 80，还不错",
+    "给猫买了猫粮 199，居家必备",
+    "感冒了去药店买药 46.5",
+    "报了个 Python 网课 299，希望能坚持",
+    "冲动消费买了双球鞋 899，有点后悔",
+]
+
+async def run_once(entries, pack, concurrency, rpm):
+    async_client = AsyncOpenAI(api_key=bookkeeping.api_key, base_url=os.getenv("DEEP_SEEK_API_URL"))
+    limiter = bookkeeping.AsyncRateLimiter(rpm)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    usage = bookkeeping.new_usage()
+    ok = failed = fallback = 0
+    indexes = []
+    start = time.perf_counter()
+    # 关掉本地规则，每条都走大模型，只比较打包本身的效果
+    async for record in bookkeeping.extract_all(entries, pack, async_client, limiter, semaphore, usage,
+                                                use_local=False):
+        indexes.append(record["index"])
+        ok += "item" in record
+        failed += "item" not in record
+        fallback += bool(record.get("fallback"))
+    elapsed = time.perf_counter() - start
+    await async_client.close()
+    return {"usage": usage, "elapsed": elapsed, "ok": ok, "failed": failed, "fallback": fallback,
+            "complete": indexes == list(range(len(entries)))}
+
+def per_thousand(result, count):
+    usage = result["usage"]
+    scale = 1000 / count
+    return {
+        "tokens": (usage["prompt_tokens"] + usage["completion_tokens"]) * scale,
+        "uncached_prompt": (usage["prompt_tokens"] - usage["cache_hit_tokens"]) * scale,
+        "requests": usage["requests"] * scale,
+        "seconds": result["elapsed"] * scale,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="对比打包请求与逐条请求的 token 和耗时")
+    parser.add_argument("input", nargs="?", help="账单文件 (CSV / JSONL / 文本)，不填则用内置样例")
+    parser.add_argument("--count", type=int, default=200, help="使用内置样例时的账单条数")
+    parser.add_argument("--pack", type=int, default=20, help="打包模式每个请求的条数")
+    parser.add_argument("--concurrency", type=int, default=bookkeeping.BATCH_CONCURRENCY)
+    parser.add_argument("--rpm", type=int, default=bookkeeping.BATCH_RPM)
+    args = parser.parse_args()
+
+    if args.input:
+        entries = list(bookkeeping.read_entries(args.input))
+    else:
+        entries = [SAMPLE_BILLS[i % len(SAMPLE_BILLS)] for i in range(args.count)]
+
+    rows = []
+    for pack in (1, args.pack):
+        print(f"⏳ 每个请求 {pack} 条，共 {len(entries)} 条...", file=sys.stderr)
+        result = asyncio.run(run_once(entries, pack, args.concurrency, args.rpm))
+        rows.append((pack, result, per_thousand(result, len(entries))))
+
+    print("=" * 78)
+    print(f"{'每请求条数':<10}{'成功':>8}{'失败':>6}{'单条重试':>10}{'请求/千条':>12}{'tokens/千条':>14}{'未缓存prompt/千条':>18}{'秒/千条':>10}")
+    for pack, result, k in rows:
+        print(f"{pack:<10}{result['ok']:>8}{result['failed']:>6}{result['fallback']:>10}{k['requests']:>12.0f}"
+              f"{k['tokens']:>14.0f}{k['uncached_prompt']:>18.0f}{k['seconds']:>10.1f}")
+    base, packed = rows[0][2], rows[1][2]
+    print("=" * 78)
+    print(f"💰 每 1000 条账单：省下 {base['tokens'] - packed['tokens']:.0f} tokens "
+          f"({1 - packed['tokens'] / base['tokens']:.0%})，省下 {base['seconds'] - packed['seconds']:.1f}s "
+          f"({1 - packed['seconds'] / base['seconds']:.0%})" if base["tokens"] and base["seconds"] else "")
+
+    broken = [pack for pack, result, _ in rows if not result["complete"]]
+    if broken:
+        print(f"❌ 每请求 {broken} 条时有账单没有产出记录或顺序错乱", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+# ==========================================
+# 账本配置
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEDGER_PATH = os.path.join(BASE_DIR, "ledger.sqlite3")
+WRITE_BATCH = 500          # 攒够这么多条才落一次盘 (一个事务)
+
+# 预聚合维度：表名 -> 分组列
+AGGREGATES = {
+    "agg_category": ("category",),
+    "agg_month": ("month",),
+    "agg_sentiment": ("sentiment",),
+    "agg_month_category": ("month", "category"),
+}
+REPORT_DIMENSIONS = ("category", "month", "sentiment")
+
+def month_of(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m")
+
+# ==========================================
+# 只追加的本地账本 (SQLite)
+# ==========================================
+class Ledger:
+    """
+    明细只追加 (UPDATE/DELETE 会被触发器拒绝)，写入按批次放在一个事务里。
+    每批写入的同时，在同一个事务里把分类/月份/情绪的合计增量地加到预聚合表，
+    所以报表只读几十行的小表，和明细有多少行无关。
+    """
+
+    def __init__(self, path=LEDGER_PATH, write_batch=WRITE_BATCH):
+        self.write_batch = write_batch
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                id          INTEGER PRIMARY KEY,
+                created_at  REAL NOT NULL,
+                month       TEXT NOT NULL,
+                amount      REAL NOT NULL,
+                category    TEXT NOT NULL,
+                product     TEXT NOT NULL,
+                sentiment   TEXT NOT NULL,
+                ai_comment  TEXT,
+                input       TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_month ON entries(month);
+            CREATE INDEX IF NOT EXISTS idx_entries_category_month ON entries(category, month);
+            CREATE TRIGGER IF NOT EXISTS entries_no_update BEFORE UPDATE ON entries
+                BEGIN SELECT RAISE(ABORT, 'ledger is append-only'); END;
+            CREATE TRIGGER IF NOT EXISTS entries_no_delete BEFORE DELETE ON entries
+                BEGIN SELECT RAISE(ABORT, 'ledger is append-only'); END;
+        """)
+        for table, keys in AGGREGATES.items():
+            columns = ", ".join(f"{k} TEXT NOT NULL" for k in keys)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ({columns}, total REAL NOT NULL, count INTEGER NOT NULL, "
+                f"PRIMARY KEY ({', '.join(keys)})) WITHOUT ROWID"
+            )
+        self._conn.commit()
+
+    # ---------- 写入 ----------
+    def append(self, item, created_at=None, text=None):
+        """item 可以是 AccountItem 或同字段的字典；满一批自动落盘"""
+        if hasattr(item, "model_dump"):
+            item = item.model_dump()
+        created_at = time.time() if created_at is None else created_at
+        row = (created_at, month_of(created_at), float(item["amount"]), item["category"], item["product"],
+               item["sentiment"], item.get("ai_comment"), text)
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.write_batch:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        rows = self._buffer
+
+        # 先在内存里把这一批按各个维度合计好，每个分组只做一次 UPSERT
+        deltas = {table: {} for table in AGGREGATES}
+        for _, month, amount, category, _, sentiment, _, _ in rows:
+            values = {"month": month, "category": category, "sentiment": sentiment}
+            for table, keys in AGGREGATES.items():
+                key = tuple(values[k] for k in keys)
+                total, count = deltas[table].get(key, (0.0, 0))
+                deltas[table][key] = (total + amount, count + 1)
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO entries (created_at, month, amount, category, product, sentiment, ai_comment, input) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            for table, keys in AGGREGATES.items():
+                placeholders = ", ".join("?" * (len(keys) + 2))
+                self._conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(keys)}, total, count) VALUES ({placeholders}) "
+                    f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+                    f"total = total + excluded.total, count = count + excluded.count",
+                    [key + delta for key, delta in deltas[table].items()],
+                )
+        # 事务提交成功后才清空缓冲；失败时整批回滚、留在缓冲里，下次 flush 重试，不会丢账
+        self._buffer = []
+
+    def rebuild_aggregates(self):
+        """预聚合表万一和明细对不上 (例如手工改过库)，从明细整体重算"""
+        self.flush()
+        with self._conn:
+            for table, keys in AGGREGATES.items():
+                group = ", ".join(keys)
+                self._conn.execute(f"DELETE FROM {table}")
+                self._conn.execute(
+                    f"INSERT INTO {table} ({group}, total, count) "
+                    f"SELECT {group}, SUM(amount), COUNT(*) FROM entries GROUP BY {group}"
+                )
+
+    # ---------- 查询 ----------
+    def report(self, by="category", month=None):
+        """返回 [(分组值, 合计金额, 笔数), ...]，按金额从大到小；month 只对分类报表生效"""
+        if by not in REPORT_DIMENSIONS:
+            raise ValueError(f"不支持的报表维度: {by}")
+        self.flush()
+        if by == "category" and month:
+            sql = "SELECT category, total, count FROM agg_month_category WHERE month = ? ORDER BY total DESC"
+            return self._conn.execute(sql, (month,)).fetchall()
+        order = "month" if by == "month" else "total DESC"
+        return self._conn.execute(f"SELECT {by}, total, count FROM agg_{by} ORDER BY {order}").fetchall()
+
+    def scan_report(self, by="category", month=None):
+        """不走预聚合表、直接扫明细的同一份报表 (用于基准对比和校验)"""
+        self.flush()
+        where, params = ("WHERE month = ?", (month,)) if month else ("", ())
+        order = "month" if by == "month" else "2 DESC"
+        return self._conn.execute(
+            f"SELECT {by}, SUM(amount), COUNT(*) FROM entries {where} GROUP BY {by} ORDER BY {order}", params
+        ).fetchall()
+
+    def count(self):
+        self.flush()
+        return self._conn.execute("SELECT COALESCE(SUM(count), 0) FROM agg_month").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
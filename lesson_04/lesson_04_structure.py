@@ -1,9 +1,21 @@
 import os
+import csv
 import json
 import sys
+import time
+import random
+import asyncio
+import argparse
+import openai
 from dotenv import load_dotenv
-from openai import OpenAI
-from pydantic import BaseModel, Field
+from openai import OpenAI, AsyncOpenAI
+from pydantic import BaseModel, Field, ValidationError
+from ledger import Ledger, LEDGER_PATH, REPORT_DIMENSIONS
+from local_extractor import FastPathStats, local_extract, pinned_fields
+
+# 流式 JSON 解析放在仓库公共的 tools 目录里，lesson_16 也在用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+from streaming_json import openai_content, stream_structured  # noqa: E402
 
 # 加载环境变量
 load_dotenv()
@@ -19,6 +31,12 @@ client = OpenAI(
     base_url=os.getenv("DEEP_SEEK_API_URL")
 )
 
+# 批量模式配置
+BATCH_CONCURRENCY = 8   # 同时处理的账单数
+BATCH_RPM = 0           # 每分钟最多发给 DeepSeek 的请求数，0 表示不限
+BATCH_MAX_RETRIES = 3   # 限流/网络错误/返回格式不对时的最大重试次数
+PACK_SIZE = 1           # 打包模式每个请求塞几条账单，1 表示不打包
+
 # ==========================================
 # 第一步：定义“模具” (增加情感反馈字段)
 # ==========================================
@@ -33,10 +51,10 @@ class AccountItem(BaseModel):
 # ==========================================
 # 第二步：处理函数
 # ==========================================
-def smart_bookkeeping(user_input):
+def build_system_prompt():
     schema_str = json.dumps(AccountItem.model_json_schema(), ensure_ascii=False)
     
-    system_prompt = f"""
+    return f"""
     你是一个不仅会记账，还很懂心理学的贴心助手。
     请分析用户的输入，提取关键信息，并给出情感反馈。
     
@@ -46,22 +64,93 @@ def smart_bookkeeping(user_input):
     {schema_str}
     """
 
-    print("🤖 正在思考中...", end="", flush=True) # 简单的加载动效
+# 只构建一次，之后每次请求的 system prompt 逐字节相同，服务端的前缀缓存 (prompt cache) 才能命中
+SYSTEM_PROMPT = build_system_prompt()
+
+# 打包模式：在同一个前缀后面追加固定的说明，整段同样只构建一次
+PACKED_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+    【批量模式】
+    用户会一次给出多条账单：{"bills": [{"id": 0, "text": "..."}, ...]}。
+    请对每一条分别按上面的 Schema 提取，输出 {"items": [{"id": 0, ...Schema 字段}, ...]}，
+    每条账单都必须出现且只出现一次，id 与输入一致。
+    账单如果带有 known，里面的字段已经确定，输出时省略这些字段即可。
+    """
+
+def build_user_message(text, known=None):
+    """
+    本地已经解析出部分字段时，把它们告诉模型，只让它补剩下的字段 (输出更短)。
+    说明放在 user 消息里，system prompt 保持不变，前缀缓存照样命中。
+    """
+    if not known:
+        return text
+    missing = [name for name in AccountItem.model_fields if name not in known]
+    return (f"{text}\n\n【已确定的字段，不要修改】{json.dumps(known, ensure_ascii=False)}\n"
+            f"只需输出这些字段组成的 JSON：{', '.join(missing)}")
+
+def smart_bookkeeping(user_input, skip_comment=False, use_local=True, stats=None, renderer=None):
+    """
+    先用本地规则解析 (金额、分类、商品，以及关键词能认出的情绪)；
+    全部字段都有了就不调用大模型，否则把有把握的金额、分类告诉模型，其余字段由模型给出。
+    skip_comment=True 时不要 AI 点评，情绪认不出来记为“平淡”。
+    传入 renderer (CardRenderer) 时走流式输出：每个字段一生成完就显示，ai_comment 逐字显示。
+    """
+    start = time.perf_counter()
+    known, missing = {}, set(AccountItem.model_fields)
+    if use_local:
+        known, missing, _ = local_extract(user_input, skip_comment=skip_comment)
+        if missing:
+            known = pinned_fields(known)   # 反正要问模型，没把握的字段以模型为准
+    if renderer is not None:
+        for key, value in known.items():
+            renderer.on_field(key, value)
+    if not missing:
+        elapsed = (time.perf_counter() - start) * 1000
+        if stats is not None:
+            stats.record(True, elapsed)
+        if renderer is not None:
+            renderer.timings = {"first_field_ms": elapsed, "total_ms": elapsed}
+        return AccountItem(**known)
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_message(user_input, known)}
+    ]
+    if renderer is None:
+        print("🤖 正在思考中...", end="", flush=True) # 简单的加载动效
 
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat", 
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input}
-            ],
-            response_format={"type": "json_object"} 
-        )
-
-        json_str = response.choices[0].message.content
-        data = json.loads(json_str)
-        item = AccountItem(**data)
-        print("\r", end="") # 清除"正在思考中"
+        if renderer is not None:
+            stream = client.chat.completions.create(
+                model="deepseek-chat",
+                messages=messages,
+                response_format={"type": "json_object"},
+                stream=True
+            )
+            # 模型可能把已确定的字段再抄一遍，这些字段已经显示过了
+            def on_field(key, value):
+                if key not in known:
+                    renderer.on_field(key, value)
+
+            def on_delta(key, text):
+                if key not in known:
+                    renderer.on_delta(key, text)
+
+            data, renderer.timings = stream_structured(openai_content(stream), on_field=on_field,
+                                                       on_delta=on_delta, start=start)
+        else:
+            response = client.chat.completions.create(
+                model="deepseek-chat", 
+                messages=messages,
+                response_format={"type": "json_object"} 
+            )
+            json_str = response.choices[0].message.content
+            data = json.loads(json_str)
+            print("\r", end="") # 清除"正在思考中"
+
+        # 整个 JSON 收完之后再统一校验
+        item = AccountItem(**{**data, **known})
+        if stats is not None:
+            stats.record(False, (time.perf_counter() - start) * 1000)
         return item
         
     except Exception as e:
@@ -69,12 +158,399 @@ def smart_bookkeeping(user_input):
         return None
 
 # ==========================================
-# 第三步：交互式 CLI (命令行界面)
+# 第三步：批量模式 (月底导入对账单)
 # ==========================================
-if __name__ == "__main__":
+class AsyncRateLimiter:
+    """把请求均匀地摊到每分钟 rpm 个时间槽里，rpm <= 0 时不限速"""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+TEXT_FIELDS = ("text", "input", "description", "描述", "账单")
+
+def read_entries(path, fmt=None):
+    """
+    读取待记账的描述，支持三种格式：
+    - csv：取 text/input/description/描述/账单 列，都没有就取第一列
+    - jsonl：每行一个对象，取同样的字段；也可以直接是一个 JSON 字符串
+    - txt：每行一条 (path 为 '-' 时从标准输入读)
+    """
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        fmt = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl"}.get(ext, "txt")
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            column = next((f for f in TEXT_FIELDS if f in (reader.fieldnames or [])), None)
+            for row in reader:
+                text = row[column] if column else next(iter(row.values()), "")
+                if text and text.strip():
+                    yield text.strip()
+        else:
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                if fmt == "jsonl":
+                    data = json.loads(line)
+                    if isinstance(data, dict):
+                        data = next((data[f] for f in TEXT_FIELDS if f in data), "")
+                    line = str(data).strip()
+                if line:
+                    yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+# 请求本身没成功 (限流、网络、服务端 5xx)：换个请求形式也没用，只能退避后原样重发
+TRANSIENT_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                    openai.InternalServerError)
+RETRYABLE_ERRORS = TRANSIENT_ERRORS + (ValueError, TypeError, ValidationError)
+
+def add_usage(usage, response_usage):
+    """累计 token 用量；DeepSeek 额外返回 prompt_cache_hit_tokens (前缀缓存命中的部分)"""
+    if usage is None or response_usage is None:
+        return
+    usage["requests"] += 1
+    usage["prompt_tokens"] += response_usage.prompt_tokens or 0
+    usage["completion_tokens"] += response_usage.completion_tokens or 0
+    usage["cache_hit_tokens"] += getattr(response_usage, "prompt_cache_hit_tokens", None) or 0
+
+def new_usage():
+    return {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cache_hit_tokens": 0}
+
+async def extract_one(index, text, async_client, limiter, semaphore, usage=None, known=None):
+    """
+    带重试地提取一条账单；返回 {"index", "input", "item" 或 "error", "attempts", "latency_ms"}。
+    known 是本地有把握的字段 (pinned_fields)，模型只需要补其余字段。
+    """
+    system_prompt = SYSTEM_PROMPT
+    known = known or {}
+    record = {"index": index, "input": text}
+    start = time.perf_counter()
+    async with semaphore:
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            record["attempts"] = attempt + 1
+            await limiter.acquire()
+            try:
+                response = await async_client.chat.completions.create(
+                    model="deepseek-chat",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": build_user_message(text, known)}
+                    ],
+                    response_format={"type": "json_object"}
+                )
+                add_usage(usage, response.usage)
+                data = json.loads(response.choices[0].message.content)
+                record["item"] = AccountItem(**{**data, **known}).model_dump()
+                record.pop("error", None)
+                break
+            except RETRYABLE_ERRORS as e:
+                # 网络/限流问题和模型偶尔输出不合格的 JSON 都值得再试一次
+                record["error"] = f"{type(e).__name__}: {e}"
+                if attempt < BATCH_MAX_RETRIES:
+                    # 指数退避 + 随机抖动，避免所有协程在同一时刻一起重试
+                    await asyncio.sleep((2 ** attempt) * 0.5 + random.random())
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                break
+    record["latency_ms"] = (time.perf_counter() - start) * 1000
+    return record
+
+async def extract_pack(bills, async_client, limiter, semaphore, usage=None):
+    """
+    一个请求提取多条账单。bills 是 [(index, text, known), ...]，返回按同样顺序排列的记录列表。
+    限流/网络/5xx 时整包退避重发；重试用尽就整包记为失败，不拆成单条 (那样请求数会翻 pack 倍，正好撞在限流上)。
+    响应解析失败，或其中缺失、id 对不上、字段校验失败的条目，才退回到单条模式 (extract_one) 各自重试。
+    """
+    if len(bills) == 1:
+        index, text, known = bills[0]
+        return [await extract_one(index, text, async_client, limiter, semaphore, usage, known)]
+
+    payload = []
+    for i, (_, text, known) in enumerate(bills):
+        bill = {"id": i, "text": text}
+        if known:
+            bill["known"] = known
+        payload.append(bill)
+
+    records = {}
+    items = []
+    start = time.perf_counter()
+    async with semaphore:
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            await limiter.acquire()
+            try:
+                response = await async_client.chat.completions.create(
+                    model="deepseek-chat",
+                    messages=[
+                        {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+                        {"role": "user", "content": json.dumps({"bills": payload}, ensure_ascii=False)}
+                    ],
+                    response_format={"type": "json_object"}
+                )
+            except TRANSIENT_ERRORS as e:
+                if attempt < BATCH_MAX_RETRIES:
+                    await asyncio.sleep((2 ** attempt) * 0.5 + random.random())
+                    continue
+                latency_ms = (time.perf_counter() - start) * 1000
+                return [{"index": index, "input": text, "error": f"{type(e).__name__}: {e}",
+                         "attempts": attempt + 1, "packed": True, "latency_ms": latency_ms}
+                        for index, text, _ in bills]
+            except Exception:
+                break   # 请求被拒 (例如整包太长)，下面全部走单条
+            add_usage(usage, response.usage)
+            try:
+                items = json.loads(response.choices[0].message.content).get("items") or []
+            except (ValueError, TypeError, AttributeError):
+                items = []   # 整段 JSON 坏了，每条都算解析失败，走单条重试
+            break
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    for raw in items:
+        if not isinstance(raw, dict):
+            continue
+        item_id = raw.pop("id", None)
+        if not isinstance(item_id, int) or not 0 <= item_id < len(bills) or item_id in records:
+            continue
+        index, text, known = bills[item_id]
+        try:
+            item = AccountItem(**{**raw, **(known or {})}).model_dump()
+        except (ValidationError, TypeError):
+            continue
+        records[item_id] = {"index": index, "input": text, "item": item,
+                            "attempts": 1, "packed": True, "latency_ms": latency_ms}
+
+    # 信号量已经释放，单条重试各自排队，不会互相卡死
+    missing = [i for i in range(len(bills)) if i not in records]
+    retried = await asyncio.gather(*(
+        extract_one(bills[i][0], bills[i][1], async_client, limiter, semaphore, usage, known=bills[i][2])
+        for i in missing
+    ))
+    for i, record in zip(missing, retried):
+        record["fallback"] = True
+        records[i] = record
+    return [records[i] for i in range(len(bills))]
+
+async def extract_all(entries, pack_size, async_client, limiter, semaphore, usage=None,
+                      skip_comment=False, use_local=True):
+    """
+    并发提取全部账单，按输入顺序逐条 yield 记录 (先完成的先缓冲，只连续地往外吐)。
+    use_local=True 时先过一遍本地规则：字段齐全的直接出结果 (记录里 local=True)，
+    只有缺字段的账单才发请求，并且只把有把握的字段告诉模型。
+    """
+    pack_size = max(1, pack_size)
+    finished = {}
+    remote = []
+    for index, text in enumerate(entries):
+        if not use_local:
+            remote.append((index, text, None))
+            continue
+        known, missing, local_ms = local_extract(text, skip_comment=skip_comment)
+        if missing:
+            remote.append((index, text, pinned_fields(known)))
+        else:
+            finished[index] = {"index": index, "input": text, "item": AccountItem(**known).model_dump(),
+                               "attempts": 0, "local": True, "latency_ms": local_ms}
+
+    tasks = [
+        asyncio.create_task(extract_pack(remote[i:i + pack_size], async_client, limiter, semaphore, usage))
+        for i in range(0, len(remote), pack_size)
+    ]
+    next_index = 0
+    while next_index in finished:
+        yield finished.pop(next_index)
+        next_index += 1
+    for task in asyncio.as_completed(tasks):
+        for record in await task:
+            finished[record["index"]] = record
+        while next_index in finished:
+            yield finished.pop(next_index)
+            next_index += 1
+
+def print_usage_report(usage, count, elapsed, file=sys.stderr):
+    """按每 1000 条账单折算 token 和耗时，方便对比打包前后"""
+    if not count:
+        return
+    scale = 1000 / count
+    total = usage["prompt_tokens"] + usage["completion_tokens"]
+    print(f"🧮 请求 {usage['requests']} 次 | prompt {usage['prompt_tokens']} (前缀缓存命中 "
+          f"{usage['cache_hit_tokens']}) + completion {usage['completion_tokens']} tokens", file=file)
+    print(f"   折合每 1000 条：{total * scale:.0f} tokens，{elapsed * scale:.1f}s，"
+          f"{usage['requests'] * scale:.0f} 次请求", file=file)
+
+async def run_batch(args):
+    async_client = AsyncOpenAI(api_key=api_key, base_url=os.getenv("DEEP_SEEK_API_URL"))
+    limiter = AsyncRateLimiter(args.rpm)
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    usage = new_usage()
+    stats = FastPathStats()
+    ledger = None if args.no_ledger else Ledger(args.ledger)
+
+    entries = list(read_entries(args.input, args.format))
+    print(f"📥 读取到 {len(entries)} 条账单，并发 {args.concurrency}，"
+          f"限速 {args.rpm or '不限'} 次/分钟，每个请求 {args.pack} 条", file=sys.stderr)
+
+    out = sys.stdout if not args.output else open(args.output, "w", encoding="utf-8")
+    errors_path = args.errors or (f"{args.output}.errors.jsonl" if args.output else "bookkeeping_errors.jsonl")
+    err_out = None   # 第一次出错时才创建失败记录文件
+
+    start = time.perf_counter()
+    ok = failed = fallback = 0
+    async for done in extract_all(entries, args.pack, async_client, limiter, semaphore, usage,
+                                  skip_comment=args.no_comment, use_local=not args.no_local):
+        fallback += bool(done.get("fallback"))
+        stats.record(done.get("local", False), done["latency_ms"])
+        if "item" in done:
+            out.write(json.dumps({"index": done["index"], "input": done["input"], **done["item"]},
+                                 ensure_ascii=False) + "\n")
+            if ledger is not None:
+                ledger.append(done["item"], text=done["input"])
+            ok += 1
+        else:
+            if err_out is None:
+                err_out = open(errors_path, "w", encoding="utf-8")
+            err_out.write(json.dumps(done, ensure_ascii=False) + "\n")
+            failed += 1
+        print(f"\r⏳ 已完成 {ok + failed}/{len(entries)} (失败 {failed})", end="", file=sys.stderr, flush=True)
+
+    out.flush()
+    if out is not sys.stdout:
+        out.close()
+    if err_out is not None:
+        err_out.close()
+    if ledger is not None:
+        ledger.close()
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    print(f"✅ 批量记账完成：成功 {ok} 条，失败 {failed} 条" + (f" (见 {errors_path})" if failed else "") + "，"
+          f"用时 {elapsed:.1f}s ({len(entries) / elapsed if elapsed else 0:.1f} 条/秒)"
+          + (f"，{fallback} 条打包失败后单独重试" if fallback else ""), file=sys.stderr)
+    print(stats.summary(), file=sys.stderr)
+    print_usage_report(usage, len(entries), elapsed)
+    await async_client.close()
+
+def parse_args():
+    # 交互模式和批量模式共用的提取选项
+    extract_options = argparse.ArgumentParser(add_help=False)
+    extract_options.add_argument("--no-comment", action="store_true",
+                                 help="不要 AI 点评 (适合大批量导入)：本地规则能解析的账单完全不调用大模型")
+    extract_options.add_argument("--no-local", action="store_true", help="关闭本地规则，每条都交给大模型")
+
+    parser = argparse.ArgumentParser(description="智能记账助手", parents=[extract_options])
+    subparsers = parser.add_subparsers(dest="command")
+    batch = subparsers.add_parser("batch", parents=[extract_options],
+                                  help="批量模式：从 CSV / JSONL / 文本文件或标准输入导入账单")
+    batch.add_argument("input", help="输入文件路径，'-' 表示标准输入")
+    batch.add_argument("--format", choices=["csv", "jsonl", "txt"], help="输入格式，默认按后缀判断")
+    batch.add_argument("--output", help="成功记录的 JSONL 输出路径，默认打印到标准输出")
+    batch.add_argument("--errors", help="失败记录的 JSONL 路径，默认是 <output>.errors.jsonl")
+    batch.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="并发数")
+    batch.add_argument("--rpm", type=int, default=BATCH_RPM, help="每分钟最多请求 DeepSeek 的次数，0 为不限")
+    batch.add_argument("--pack", type=int, default=PACK_SIZE, help="每个请求打包几条账单，1 表示逐条请求")
+    batch.add_argument("--ledger", default=LEDGER_PATH, help="账本路径")
+    batch.add_argument("--no-ledger", action="store_true", help="只输出结果，不写入账本")
+
+    report = subparsers.add_parser("report", help="查看账本统计")
+    report.add_argument("--by", choices=REPORT_DIMENSIONS, default="category", help="按分类 / 月份 / 情绪汇总")
+    report.add_argument("--month", help="只看某个月 (YYYY-MM)，仅对分类报表生效")
+    report.add_argument("--ledger", default=LEDGER_PATH, help="账本路径")
+    return parser.parse_args()
+
+def run_report(args):
+    if not os.path.exists(args.ledger):
+        print(f"📒 账本还是空的: {args.ledger}")
+        return
+    with Ledger(args.ledger) as ledger:
+        rows = ledger.report(by=args.by, month=args.month)
+    title = {"category": "分类", "month": "月份", "sentiment": "心情"}[args.by]
+    grand_total = sum(total for _, total, _ in rows)
+    print("=" * 40)
+    print(f"📒 按{title}汇总" + (f" ({args.month})" if args.month else ""))
+    print("-" * 40)
+    for key, total, count in rows:
+        share = total / grand_total if grand_total else 0
+        print(f"   {key:<10}{total:>12.2f} 元{count:>6} 笔{share:>7.0%}")
+    print("-" * 40)
+    print(f"   {'合计':<10}{grand_total:>12.2f} 元{sum(c for _, _, c in rows):>6} 笔")
+    print("=" * 40)
+
+# ==========================================
+# 第四步：交互式 CLI (命令行界面)
+# ==========================================
+FIELD_LABELS = {
+    "category": "🏷️  分类",
+    "product": "🛒 商品",
+    "amount": "💰 金额",
+    "sentiment": "💭 心情",
+    "ai_comment": "🤖 AI说",
+}
+
+class CardRenderer:
+    """把流式到达的字段一行一行画成记账卡片，ai_comment 用青色逐字输出"""
+
+    def __init__(self):
+        self.started = False
+        self.commenting = False
+        self.timings = {}
+
+    def _begin(self):
+        if not self.started:
+            print(f"\n   ---------------------------")
+            self.started = True
+
+    def on_field(self, key, value):
+        if key not in FIELD_LABELS:
+            return
+        self._begin()
+        if key == "ai_comment":
+            if self.commenting:
+                print("\033[0m")   # 逐字输出已经结束，收尾换行
+                self.commenting = False
+            elif value:
+                print(f"   {FIELD_LABELS[key]}: \033[96m{value}\033[0m") # 使用青色高亮显示 AI 回复
+        elif key == "amount" and isinstance(value, (int, float)):
+            print(f"   {FIELD_LABELS[key]}: {value:.2f}")
+        else:
+            print(f"   {FIELD_LABELS[key]}: {value}")
+
+    def on_delta(self, key, text):
+        if key != "ai_comment":
+            return
+        self._begin()
+        if not self.commenting:
+            print(f"   {FIELD_LABELS[key]}: \033[96m", end="")
+            self.commenting = True
+        print(text, end="", flush=True)
+
+    def finish(self):
+        if self.commenting:
+            print("\033[0m")
+            self.commenting = False
+        if self.started:
+            print(f"   ---------------------------")
+
+def run_cli(skip_comment=False, use_local=True):
     print("=" * 40)
     print("💰 智能记账助手 CLI 版 (输入 q 或 exit 退出)")
     print("=" * 40)
+    # 交互模式每条都立刻落盘，不攒批
+    ledger = Ledger(write_batch=1)
+    stats = FastPathStats()
 
     while True:
         try:
@@ -89,21 +565,34 @@ if __name__ == "__main__":
             if not user_input:
                 continue
 
-            # 调用 AI
-            result = smart_bookkeeping(user_input)
-            
-            # 格式化输出结果
+            # 调用 AI：字段边生成边显示，全部收完并校验通过才算记账成功
+            renderer = CardRenderer()
+            result = smart_bookkeeping(user_input, skip_comment=skip_comment, use_local=use_local,
+                                       stats=stats, renderer=renderer)
+            renderer.finish()
+
             if result:
-                print(f"\n✅ 记账成功！")
-                print(f"   ---------------------------")
-                print(f"   🏷️  分类: {result.category}")
-                print(f"   🛒 商品: {result.product}")
-                print(f"   💰 金额: {result.amount:.2f}")
-                print(f"   💭 心情: {result.sentiment}")
-                print(f"   🤖 AI说: \033[96m{result.ai_comment}\033[0m") # 使用青色高亮显示 AI 回复
-                print(f"   ---------------------------")
+                timings = renderer.timings
+                if "first_token_ms" in timings:
+                    print(f"✅ 记账成功！(模型首个字段 {timings['first_field_ms'] or 0:.0f}ms，"
+                          f"完整结果 {timings['total_ms']:.0f}ms)")
+                else:
+                    print(f"✅ 记账成功！(本地解析 {timings['total_ms']:.2f}ms，未调用大模型)")
+                ledger.append(result, text=user_input)
 
         except KeyboardInterrupt:
             # 允许用户通过 Ctrl+C 优雅退出
             print("\n👋 用户强制退出")
-            break
\ No newline at end of file
+            break
+    ledger.close()
+    if stats.total:
+        print(stats.summary())
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    if cli_args.command == "batch":
+        asyncio.run(run_batch(cli_args))
+    elif cli_args.command == "report":
+        run_report(cli_args)
+    else:
+        run_cli(skip_comment=cli_args.no_comment, use_local=not cli_args.no_local)
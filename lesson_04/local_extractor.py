@@ -0,0 +1,245 @@
+import re
+import time
+
+# ==========================================
+# 本地确定性提取：规则能解析的字段不必问大模型
+# ==========================================
+# 分类必须是 AccountItem.category 允许的取值；关键词越长越具体，命中时优先
+CATEGORY_KEYWORDS = {
+    "餐饮": ["早餐", "早饭", "午饭", "午餐", "晚饭", "晚餐", "夜宵", "外卖", "咖啡", "奶茶", "麻辣烫", "火锅",
+             "烧烤", "饭", "面", "水果", "零食", "饮料", "聚餐", "食堂"],
+    "交通": ["打车", "滴滴", "出租车", "地铁", "公交", "高铁", "火车", "机票", "飞机", "加油", "停车", "过路费",
+             "共享单车", "车费"],
+    "购物": ["淘宝", "京东", "拼多多", "衣服", "裤子", "鞋", "包包", "化妆品", "口红", "数码", "手机", "耳机", "超市"],
+    "娱乐": ["电影", "游戏", "KTV", "唱歌", "演唱会", "门票", "旅游", "酒吧", "桌游", "剧本杀", "会员"],
+    "居家": ["房租", "水费", "电费", "燃气", "物业", "宽带", "话费", "猫粮", "狗粮", "日用品", "纸巾", "家具", "洗衣液"],
+    "医疗": ["药", "医院", "看病", "挂号", "体检", "牙", "诊所"],
+    "学习": ["书", "网课", "课程", "培训", "学费", "考试", "报名费", "文具"],
+}
+
+SENTIMENT_KEYWORDS = {
+    "开心": ["开心", "高兴", "快乐", "爽", "满足", "值"],
+    "后悔": ["后悔", "冲动", "不该", "踩雷"],
+    "心疼": ["心疼", "肉疼", "好贵", "太贵"],
+    "期待": ["期待", "希望", "盼"],
+    "难过": ["难过", "伤心", "郁闷", "不开心"],
+}
+DEFAULT_SENTIMENT = "平淡"
+
+# ---------- 金额 ----------
+_DIGITS = {"零": 0, "〇": 0, "一": 1, "壹": 1, "二": 2, "贰": 2, "两": 2, "三": 3, "叁": 3, "四": 4, "肆": 4,
+           "五": 5, "伍": 5, "六": 6, "陆": 6, "七": 7, "柒": 7, "八": 8, "捌": 8, "九": 9, "玖": 9}
+_UNITS = {"十": 10, "拾": 10, "百": 100, "佰": 100, "千": 1000, "仟": 1000, "万": 10000}
+_CN_NUM = "零〇一壹二贰两三叁四肆五伍六陆七柒八捌九玖十拾百佰千仟万"
+
+# 带货币单位的金额：¥35 / 35元 / 35.5块 / 三十五块钱 / 三块五 / 一百二十元五角
+_MONEY_RE = re.compile(
+    rf"[¥￥]\s*(?P<pre>\d+(?:\.\d+)?)"
+    rf"|(?P<num>\d+(?:\.\d+)?|[{_CN_NUM}]+(?:点[{_CN_NUM}]+)?)\s*(?P<unit>块钱|块|元|rmb|RMB)"
+    rf"(?:(?P<jiao>\d|[{_CN_NUM[:20]}])(?:角|毛)?)?"
+)
+_BARE_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+# 不带单位的中文数字至少两个字、且含十/百/千/万 (一百二、两千五)，避免把“百货”“千层面”当成金额
+_BARE_CN_NUMBER_RE = re.compile(rf"[{_CN_NUM}]*[十拾百佰千仟万][{_CN_NUM}]*")
+# 紧跟这些量词的数字是数量/时间，不是金额
+_QUANTITY_AFTER = tuple("个斤件次号点月年岁天瓶杯张本份把条位人小分公克升折%")
+
+def parse_chinese_number(text):
+    """
+    中文数字转数值：三十五 -> 35，一百二 -> 120 (口语省略的末位单位)，两千五 -> 2500，
+    一百零五 -> 105 (有“零”就不是省略)，十二点五 -> 12.5，也接受阿拉伯数字。无法解析返回 None。
+    """
+    if not text:
+        return None
+    if re.fullmatch(r"\d+(?:\.\d+)?", text):
+        return float(text)
+    integer, _, decimal = text.partition("点")
+
+    total = 0
+    section = 0        # 万以下的部分
+    digit = None
+    last_unit = 1
+    after_zero = False  # 末位数字前面隔着“零” (一百零五)，它就是个位
+    for ch in integer:
+        if ch in _DIGITS:
+            digit = _DIGITS[ch]
+            after_zero = after_zero or digit == 0
+        elif ch in _UNITS:
+            unit = _UNITS[ch]
+            if unit == 10000:
+                total += (section + (digit or 0)) * unit
+                section = 0
+            else:
+                section += (1 if digit is None else digit) * unit   # “十五” 的十前面没有数字
+            digit = None
+            last_unit = unit
+            after_zero = False
+        else:
+            return None
+    if digit is not None:
+        # 结尾单独一个数字：紧跟在百/千/万后面是口语省略 (一百二 = 120)，否则就是个位
+        shorthand = last_unit >= 100 and len(integer) >= 3 and not after_zero
+        section += digit * (last_unit // 10) if shorthand else digit
+    value = float(total + section)
+
+    if decimal:
+        digits = [_DIGITS.get(ch) for ch in decimal]
+        if None in digits:
+            return None
+        value += float("0." + "".join(str(d) for d in digits))
+    return value
+
+def parse_amount(text):
+    """
+    找出账单金额。优先取带 元/块/¥ 的金额；没有单位时，只有唯一一个不像数量的数字
+    (阿拉伯数字，或 一百二 这样的中文数字) 才采用。返回 (金额, 匹配到的原文) 或 (None, None)。
+    """
+    matches = list(_MONEY_RE.finditer(text))
+    if len(matches) == 1:
+        m = matches[0]
+        value = parse_chinese_number(m.group("pre") or m.group("num"))
+        if value is not None and m.group("jiao"):
+            jiao = parse_chinese_number(m.group("jiao"))
+            value += (jiao or 0) / 10   # 三块五 = 3.5
+        if value is not None:
+            return value, m.group(0)
+    if len(matches) > 1:
+        return None, None   # 多个金额 (例如 “原价 99 元现价 59 元”)，交给大模型
+
+    candidates = [m for m in _bare_numbers(text) if not text[m.end():m.end() + 1].startswith(_QUANTITY_AFTER)]
+    if len(candidates) == 1:
+        value = parse_chinese_number(candidates[0].group(0))
+        if value is not None:
+            return value, candidates[0].group(0)
+    return None, None
+
+def _bare_numbers(text):
+    return [*_BARE_NUMBER_RE.finditer(text),
+            *(m for m in _BARE_CN_NUMBER_RE.finditer(text) if len(m.group(0)) >= 2)]
+
+# ---------- 分类 / 情绪 / 商品 ----------
+def classify(text):
+    """按最长命中的关键词定分类；两个分类命中同样长的关键词就算拿不准"""
+    best_len, best = 0, set()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in text:
+                if len(keyword) > best_len:
+                    best_len, best = len(keyword), {category}
+                elif len(keyword) == best_len:
+                    best.add(category)
+    return best.pop() if len(best) == 1 else None
+
+def detect_sentiment(text):
+    # “不开心” 要先于 “开心” 判断
+    for sentiment in ("难过", "后悔", "心疼", "期待", "开心"):
+        if any(k in text for k in SENTIMENT_KEYWORDS[sentiment]):
+            return sentiment
+    return None
+
+_FILLER_RE = re.compile(r"(一共|总共|共|花了|花|付了|付|买了|吃了|了|大概|差不多)")
+_CLAUSE_SPLIT_RE = re.compile(r"[，,。.!！?？；;、\s]+")
+
+def extract_product(text, amount_text):
+    """取第一个不是纯情绪的小句，去掉金额、其他数字和“花了/买了”之类的虚词"""
+    sentiment_words = [k for words in SENTIMENT_KEYWORDS.values() for k in words]
+    stripped = text.replace(amount_text, " ") if amount_text else text
+    stripped = _MONEY_RE.sub(" ", stripped)
+    for m in sorted(_bare_numbers(stripped), key=lambda m: m.start(), reverse=True):
+        if not stripped[m.end():m.end() + 1].startswith(_QUANTITY_AFTER):   # “3斤苹果”里的数量留着
+            stripped = stripped[:m.start()] + " " + stripped[m.end():]
+    for clause in _CLAUSE_SPLIT_RE.split(stripped):
+        clause = _FILLER_RE.sub("", clause).strip("《》\"'“”")
+        if clause and not any(w in clause for w in sentiment_words) and not clause.isdigit():
+            return clause[:20]
+    return None
+
+# ==========================================
+# 入口
+# ==========================================
+# 规则有把握的字段：金额 (有明确的数字) 和分类 (关键词唯一命中)。
+# 商品名和情绪只是粗略的猜测，字段齐全时可以直接用，但既然要调用大模型，就以模型的回答为准。
+PINNED_FIELDS = ("amount", "category")
+
+def local_extract(text, skip_comment=False):
+    """
+    返回 (已解析的字段, 仍缺的字段集合, 耗时毫秒)。
+    skip_comment=True 时不需要 ai_comment，情绪没识别出来就记为“平淡”，缺的字段只可能是金额/分类/商品。
+    缺字段、需要调用大模型时，用 pinned_fields() 取出应该告诉模型、并且不让它改的部分。
+    """
+    start = time.perf_counter()
+    fields = {}
+    amount, amount_text = parse_amount(text)
+    if amount is not None:
+        fields["amount"] = amount
+    category = classify(text)
+    if category:
+        fields["category"] = category
+    product = extract_product(text, amount_text)
+    if product:
+        fields["product"] = product
+    sentiment = detect_sentiment(text)
+    if sentiment:
+        fields["sentiment"] = sentiment
+
+    if skip_comment:
+        fields.setdefault("sentiment", DEFAULT_SENTIMENT)
+        fields["ai_comment"] = ""
+    missing = {"amount", "category", "product", "sentiment", "ai_comment"} - set(fields)
+    return fields, missing, (time.perf_counter() - start) * 1000
+
+def pinned_fields(fields):
+    """本地结果里交给大模型时保持不变的字段；不要点评的模式下 ai_comment 固定为空"""
+    pinned = {k: fields[k] for k in PINNED_FIELDS if k in fields}
+    if fields.get("ai_comment") == "":
+        pinned["ai_comment"] = ""
+    return pinned
+
+# ==========================================
+# 命中率 / 延迟统计
+# ==========================================
+class FastPathStats:
+    """记录每条账单是本地直出还是调了大模型，以及各自的耗时"""
+
+    def __init__(self):
+        self.local_ms = []
+        self.llm_ms = []
+
+    def record(self, local, latency_ms):
+        (self.local_ms if local else self.llm_ms).append(latency_ms)
+
+    @property
+    def total(self):
+        return len(self.local_ms) + len(self.llm_ms)
+
+    @property
+    def hit_rate(self):
+        return len(self.local_ms) / self.total if self.total else 0.0
+
+    def summary(self):
+        def avg(values):
+            return sum(values) / len(values) if values else 0.0
+        return (f"⚡ 本地直出 {len(self.local_ms)}/{self.total} 条 (命中率 {self.hit_rate:.0%})，"
+                f"平均 {avg(self.local_ms):.2f}ms | 调用大模型 {len(self.llm_ms)} 条，平均 {avg(self.llm_ms):.0f}ms")
+
+# ==========================================
+# 自检：python local_extractor.py
+# ==========================================
+NUMBER_CHECKS = {
+    "三十五": 35, "十五": 15, "一百二": 120, "两千五": 2500, "一万二": 12000, "十二点五": 12.5,
+    "一百零五": 105, "二百零八": 208, "一千零二": 1002, "一千零二十": 1020, "三万零五": 30005, "一百二十": 120,
+}
+AMOUNT_CHECKS = {
+    "午饭一百零五块": 105, "打车35块": 35, "三块五的包子": 3.5, "一百二 打车": 120, "买了3斤苹果 二十": 20,
+}
+
+if __name__ == "__main__":
+    failures = [(text, parse_chinese_number(text), want) for text, want in NUMBER_CHECKS.items()
+                if parse_chinese_number(text) != want]
+    failures += [(text, parse_amount(text)[0], want) for text, want in AMOUNT_CHECKS.items()
+                 if parse_amount(text)[0] != want]
+    for text, got, want in failures:
+        print(f"❌ {text}: 得到 {got}，应为 {want}")
+    print(f"✅ 金额解析自检 {len(NUMBER_CHECKS) + len(AMOUNT_CHECKS) - len(failures)}/"
+          f"{len(NUMBER_CHECKS) + len(AMOUNT_CHECKS)} 通过")
+    raise SystemExit(1 if failures else 0)
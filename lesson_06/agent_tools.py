@@ -1,6 +1,12 @@
 import os
+import time
+import uuid
+import bisect
+import fnmatch
+import threading
 import shutil
 import json
+import argparse
 
 # ==========================================
 # 1. 配置区域
@@ -11,32 +17,183 @@ TARGET_DIR_NAME = "Agent测试文件库_最终版"
 # 获取当前脚本所在目录的绝对路径，锁定操作范围
 BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), TARGET_DIR_NAME)
 
+# 批量移动的日志文件 (以 . 开头，list_files 不会把它当成待整理的文件)
+JOURNAL_NAME = ".move_journal.jsonl"
+
 # ==========================================
-# 2. 工具函数定义 (修复版)
+# 2. 分类规则表 (本地预分类器和 System Prompt 共用这一份)
 # ==========================================
+# 核心规则 - 优先级最高：文件名里有明确的中文语义，无视后缀
+KEYWORD_RULES = [
+    (("发票", "报销"), "财务发票"),
+    (("合同", "协议"), "合同文件"),
+    (("简历",), "候选人简历"),
+]
+
+# 次要策略：按后缀归类 (文件夹名, 说明, 后缀列表)
+EXTENSION_RULES = [
+    ("图片", "图片文件", (".jpg", ".jpeg", ".png", ".gif", ".svg")),
+    ("文档", "文档文件", (".pdf", ".docx", ".doc", ".txt", ".md", ".pptx")),
+    ("数据", "数据表格", (".xlsx", ".csv", ".json")),
+    ("代码", "代码脚本", (".py", ".js", ".html", ".css")),
+    ("压缩包", "压缩包", (".zip", ".rar", ".7z", ".tar.gz")),
+]
+
+# 规则表覆盖不到的文件，由大模型判断；它也认不出来就放这里
+FALLBACK_CATEGORY = "其他"
+
+def classify_filename(filename):
+    """
+    用规则表给文件归类，能确定就返回分类名，拿不准返回 None (交给大模型)。
+    拿不准的情况：同时命中多条关键词规则 (例如“合同发票”)，或者后缀不在规则表里。
+    """
+    matched = {category for keywords, category in KEYWORD_RULES if any(k in filename for k in keywords)}
+    if len(matched) == 1:
+        return matched.pop()
+    if matched:
+        return None
+
+    lower = filename.lower()
+    for category, _, extensions in EXTENSION_RULES:
+        # 用 endswith 而不是 splitext，这样 .tar.gz 这种双后缀也能认出来
+        if lower.endswith(extensions):
+            return category
+    return None
+
+def render_rules_prompt():
+    """把规则表渲染成 System Prompt 里的规则段落"""
+    lines = ["【核心规则 - 优先级最高】", "如果文件名中包含明确的中文语义，请无视后缀，优先建立中文语义文件夹："]
+    for keywords, category in KEYWORD_RULES:
+        quoted = "、".join(f"“{k}”" for k in keywords)
+        lines.append(f"- 包含{quoted} -> 移动到 \"{category}\"")
+    lines.append("")
+    lines.append("【次要策略】(次要优先级)")
+    lines.append("请根据文件类型建立文件夹，规则如下：")
+    for category, description, extensions in EXTENSION_RULES:
+        lines.append(f"- {category}: {description} ({', '.join(extensions)} 等)")
+    lines.append("")
+    lines.append(f"遇到无法识别的文件，归类到 \"{FALLBACK_CATEGORY}\"。")
+    return "\n".join(lines)
+
+# ==========================================
+# 3. 工具函数定义 (修复版)
+# ==========================================
+
+# 单页最多返回多少个文件名、最多占多少 token (粗估)，防止 10 万个文件一次塞爆上下文
+LIST_PAGE_SIZE = 200
+LIST_TOKEN_BUDGET = 4000
+# 内存里最多保留几份目录快照，供 since 增量查询
+SNAPSHOT_KEEP = 8
+
+_snapshots = {}     # snapshot_id -> frozenset(文件名)，按插入顺序淘汰
+_snapshot_lock = threading.Lock()
+
+def _scan_names():
+    """用 scandir 扫一遍目录：is_file 直接用目录项里的类型信息，不再逐个 stat"""
+    with os.scandir(BASE_PATH) as entries:
+        return frozenset(e.name for e in entries if not e.name.startswith('.') and e.is_file())
+
+def _remember_snapshot(names):
+    """目录没变就沿用上一份快照的 id，变了才登记新快照"""
+    with _snapshot_lock:
+        if _snapshots:
+            last_id = next(reversed(_snapshots))
+            if _snapshots[last_id] == names:
+                return last_id
+        snapshot_id = uuid.uuid4().hex[:12]
+        _snapshots[snapshot_id] = names
+        while len(_snapshots) > SNAPSHOT_KEEP:
+            _snapshots.pop(next(iter(_snapshots)))
+        return snapshot_id
+
+def _name_filter(pattern, extensions):
+    extensions = tuple(e.lower() if e.startswith(".") else "." + e.lower() for e in extensions or [])
+
+    def match(name):
+        if pattern and not fnmatch.fnmatch(name, pattern):
+            return False
+        return not extensions or name.lower().endswith(extensions)
+    return match
+
+def _estimate_tokens(name):
+    # 中文大约一字一 token，再加上引号、逗号的开销；宁可估多
+    return len(name) + 3
+
+def _paginate(items, cursor, page_size, token_budget, key=lambda item: item):
+    """items 已按名字排序；从 cursor 之后开始取，直到页数或 token 预算用完"""
+    start = bisect.bisect_right([key(item) for item in items], cursor) if cursor else 0
+    page = []
+    spent = 0
+    for item in items[start:]:
+        cost = _estimate_tokens(key(item))
+        if len(page) >= page_size or (page and spent + cost > token_budget):
+            break
+        page.append(item)
+        spent += cost
+    next_cursor = key(page[-1]) if page and start + len(page) < len(items) else None
+    return page, next_cursor
 
 def list_files(args=None):
     """
-    获取目标文件夹下的所有文件名。
-    返回: JSON 格式的字符串
+    分页列出目标文件夹下的文件名。
+    Args:
+        args (dict, 可选):
+            pattern     glob 通配符，例如 "*发票*"
+            extensions  后缀列表，例如 [".pdf", "docx"]
+            cursor      上一页返回的 next_cursor，从它之后继续
+            since       上次返回的 snapshot，只返回之后新增 / 消失的文件
+            page_size / token_budget  覆盖默认的单页上限
+    返回: JSON 格式的字符串，含 files (或 added/removed)、total、next_cursor、snapshot
     """
+    args = args or {}
     # 安全检查
     if not os.path.exists(BASE_PATH):
         return json.dumps({
             "error": f"找不到目录 {TARGET_DIR_NAME}，请先运行 generate_files.py 生成测试文件。"
         }, ensure_ascii=False)
-    
-    files = []
+
     try:
-        for f in os.listdir(BASE_PATH):
-            f_path = os.path.join(BASE_PATH, f)
-            # 过滤逻辑：只看文件，忽略隐藏文件(.开头)
-            if os.path.isfile(f_path) and not f.startswith('.'):
-                files.append(f)
-        
+        page_size = max(1, int(args.get("page_size") or LIST_PAGE_SIZE))
+        token_budget = max(1, int(args.get("token_budget") or LIST_TOKEN_BUDGET))
+        match = _name_filter(args.get("pattern"), args.get("extensions"))
+        cursor = args.get("cursor")
+
+        names = _scan_names()
+        snapshot_id = _remember_snapshot(names)
+
+        since = args.get("since")
+        if since:
+            with _snapshot_lock:
+                previous = _snapshots.get(since)
+            if previous is None:
+                return json.dumps({
+                    "error": f"快照 {since} 已过期，请不带 since 重新调用 list_files",
+                    "snapshot": snapshot_id,
+                }, ensure_ascii=False)
+            changes = sorted(
+                [(n, "added") for n in names - previous if match(n)]
+                + [(n, "removed") for n in previous - names if match(n)]
+            )
+            page, next_cursor = _paginate(changes, cursor, page_size, token_budget, key=lambda c: c[0])
+            return json.dumps({
+                "added": [n for n, kind in page if kind == "added"],
+                "removed": [n for n, kind in page if kind == "removed"],
+                "total": len(changes),
+                "next_cursor": next_cursor,
+                "snapshot": snapshot_id,
+            }, ensure_ascii=False)
+
+        # 排序后才能用“上一页最后一个名字”当游标，翻页途中目录有增删也不会重复或错位
+        matched = sorted(n for n in names if match(n))
+        page, next_cursor = _paginate(matched, cursor, page_size, token_budget)
         # 必须返回 JSON 字符串，而不是 Python 列表
-        return json.dumps({"files": files}, ensure_ascii=False)
-        
+        return json.dumps({
+            "files": page,
+            "total": len(matched),
+            "next_cursor": next_cursor,
+            "snapshot": snapshot_id,
+        }, ensure_ascii=False)
+
     except Exception as e:
         return json.dumps({"error": str(e)}, ensure_ascii=False)
 
@@ -63,9 +220,8 @@ def move_file(args):
         if not os.path.exists(source_file):
             return json.dumps({"error": f"文件不存在: {filename}"}, ensure_ascii=False)
 
-        # 检查并创建目标目录
-        if not os.path.exists(target_folder):
-            os.makedirs(target_folder)
+        # 创建目标目录：同一批并发移动到同一分类时，exist_ok 避免“先检查再创建”的竞争
+        os.makedirs(target_folder, exist_ok=True)
             
         # 移动文件
         shutil.move(source_file, target_file)
@@ -81,13 +237,310 @@ def move_file(args):
         return json.dumps({"error": str(e)}, ensure_ascii=False)
 
 # ==========================================
-# 3. 工具导出 (Mapping & Schema)
+# 4. 批量移动 + 追加式日志 (可续跑、可撤销)
+# ==========================================
+# 日志每行一个 JSON：
+#   {"run": id, "op": "plan", "moves": [[filename, category], ...]}  开始前写下完整计划
+#   {"run": id, "op": "done", "filename": ..., "category": ...}     每完成一个写一行
+#   {"run": id, "op": "commit"}                                        整批结束
+#   {"run": id, "op": "undo", "filename": ..., "category": ...}     撤销时每还原一个写一行
+
+def _journal_path():
+    return os.path.join(BASE_PATH, JOURNAL_NAME)
+
+def _is_safe_name(name):
+    """文件名和分类名都只能是单层名字，不能借机跳出 BASE_PATH"""
+    return bool(name) and name not in (".", "..") and "/" not in name and "\\" not in name
+
+JOURNAL_FLUSH_EVERY = 1000   # 每完成这么多个移动才落一次盘
+
+def _execute_moves(run_id, moves, journal):
+    """按计划执行移动，返回 (成功数, 错误列表, 各分类计数)"""
+    moved = 0
+    errors = []
+    per_category = {}
+    base_dev = os.stat(BASE_PATH).st_dev
+    same_fs = {}    # 分类目录 -> 是否和 BASE_PATH 在同一文件系统
+    occupied = {}   # 分类目录 -> 已有的文件名集合，代替逐个 exists 检查
+    pending = []    # 还没写进日志的 done 记录
+
+    def flush():
+        if pending:
+            journal.write("".join(pending))
+            journal.flush()
+            pending.clear()
+
+    for filename, category in moves:
+        source_file = os.path.join(BASE_PATH, filename)
+        target_folder = os.path.join(BASE_PATH, category)
+        target_file = os.path.join(target_folder, filename)
+        try:
+            # 每个分类目录只创建/扫描一次
+            if category not in same_fs:
+                os.makedirs(target_folder, exist_ok=True)
+                same_fs[category] = os.stat(target_folder).st_dev == base_dev
+                with os.scandir(target_folder) as entries:
+                    occupied[category] = {e.name for e in entries}
+            if filename in occupied[category]:
+                raise FileExistsError(f"目标已存在: {category}/{filename}")
+            if same_fs[category]:
+                # 同一文件系统：rename 只改目录项，不拷贝数据，也省掉 shutil.move 的额外判断
+                os.rename(source_file, target_file)
+            else:
+                shutil.move(source_file, target_file)
+        except Exception as e:
+            errors.append({"filename": filename, "error": str(e)})
+            continue
+
+        moved += 1
+        occupied[category].add(filename)
+        per_category[category] = per_category.get(category, 0) + 1
+        pending.append(json.dumps({"run": run_id, "op": "done", "filename": filename, "category": category},
+                                  ensure_ascii=False) + "\n")
+        # 日志分批落盘；两次落盘之间崩溃的话，resume 会按“源已不在、目标已在”认出这些已完成的移动
+        if len(pending) >= JOURNAL_FLUSH_EVERY:
+            flush()
+
+    flush()
+    return moved, errors, per_category
+
+def _summary(run_id, planned, moved, errors, per_category, max_errors=10):
+    """一条紧凑的汇总，代替 N 个 move_file 的 JSON 结果"""
+    result = {
+        "status": "success" if not errors else "partial",
+        "run_id": run_id,
+        "planned": planned,
+        "moved": moved,
+        "failed": len(errors),
+        "by_category": per_category,
+    }
+    if errors:
+        result["errors"] = errors[:max_errors]
+    return json.dumps(result, ensure_ascii=False)
+
+def move_files(args):
+    """
+    批量移动文件。
+    Args:
+        args (dict): {"moves": [{"filename": ..., "category": ...}, ...]}
+    返回: 一条汇总 JSON 字符串 (含 run_id，可用于撤销)
+    """
+    items = args.get("moves") or []
+    if not os.path.exists(BASE_PATH):
+        return json.dumps({"error": f"找不到目录 {TARGET_DIR_NAME}"}, ensure_ascii=False)
+
+    moves = []
+    errors = []
+    seen = set()
+    for item in items:
+        filename = item.get("filename")
+        category = item.get("category")
+        if not _is_safe_name(filename) or not _is_safe_name(category):
+            errors.append({"filename": filename, "error": "filename/category 缺失或不合法"})
+        elif filename in seen:
+            errors.append({"filename": filename, "error": "同一批次里重复出现"})
+        else:
+            seen.add(filename)
+            moves.append((filename, category))
+
+    run_id = uuid.uuid4().hex[:12]
+    with open(_journal_path(), "a", encoding="utf-8") as journal:
+        # 先把完整计划落盘，中途崩溃也知道还剩哪些没做
+        journal.write(json.dumps({"run": run_id, "op": "plan", "moves": moves}, ensure_ascii=False) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+        moved, move_errors, per_category = _execute_moves(run_id, moves, journal)
+        journal.write(json.dumps({"run": run_id, "op": "commit"}) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+    return _summary(run_id, len(items), moved, errors + move_errors, per_category)
+
+def _read_journal():
+    """按 run 汇总日志：{run_id: {"plan": [...], "done": [...], "undone": set, "committed": bool}}"""
+    runs = {}
+    if not os.path.exists(_journal_path()):
+        return runs
+    with open(_journal_path(), "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 最后一行可能在崩溃时只写了一半
+                continue
+            run = runs.setdefault(entry["run"], {"plan": [], "done": [], "undone": set(), "committed": False})
+            if entry["op"] == "plan":
+                run["plan"] = [tuple(m) for m in entry["moves"]]
+            elif entry["op"] == "done":
+                run["done"].append((entry["filename"], entry["category"]))
+            elif entry["op"] == "undo":
+                run["undone"].add((entry["filename"], entry["category"]))
+            elif entry["op"] == "commit":
+                run["committed"] = True
+    return runs
+
+def _moved_on_disk(filename, category):
+    """源文件已经不在、目标位置有了：说明这一步已经 rename 过，不管 done 有没有写进日志"""
+    return (not os.path.lexists(os.path.join(BASE_PATH, filename))
+            and os.path.lexists(os.path.join(BASE_PATH, category, filename)))
+
+def resume_moves(run_id=None):
+    """把中断的批次 (有 plan 没有 commit) 做完；不指定 run_id 就处理所有中断的批次"""
+    results = []
+    for rid, run in _read_journal().items():
+        if run["committed"] or (run_id and rid != run_id):
+            continue
+        done = set(run["done"])
+        # 崩溃可能发生在“已经 rename、还没写 done”之间：源文件没了且目标已在，视为完成
+        remaining = [
+            (filename, category) for filename, category in run["plan"]
+            if (filename, category) not in done and not _moved_on_disk(filename, category)
+        ]
+        with open(_journal_path(), "a", encoding="utf-8") as journal:
+            moved, errors, per_category = _execute_moves(rid, remaining, journal)
+            journal.write(json.dumps({"run": rid, "op": "commit"}) + "\n")
+        results.append(json.loads(_summary(rid, len(remaining), moved, errors, per_category)))
+    return json.dumps({"resumed": results}, ensure_ascii=False)
+
+def undo_moves(run_id):
+    """
+    按完成顺序的倒序，把某个批次移动过的文件放回原处。
+    中断的批次 (没有 commit) 最后一批 done 可能还没落盘，所以计划里“源已不在、目标已在”的条目也一并还原。
+    """
+    run = _read_journal().get(run_id)
+    if run is None:
+        return json.dumps({"error": f"日志里没有批次 {run_id}"}, ensure_ascii=False)
+
+    moves = list(reversed(run["done"]))
+    if not run["committed"]:
+        logged = set(run["done"])
+        moves += [m for m in reversed(run["plan"]) if m not in logged and _moved_on_disk(*m)]
+
+    restored = 0
+    errors = []
+    with open(_journal_path(), "a", encoding="utf-8") as journal:
+        for filename, category in moves:
+            if (filename, category) in run["undone"]:
+                continue
+            source_file = os.path.join(BASE_PATH, category, filename)
+            target_file = os.path.join(BASE_PATH, filename)
+            try:
+                if os.path.lexists(target_file):
+                    raise FileExistsError(f"原位置已有同名文件: {filename}")
+                shutil.move(source_file, target_file)
+            except Exception as e:
+                errors.append({"filename": filename, "error": str(e)})
+                continue
+            restored += 1
+            journal.write(json.dumps({"run": run_id, "op": "undo", "filename": filename, "category": category},
+                                     ensure_ascii=False) + "\n")
+    return json.dumps({"run_id": run_id, "restored": restored, "failed": len(errors), "errors": errors[:10]},
+                      ensure_ascii=False)
+
+# ==========================================
+# 5. 工具缓存：只读工具记忆化，写操作精确失效
+# ==========================================
+# mtime 精度最粗的文件系统 (FAT、部分 SMB/NFS) 是 2 秒：同一个刻度里的第二次改动不会让 mtime 变化
+MTIME_GRANULARITY_NS = 2_000_000_000
+
+def dir_signature(path):
+    """
+    目录的廉价指纹 (mtime, size, nlink, 条目数)，目录不存在返回 None。
+    平时只 stat 一次；只有 mtime 离现在不到一个精度刻度时才 listdir 数条目 ——
+    这时同一刻度里再来的改动可能不改 mtime，而 mtime 已经“过去”的目录只要再变，mtime 一定会变。
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    racy = time.time_ns() - st.st_mtime_ns < MTIME_GRANULARITY_NS
+    return (st.st_mtime_ns, st.st_size, st.st_nlink, len(os.listdir(path)) if racy else None)
+
+class ToolCache:
+    """
+    只读工具的结果按 (工具名, 参数) 缓存，并记下它依赖的目录当时的指纹 (dir_signature)。
+    - 命中前先核对目录：指纹变了就算过期
+    - 写工具执行后，依赖它改动过的目录的缓存条目立即删除，不等下一次核对
+    目录稳定时核对只需一次 stat，和目录里有多少文件无关；只有刚改动过的目录才会多一次 listdir。
+    """
+
+    def __init__(self):
+        self._entries = {}   # (工具名, 参数键) -> (依赖目录, 目录指纹, 结果)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def _fingerprint(dirs):
+        return tuple((d, dir_signature(d)) for d in dirs)
+
+    def read(self, name, fn, deps):
+        """包装只读工具；deps(args) 返回它读取的目录列表"""
+        def cached(args=None):
+            key = (name, json.dumps(args or {}, sort_keys=True, ensure_ascii=False))
+            dirs = deps(args or {})
+            fingerprint = self._fingerprint(dirs)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] == fingerprint:
+                    self.hits += 1
+                    return entry[2]
+                if entry is not None:
+                    self.stale += 1
+                self.misses += 1
+            result = fn(args)
+            # 报错的结果 (例如目录还没生成) 不缓存
+            if not result.startswith('{"error"'):
+                with self._lock:
+                    self._entries[key] = (dirs, fingerprint, result)
+            return result
+        return cached
+
+    def write(self, name, fn, deps):
+        """包装写工具；deps(args) 返回它可能改动的目录列表"""
+        def invalidating(args):
+            try:
+                return fn(args)
+            finally:
+                self.invalidate(deps(args or {}))
+        return invalidating
+
+    def invalidate(self, dirs):
+        dirs = set(dirs)
+        with self._lock:
+            victims = [key for key, (deps, _, _) in self._entries.items() if dirs.intersection(deps)]
+            for key in victims:
+                del self._entries[key]
+            self.invalidated += len(victims)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "stale": self.stale,
+                "invalidated": self.invalidated, "hit_rate": self.hits / total if total else 0.0}
+
+tool_cache = ToolCache()
+
+def _move_deps(args):
+    """移动会改动根目录和目标分类目录"""
+    categories = {m.get("category") for m in args.get("moves") or []} | {args.get("category")}
+    return [BASE_PATH] + [os.path.join(BASE_PATH, c) for c in categories if _is_safe_name(c)]
+
+# ==========================================
+# 6. 工具导出 (Mapping & Schema)
 # ==========================================
 
 # 函数映射表 (供主程序调用)
+# 注意 deps 里的 BASE_PATH 是调用时才读取的，基准脚本临时替换 BASE_PATH 也能生效
 available_functions = {
-    "list_files": list_files,
-    "move_file": move_file
+    "list_files": tool_cache.read("list_files", list_files, deps=lambda args: [BASE_PATH]),
+    "move_file": tool_cache.write("move_file", move_file, deps=_move_deps),
+    "move_files": tool_cache.write("move_files", move_files, deps=_move_deps),
 }
 
 # 工具定义 (供 LLM 阅读)
@@ -96,10 +549,23 @@ tools_schema = [
         "type": "function",
         "function": {
             "name": "list_files",
-            "description": "查看当前文件夹里有哪些文件待处理。",
+            "description": "查看当前文件夹里有哪些文件待处理。结果分页返回：next_cursor 不为空时，带上它再调用一次获取下一页。",
             "parameters": {
                 "type": "object", 
-                "properties": {}
+                "properties": {
+                    "pattern": {"type": "string", "description": "可选，glob 通配符过滤文件名，例如 '*合同*'"},
+                    "extensions": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "可选，只看这些后缀，例如 ['.pdf', '.docx']"
+                    },
+                    "cursor": {"type": "string", "description": "可选，上一页返回的 next_cursor"},
+                    "since": {
+                        "type": "string",
+                        "description": "可选，上次返回的 snapshot；只返回那之后新增 (added) 和消失 (removed) 的文件"
+                    },
+                    "page_size": {"type": "integer", "description": f"可选，单页最多多少个文件，默认 {LIST_PAGE_SIZE}"}
+                }
             }
         }
     },
@@ -123,5 +589,45 @@ tools_schema = [
                 "required": ["filename", "category"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "move_files",
+            "description": "批量移动文件：一次调用移动多个文件到各自的目标文件夹，返回一条汇总结果。文件较多时优先使用它。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "moves": {
+                        "type": "array",
+                        "description": "移动计划列表",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "filename": {"type": "string", "description": "源文件名"},
+                                "category": {"type": "string", "description": "目标文件夹名称"}
+                            },
+                            "required": ["filename", "category"]
+                        }
+                    }
+                },
+                "required": ["moves"]
+            }
+        }
     }
-]
\ No newline at end of file
+]
+
+# ==========================================
+# 7. 命令行：续跑 / 撤销批量移动
+# ==========================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="根据移动日志续跑或撤销批量移动")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--resume", nargs="?", const="", metavar="RUN_ID", help="续跑中断的批次 (不填则全部)")
+    group.add_argument("--undo", metavar="RUN_ID", help="撤销指定批次")
+    cli_args = parser.parse_args()
+
+    if cli_args.undo:
+        print(undo_moves(cli_args.undo))
+    else:
+        print(resume_moves(cli_args.resume or None))
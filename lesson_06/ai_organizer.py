@@ -1,9 +1,14 @@
 import os
 import json
+import time
 import shutil
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from dotenv import load_dotenv
-from agent_tools import tools_schema, available_functions
+from agent_tools import tools_schema, available_functions, classify_filename, render_rules_prompt, tool_cache
+from tool_executor import execute_tool_calls, TOOL_WORKERS
+from context_manager import ContextManager, CONTEXT_TOKEN_BUDGET
 # 加载环境变量
 load_dotenv()
 client = OpenAI(
@@ -61,91 +66,125 @@ def move_file(args):
 
 
 # ==========================================
-# Agent 主程序 (大脑与循环)
+# 本地快速通道 (规则能确定的文件不必劳烦大模型)
 # ==========================================
-def run_agent():
+def pre_classify(names=None):
+    """
+    按 agent_tools 里的规则表直接移动能确定归属的文件。
+    names 为空时扫描整个目录；监听模式只传入新到的那一小批文件名。
+    返回 (已移动数量, 留给 Agent 的文件名列表)。
+    """
+    if not os.path.exists(BASE_PATH):
+        return 0, []
 
-    # --- System Prompt: 赋予它灵魂 ---
-    system_prompt = """
+    moved = 0
+    ambiguous = []
+    if names is None:
+        with os.scandir(BASE_PATH) as entries:
+            names = [e.name for e in entries if e.is_file() and not e.name.startswith('.')]
+
+    moves = []
+    for name in names:
+        category = classify_filename(name)
+        if category is None:
+            ambiguous.append(name)
+        else:
+            moves.append({"filename": name, "category": category})
+
+    if moves:
+        # 一次批量移动，代替逐个 move_file
+        result = json.loads(available_functions["move_files"]({"moves": moves}))
+        moved = result.get("moved", 0)
+        ambiguous.extend(err["filename"] for err in result.get("errors", []) if err.get("filename"))
+    return moved, ambiguous
+
+# ==========================================
+# Agent 主程序 (大脑与循环)
+# ==========================================
+SYSTEM_PROMPT = f"""
         你是一个专业的文件整理智能助手。你的目标是将杂乱的文件夹整理得井井有条。
 
         【执行流程】
-        1. 首先调用 `list_files` 获取所有文件。
+        1. 首先调用 `list_files` 获取文件；结果是分页的，next_cursor 不为空就带上 cursor 继续翻页。
         2. 针对每个文件，分析其文件名和后缀，决定其归属。
-        3. 调用 `move_file` 执行移动。
+        3. 调用 `move_files` 一次性批量移动 (零星文件也可以用 `move_file` 逐个移动)。
 
-        【核心规则 - 优先级最高】
-        如果文件名中包含明确的中文语义，请无视后缀，优先建立中文语义文件夹：
-        - 包含“发票”、“报销” -> 移动到 "财务发票"
-        - 包含“合同”、“协议” -> 移动到 "合同文件"
-        - 包含“简历” -> 移动到 "候选人简历"
-        
-        【次要策略】(次要优先级)
-        请根据文件类型建立文件夹，规则如下：
-        - 图片: 图片文件 (.jpg, .png, .gif, .svg 等)
-        - 文档: 文档文件 (.pdf, .docx, .txt, .md 等)
-        - 数据: 数据表格 (.xlsx, .csv, .json)
-        - 代码: 代码脚本 (.py, .js, .html, .css)
-        - 压缩包: 压缩包 (.zip, .rar, .7z)
+{render_rules_prompt()}
 
         【注意事项】
         - 强烈建议并行调用工具以提高效率，或者一次性调整多个文件的位置。
-        - 遇到无法识别的文件，归类到 "其他"。
 
         【检查核验】
         - 在你认为已经完成工作后，应该再次调用 `list_files` 方法检查结果，确认是否符合预期
+        - 复查时可以带上第一次返回的 snapshot 作为 since 参数，只看变化的文件，不必重新翻完所有页
         """
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": "请帮我整理一下文件夹里的文件，现在的太乱了。"}
-    ]
+def run_agent(user_request="请帮我整理一下文件夹里的文件，现在的太乱了。", tool_workers=TOOL_WORKERS,
+              context_budget=CONTEXT_TOKEN_BUDGET, compaction=True):
+    """跑一遍 ReAct 循环，返回 {"llm_calls", "tool_calls", "seconds", "context"} 统计"""
+
+    # --- System Prompt: 赋予它灵魂 ---
+    system_prompt = SYSTEM_PROMPT
+
+    # 历史消息交给 ContextManager：旧的工具结果压成摘要，总量控制在预算内
+    context = ContextManager(system_prompt, user_request, token_budget=context_budget, compaction=compaction)
 
     print(f"🤖 Agent 启动! 正在监管目录: {TARGET_DIR_NAME}")
     print("-" * 50)
 
     # 循环限制，防止死循环
     MAX_TURNS = 60
-    
+    stats = {"llm_calls": 0, "tool_calls": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    tool_cache.reset_stats()   # 缓存命中率按每次运行统计
+
     for turn in range(MAX_TURNS):
         print(f"🔄 第 {turn + 1} 轮思考中...")
         
         # 1. 呼叫大模型
+        messages = context.messages()
+        sent_tokens = context.estimated_tokens()
+        llm_start = time.perf_counter()
         response = client.chat.completions.create(
             model="deepseek-chat",
             messages=messages,
             tools=tools_schema,
         )
-        
+        llm_ms = (time.perf_counter() - llm_start) * 1000
+        stats["llm_calls"] += 1
+        context.record_turn(turn + 1, response.usage, llm_ms, sent_tokens)
+        prompt_tokens = getattr(response.usage, "prompt_tokens", None)
+        print(f"   🧮 上下文 ≈{sent_tokens} tokens (接口计 {prompt_tokens}) | 大模型耗时 {llm_ms:.0f}ms")
+
         ai_message = response.choices[0].message
-        messages.append(ai_message) # 必须把 AI 的回复加入历史
+        context.add_assistant(ai_message) # 必须把 AI 的回复加入历史
 
         # 2. 检查是否有工具调用
         if ai_message.tool_calls:
             print(f"⚡ 触发了 {len(ai_message.tool_calls)} 个操作请求!")
             
-            # 3. 遍历并执行所有工具调用 (Parallel Function Calling)
-            for tool_call in ai_message.tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                # 打印日志
-                if function_name == "move_file":
-                    print(f"   📂 移动: {function_args['filename']} -> [{function_args['category']}]")
+            # 3. 并发执行所有工具调用 (Parallel Function Calling)
+            #    互不冲突的调用放进线程池一起跑，有依赖的 (同一个文件、移动前后的 list_files) 保持原顺序
+            batch_start = time.perf_counter()
+            results = execute_tool_calls(ai_message.tool_calls, available_functions, max_workers=tool_workers)
+            batch_ms = (time.perf_counter() - batch_start) * 1000
+
+            for result in results:
+                function_name = result["name"]
+                function_args = result["args"]
+
+                # 打印日志 (附带单个调用的耗时)
+                if function_name == "move_file" and "filename" in function_args:
+                    print(f"   📂 移动: {function_args['filename']} -> [{function_args.get('category')}] "
+                          f"({result['latency_ms']:.1f}ms)")
                 else:
-                    print(f"   👀 执行: {function_name}")
-
-                # 真正的执行环节
-                function_to_call = available_functions[function_name]
-                function_response = function_to_call(function_args)
-
-                # 4. 将结果反馈给 AI
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": function_name,
-                    "content": function_response,
-                })
+                    print(f"   👀 执行: {function_name} ({result['latency_ms']:.1f}ms)")
+                stats["tool_calls"] += 1
+
+                # 4. 将结果按 tool_call 的原始顺序反馈给 AI
+                context.add_tool_result(result["tool_call"].id, function_name, result["content"])
+            serial_ms = sum(r["latency_ms"] for r in results)
+            print(f"   ⏱️ 本轮工具总耗时 {batch_ms:.1f}ms (串行累计 {serial_ms:.1f}ms)")
         else:
             # 如果没有工具调用，说明任务结束，AI 给出了总结
             print("-" * 50)
@@ -153,5 +192,154 @@ def run_agent():
             print(ai_message.content)
             break
 
+    stats["seconds"] = time.perf_counter() - started
+    stats["context"] = context.summary()
+    stats["tool_cache"] = tool_cache.stats()
+    stats["turns"] = context.turn_stats
+    return stats
+
+# ==========================================
+# 先规划后执行 (Plan-then-Execute)：一次 JSON 调用拿到完整计划，本地执行
+# ==========================================
+PLAN_CHUNK_FILES = 300    # 每次请求塞多少个文件名，太多会超出上下文、输出也容易被截断
+PLAN_WORKERS = 4          # 多个分块同时请求
+PLAN_RETRIES = 1          # 计划里漏掉/写错的文件，再单独请求几次
+
+PLAN_SYSTEM_PROMPT = f"""
+        你是一个专业的文件整理智能助手。用户会给出一批文件名，请一次性给出完整的整理计划。
+
+{render_rules_prompt()}
+
+        【输出格式】
+        严格输出 JSON，禁止包含 markdown：
+        {{"moves": [{{"filename": "原文件名", "category": "目标文件夹名"}}, ...]}}
+        - 每个文件都必须出现且只出现一次，filename 必须和给出的名字一字不差
+        - category 只能是单层文件夹名，不能包含 / 或 \\
+        """
+
+def request_plan(files):
+    """对一个分块发起一次 json_object 调用，返回 {文件名: 分类}；解析失败返回空字典"""
+    response = client.chat.completions.create(
+        model="deepseek-chat",
+        messages=[
+            {"role": "system", "content": PLAN_SYSTEM_PROMPT},
+            {"role": "user", "content": json.dumps({"files": files}, ensure_ascii=False)},
+        ],
+        response_format={"type": "json_object"},
+    )
+    try:
+        moves = json.loads(response.choices[0].message.content).get("moves") or []
+    except (ValueError, AttributeError):
+        return {}
+    return {m.get("filename"): m.get("category") for m in moves if isinstance(m, dict)}
+
+def validate_plan(files, plan):
+    """只接受本批次里真实存在、分类名合法的条目；其余算作未分类"""
+    accepted = []
+    missing = []
+    for name in files:
+        category = plan.get(name)
+        category = category.strip() if isinstance(category, str) else ""
+        if category and "/" not in category and "\\" not in category and category not in (".", ".."):
+            accepted.append({"filename": name, "category": category})
+        else:
+            missing.append(name)
+    return accepted, missing
+
+def run_plan_mode(files=None, chunk_size=PLAN_CHUNK_FILES, workers=PLAN_WORKERS):
+    """
+    不走 ReAct 循环：把文件清单直接放进提示词，分块并发拿到计划，
+    校验后用一次 move_files 执行。返回与 run_agent 相同形状的统计。
+    """
+    started = time.perf_counter()
+    if files is None:
+        with os.scandir(BASE_PATH) as entries:
+            files = sorted(e.name for e in entries if e.is_file() and not e.name.startswith('.'))
+    stats = {"llm_calls": 0, "tool_calls": 0, "seconds": 0.0, "moved": 0, "unclassified": []}
+    print(f"📝 规划模式：{len(files)} 个文件，每块 {chunk_size} 个")
+
+    accepted = []
+    pending = list(files)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for attempt in range(PLAN_RETRIES + 1):
+            if not pending:
+                break
+            chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+            plans = list(pool.map(request_plan, chunks))
+            stats["llm_calls"] += len(chunks)
+            pending = []
+            for chunk, plan in zip(chunks, plans):
+                ok, missing = validate_plan(chunk, plan)
+                accepted.extend(ok)
+                pending.extend(missing)
+            print(f"   第 {attempt + 1} 次规划：{len(chunks)} 次调用，还有 {len(pending)} 个文件没有给出有效分类")
+
+    if accepted:
+        result = json.loads(available_functions["move_files"]({"moves": accepted}))
+        stats["tool_calls"] += 1
+        stats["moved"] = result.get("moved", 0)
+        pending.extend(err["filename"] for err in result.get("errors", []) if err.get("filename"))
+
+    stats["unclassified"] = pending
+    stats["seconds"] = time.perf_counter() - started
+    print(f"✅ 已移动 {stats['moved']} 个文件" + (f"，{len(pending)} 个未分类: {pending[:10]}" if pending else ""))
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="AI 文件整理助手")
+    parser.add_argument("--mode", choices=["react", "plan"], default="react",
+                        help="react: 工具调用循环；plan: 一次性生成整理计划再本地执行")
+    parser.add_argument("--plan-chunk", type=int, default=PLAN_CHUNK_FILES, help="plan 模式每次请求的文件数")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="关闭本地规则预分类，所有文件都交给大模型 (用于对比)")
+    parser.add_argument("--tool-workers", type=int, default=TOOL_WORKERS,
+                        help="同一轮内并发执行工具调用的线程数，1 表示串行")
+    parser.add_argument("--context-budget", type=int, default=CONTEXT_TOKEN_BUDGET,
+                        help="每次发给大模型的上下文 token 上限 (估算)")
+    parser.add_argument("--no-compaction", action="store_true",
+                        help="不压缩历史工具结果 (用于对比 token 和延迟)")
+    args = parser.parse_args()
+
+    moved, ambiguous = 0, None
+    if not args.no_fast_path:
+        moved, ambiguous = pre_classify()
+        print(f"⚡ 本地规则直接归类 {moved} 个文件，剩余 {len(ambiguous)} 个需要大模型判断")
+
+    if ambiguous == []:
+        # 全部被规则覆盖，连一次 LLM 调用都不需要
+        stats = {"llm_calls": 0, "tool_calls": 0, "seconds": 0.0}
+        print("✅ 没有需要大模型处理的文件，跳过 Agent。")
+    elif args.mode == "plan":
+        stats = run_plan_mode(ambiguous, chunk_size=args.plan_chunk)
+    elif ambiguous:
+        preview = "、".join(ambiguous[:20]) + (" 等" if len(ambiguous) > 20 else "")
+        stats = run_agent(
+            f"请帮我整理一下文件夹里剩下的 {len(ambiguous)} 个文件，规则明确的文件已经整理好了。"
+            f"这些文件是：{preview}",
+            tool_workers=args.tool_workers,
+            context_budget=args.context_budget,
+            compaction=not args.no_compaction,
+        )
+    else:
+        stats = run_agent(tool_workers=args.tool_workers, context_budget=args.context_budget,
+                          compaction=not args.no_compaction)
+
+    print("-" * 50)
+    print(f"📊 LLM 调用 {stats['llm_calls']} 次 | 工具调用 {stats['tool_calls']} 次 | Agent 耗时 {stats['seconds']:.1f}s")
+    if "tool_cache" in stats:
+        t = stats["tool_cache"]
+        print(f"🗃️ 只读工具缓存命中 {t['hits']} 次 / 未命中 {t['misses']} 次 ({t['hit_rate']:.0%}) | "
+              f"过期 {t['stale']} | 写操作失效 {t['invalidated']}")
+    if "context" in stats:
+        c = stats["context"]
+        print(f"🧮 上下文累计 ≈{c['estimated_tokens']} tokens (不压缩约 {c['uncompacted_tokens']}，"
+              f"节省 {c['saved_ratio']:.0%}) | 接口计 prompt {c['prompt_tokens']} | "
+              f"丢弃 {c['dropped_turns']} 轮 | 大模型总耗时 {c['llm_ms'] / 1000:.1f}s")
+    if moved:
+        # 同一批文件不可能在一次运行里既走规则又不走规则，省下多少次调用要在同一份语料上实测
+        print(f"⚡ 本地规则归类了 {moved} 个文件，没有经过大模型"
+              f"{'，整个 Agent 循环都跳过了' if ambiguous == [] else ''}。"
+              f"实际省下的 LLM 调用和轮数可用 bench_organizer_modes.py --compare-fast-path 测量")
+
 if __name__ == "__main__":
-    run_agent()
\ No newline at end of file
+    main()
\ No newline at end of file
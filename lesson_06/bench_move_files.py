@@ -0,0 +1,70 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import agent_tools
+from agent_tools import move_file, move_files
+
+# ==========================================
+# 基准：逐个 move_file vs 一次 move_files
+# ==========================================
+CATEGORIES = ["图片", "文档", "数据", "代码", "压缩包", "其他"]
+
+def make_corpus(path, count):
+    os.makedirs(path)
+    names = []
+    for i in range(count):
+        name = f"file_{i:07d}.txt"
+        # 空文件就够了，测的是目录操作而不是数据拷贝
+        open(os.path.join(path, name), "w").close()
+        names.append(name)
+    return names
+
+def run_per_file(names):
+    for i, name in enumerate(names):
+        result = json.loads(move_file({"filename": name, "category": CATEGORIES[i % len(CATEGORIES)]}))
+        if result.get("status") != "success":
+            raise RuntimeError(result)
+
+def run_bulk(names):
+    moves = [{"filename": name, "category": CATEGORIES[i % len(CATEGORIES)]} for i, name in enumerate(names)]
+    result = json.loads(move_files({"moves": moves}))
+    if result["moved"] != len(names):
+        raise RuntimeError(result)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="对比逐个 move_file 和批量 move_files 的耗时")
+    parser.add_argument("--count", type=int, default=100_000, help="测试文件数量")
+    parser.add_argument("--dir", help="在哪个目录下建测试文件 (默认系统临时目录)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_move_", dir=args.dir)
+    rows = []
+    try:
+        for label, runner in [("move_file × N", run_per_file), ("move_files × 1", run_bulk)]:
+            corpus = os.path.join(workdir, label.split()[0])
+            print(f"📁 [{label}] 正在生成 {args.count} 个文件...")
+            names = make_corpus(corpus, args.count)
+            # 两个工具都从 BASE_PATH 读写，这里临时指向测试目录
+            agent_tools.BASE_PATH = corpus
+
+            start = time.perf_counter()
+            runner(names)
+            elapsed = time.perf_counter() - start
+            rows.append((label, elapsed))
+            print(f"   耗时 {elapsed:.2f}s，{args.count / elapsed:,.0f} 个/秒")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("=" * 48)
+    baseline = rows[0][1]
+    for label, elapsed in rows:
+        print(f"{label:<16}{elapsed:>10.2f}s{baseline / elapsed:>10.1f}x")
+    print("=" * 48)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import urllib.request
+
+import ai_organizer
+from agent_tools import classify_filename, FALLBACK_CATEGORY
+from generate_files import read_manifest, score_corpus
+
+# ==========================================
+# ReAct vs 先规划后执行：同一份语料上对比耗时、LLM 调用次数和准确率
+# ==========================================
+# 每种模式前都用同一个种子重新生成语料，保证面对的文件完全一样。
+# --compare-fast-path 会让每种模式各跑一次“关闭/开启本地规则”，实测规则省下的 LLM 调用和轮数。
+# 离线跑的话先启动 tools/mock_llm_server.py，并把 DEEP_SEEK_API_URL 指向它。
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def regenerate(seed, count):
+    subprocess.run(
+        [sys.executable, os.path.join(HERE, "generate_files.py"),
+         "--seed", str(seed), "--count", str(count), "--no-open"],
+        cwd=HERE, check=True, capture_output=True,
+    )
+
+def mock_server_info():
+    """DEEP_SEEK_API_URL 指向 tools/mock_llm_server.py 时返回它的 /stats，否则返回 None"""
+    base = os.getenv("DEEP_SEEK_API_URL", "").rstrip("/")
+    if not base:
+        return None
+    try:
+        with urllib.request.urlopen(f"{base}/stats", timeout=2) as response:
+            info = json.load(response)
+    except (OSError, ValueError):
+        return None
+    return info if isinstance(info, dict) and info.get("mock") else None
+
+def rules_agreement():
+    """规则表 (模拟服务也用它作答) 和清单标准答案一致的比例，即模拟服务不故意分错时的准确率上限"""
+    _, entries = read_manifest()
+    agree = sum((classify_filename(e["path"].rsplit("/", 1)[-1]) or FALLBACK_CATEGORY) == e["category"]
+                for e in entries)
+    return agree / len(entries) if entries else 0.0
+
+def run_mode(mode, args, fast_path):
+    ambiguous = None
+    if fast_path:
+        _, ambiguous = ai_organizer.pre_classify()
+        if not ambiguous:
+            return {"llm_calls": 0, "tool_calls": 0, "seconds": 0.0}
+    if mode == "plan":
+        return ai_organizer.run_plan_mode(ambiguous, chunk_size=args.plan_chunk)
+    request = "请帮我整理一下文件夹里的文件，现在的太乱了。"
+    if ambiguous:
+        request = f"请帮我整理一下文件夹里剩下的 {len(ambiguous)} 个文件，规则明确的文件已经整理好了。"
+    return ai_organizer.run_agent(request)
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 ReAct 与先规划后执行两种整理模式")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--count", type=int, default=200, help="语料文件数")
+    parser.add_argument("--modes", nargs="+", choices=["react", "plan"], default=["react", "plan"])
+    parser.add_argument("--plan-chunk", type=int, default=ai_organizer.PLAN_CHUNK_FILES)
+    parser.add_argument("--fast-path", action="store_true", help="先走本地规则，只把剩下的交给大模型")
+    parser.add_argument("--compare-fast-path", action="store_true",
+                        help="每种模式都分别关闭/开启本地规则跑一次，报告规则实际省下的调用")
+    args = parser.parse_args()
+
+    variants = (False, True) if args.compare_fast_path else (args.fast_path,)
+    rows = []
+    for mode in args.modes:
+        for fast_path in variants:
+            print(f"\n================ {mode} | 本地规则{'开启' if fast_path else '关闭'} ================")
+            regenerate(args.seed, args.count)
+            stats = run_mode(mode, args, fast_path)
+            score = score_corpus()
+            rows.append((mode, fast_path, stats["llm_calls"], stats["tool_calls"], stats["seconds"],
+                         score["accuracy"]))
+
+    print("\n" + "=" * 70)
+    print(f"📊 种子 {args.seed} | {args.count} 个文件")
+    print(f"{'模式':<10}{'本地规则':>8}{'LLM调用':>10}{'工具调用':>10}{'耗时(s)':>12}{'准确率':>10}")
+    for mode, fast_path, llm_calls, tool_calls, seconds, accuracy in rows:
+        print(f"{mode:<10}{'开' if fast_path else '关':>8}{llm_calls:>10}{tool_calls:>10}{seconds:>12.2f}"
+              f"{accuracy:>10.1%}")
+    print("=" * 70)
+    mock = mock_server_info()
+    if mock is not None:
+        # 模拟服务按规则表作答，准确率说明不了模型的分类能力
+        agreement = rules_agreement()
+        expected = agreement * (1 - mock["misclassify_rate"])
+        print(f"⚠️ 当前连的是模拟服务：准确率没有衡量分类能力，只检查整理流程是否原样执行了模型的答案 "
+              f"(规则表与清单一致 {agreement:.0%}，模拟服务再故意分错 {mock['misclassify_rate']:.0%}，"
+              f"全部交给模拟服务且流程无损时准确率约为 {expected:.0%})")
+    if args.compare_fast_path:
+        # ReAct 模式每一轮正好是一次 LLM 调用，所以省下的调用数就是省下的轮数
+        for base, fast in zip(rows[::2], rows[1::2]):
+            print(f"💰 {base[0]}：本地规则省下 {base[2] - fast[2]} 次 LLM 调用 ({base[2]} → {fast[2]})，"
+                  f"{base[3] - fast[3]} 次工具调用，{base[4] - fast[4]:.2f}s")
+
+if __name__ == "__main__":
+    main()
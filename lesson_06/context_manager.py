@@ -0,0 +1,153 @@
+import json
+
+# ==========================================
+# 配置
+# ==========================================
+CONTEXT_TOKEN_BUDGET = 24000   # 每次发给大模型的上下文 (估算) 上限
+KEEP_RAW_TURNS = 1             # 最近几轮的工具结果保留原文，更早的已经被 AI 看过并处理，压成摘要
+DIGEST_MAX_CHARS = 200         # 认不出结构的工具结果，摘要最多保留这么多字
+
+def estimate_tokens(text):
+    """粗估 token 数：中文大约一字一个，ASCII 大约四个字符一个"""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4 + 1
+
+def _message_tokens(message):
+    """估算一条消息的 token；assistant 消息可能是 SDK 对象，工具调用的参数也要算进去"""
+    if isinstance(message, dict):
+        return 4 + estimate_tokens(message.get("content") or "")
+    total = 4 + estimate_tokens(message.content or "")
+    for tool_call in message.tool_calls or []:
+        total += estimate_tokens(tool_call.function.name) + estimate_tokens(tool_call.function.arguments)
+    return total
+
+def digest_tool_result(name, content):
+    """把一条已经处理过的工具结果压成一行摘要，只留后续还可能用到的字段"""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        data = None
+
+    if not isinstance(data, dict):
+        digest = {"digest": name, "preview": content[:DIGEST_MAX_CHARS]}
+    elif "error" in data:
+        digest = {"digest": name, "error": str(data["error"])[:DIGEST_MAX_CHARS]}
+    elif name == "list_files":
+        # 文件名清单是最占地方的部分；snapshot 留着，复查时可以用 since 只看变化
+        listed = data.get("files", data.get("added", []))
+        digest = {"digest": name, "listed": len(listed), "total": data.get("total"),
+                  "next_cursor": data.get("next_cursor"), "snapshot": data.get("snapshot")}
+    elif name == "move_files":
+        digest = {"digest": name, **{k: data.get(k) for k in ("status", "run_id", "moved", "failed")}}
+    elif name == "move_file":
+        digest = {"digest": name, **{k: data.get(k) for k in ("status", "filename", "moved_to")}}
+    else:
+        digest = {"digest": name, "preview": content[:DIGEST_MAX_CHARS]}
+    return json.dumps(digest, ensure_ascii=False)
+
+# ==========================================
+# 上下文管理：按“轮”组织消息，旧结果压缩，超预算就丢最早的轮
+# ==========================================
+class ContextManager:
+    """
+    替代 run_agent 里无限增长的 messages 列表。
+    - 每一轮 = 一条 assistant 消息 + 它触发的 tool 消息，压缩/丢弃都以整轮为单位，
+      保证 tool_call_id 始终能和 assistant 的 tool_calls 对上
+    - 已被后续 assistant 消息“消化”过的工具结果替换成摘要
+    - 估算总量仍超过 token_budget 时，从最早的轮开始丢弃 (system 和用户请求永远保留)
+    - 每轮记录实际 prompt token、估算 token、不压缩时的估算 token 和耗时，便于对比
+    """
+
+    def __init__(self, system_prompt, user_request, token_budget=CONTEXT_TOKEN_BUDGET,
+                 keep_raw_turns=KEEP_RAW_TURNS, compaction=True):
+        self.token_budget = token_budget
+        self.keep_raw_turns = keep_raw_turns
+        self.compaction = compaction
+        self._head = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_request},
+        ]
+        self._turns = []
+        self._raw_tokens = sum(_message_tokens(m) for m in self._head)   # 从不压缩时的累计量
+        self.dropped_turns = 0
+        self.turn_stats = []
+
+    # ---------- 写入 ----------
+    def add_assistant(self, message):
+        self._turns.append({"assistant": message, "tools": [], "compacted": False,
+                            "tokens": _message_tokens(message)})
+        self._raw_tokens += self._turns[-1]["tokens"]
+
+    def add_tool_result(self, tool_call_id, name, content):
+        turn = self._turns[-1]
+        message = {"role": "tool", "tool_call_id": tool_call_id, "name": name, "content": content}
+        turn["tools"].append(message)
+        tokens = _message_tokens(message)
+        turn["tokens"] += tokens
+        self._raw_tokens += tokens
+
+    # ---------- 读取 ----------
+    def messages(self):
+        """压缩后发给大模型的消息列表"""
+        if self.compaction:
+            self._compact()
+        messages = list(self._head)
+        for turn in self._turns:
+            messages.append(turn["assistant"])
+            messages.extend(turn["tools"])
+        return messages
+
+    def estimated_tokens(self):
+        return sum(_message_tokens(m) for m in self._head) + sum(t["tokens"] for t in self._turns)
+
+    # ---------- 压缩 ----------
+    def _digest_turn(self, turn):
+        if turn["compacted"]:
+            return
+        for message in turn["tools"]:
+            message["content"] = digest_tool_result(message["name"], message["content"])
+        turn["tokens"] = _message_tokens(turn["assistant"]) + sum(_message_tokens(m) for m in turn["tools"])
+        turn["compacted"] = True
+
+    def _compact(self):
+        # 1. 已经被 AI 处理过的旧工具结果 -> 摘要
+        acted_on = len(self._turns) - self.keep_raw_turns
+        for turn in self._turns[:max(0, acted_on)]:
+            self._digest_turn(turn)
+
+        # 2. 还超预算：先把剩下的原文也压掉 (最新一轮除外)，再从最早的轮开始整轮丢弃
+        for turn in self._turns[:-1]:
+            if self.estimated_tokens() <= self.token_budget:
+                return
+            self._digest_turn(turn)
+        while len(self._turns) > 1 and self.estimated_tokens() > self.token_budget:
+            self._turns.pop(0)
+            self.dropped_turns += 1
+
+    # ---------- 统计 ----------
+    def record_turn(self, turn, usage, latency_ms, sent_tokens):
+        """usage 是接口返回的 response.usage (可能为空)"""
+        self.turn_stats.append({
+            "turn": turn,
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "estimated_tokens": sent_tokens,
+            "uncompacted_tokens": self._raw_tokens,
+            "latency_ms": latency_ms,
+        })
+
+    def summary(self):
+        sent = sum(s["estimated_tokens"] for s in self.turn_stats)
+        raw = sum(s["uncompacted_tokens"] for s in self.turn_stats)
+        prompt = [s["prompt_tokens"] for s in self.turn_stats if s["prompt_tokens"] is not None]
+        return {
+            "turns": len(self.turn_stats),
+            "prompt_tokens": sum(prompt) if prompt else None,
+            "estimated_tokens": sent,
+            "uncompacted_tokens": raw,
+            "saved_ratio": 1 - sent / raw if raw else 0.0,
+            "dropped_turns": self.dropped_turns,
+            "llm_ms": sum(s["latency_ms"] for s in self.turn_stats),
+        }
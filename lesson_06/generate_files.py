@@ -1,9 +1,13 @@
 import os
+import json
+import math
+import time
 import random
 import shutil
 import platform
-import sys
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 # ==========================================
 # 1. 丰富的素材库 (随机的灵魂)
@@ -32,6 +36,35 @@ EXT_GROUPS = {
     "Media":   [".mp4", ".mp3", ".wav"]
 }
 
+# ==========================================
+# 标准答案：由生成器按自己的素材定义给出
+# ==========================================
+# 不能调用整理器的 classify_filename：那样快速通道永远 100% 正确，
+# 规则表没列的后缀 (.xml/.sql/.mp4...) 也只能算“其他”，打分就成了拿规则给规则判卷。
+# 文件名本身带明确用途的素材，不管什么后缀都归到对应分类
+BASE_NAME_CATEGORIES = {
+    "张伟_个人简历": "候选人简历",
+    "增值税电子发票(报销用)": "财务发票",
+    "合同_甲方盖章版": "合同文件",
+}
+# 其余按生成时选的后缀大类归档
+GROUP_CATEGORIES = {
+    "Docs": "文档", "Images": "图片", "Code": "代码", "Archive": "压缩包", "Junk": "其他", "Media": "其他",
+}
+# 大类比整理器的文件夹粗的地方：表格和 JSON 是数据，不是文档/代码
+EXTENSION_CATEGORIES = {".xlsx": "数据", ".json": "数据"}
+
+def expected_category(base_name, type_key, extension):
+    return (BASE_NAME_CATEGORIES.get(base_name)
+            or EXTENSION_CATEGORIES.get(extension)
+            or GROUP_CATEGORIES[type_key])
+
+# 基准语料相关的默认值
+CHUNK_FILES = 2000              # 每个写入任务负责多少个文件
+SUBDIR_FANOUT = 16              # 嵌套目录时每层有多少个子目录
+SIZE_DISTS = ("text", "fixed", "uniform", "lognormal", "pareto")
+MANIFEST_SUFFIX = ".manifest.jsonl"
+
 # ==========================================
 # 2. 核心逻辑
 # ==========================================
@@ -43,10 +76,122 @@ def get_base_dir():
         # 如果是在交互式窗口运行
         return Path(os.getcwd())
 
-def create_test_files():
+def parse_weights(spec, choices):
+    """
+    解析 "Docs=3,Images=1" 这样的权重；没写到的选项权重为 0，spec 为空则全部等权。
+    """
+    if not spec:
+        return [1.0] * len(choices)
+    weights = dict.fromkeys(choices, 0.0)
+    for part in spec.split(","):
+        key, _, value = part.partition("=")
+        key = key.strip()
+        if key not in weights:
+            raise ValueError(f"未知的选项 {key!r}，可选: {', '.join(choices)}")
+        weights[key] = float(value or 1)
+    if not any(weights.values()):
+        raise ValueError(f"权重不能全为 0: {spec}")
+    return [weights[c] for c in choices]
+
+def pick_size(rng, dist, mean):
+    """按分布抽一个文件大小 (字节)；text 表示沿用原来的一句话内容"""
+    if dist == "text" or mean <= 0:
+        return None
+    if dist == "fixed":
+        return mean
+    if dist == "uniform":
+        return rng.randint(0, 2 * mean)
+    if dist == "lognormal":
+        # sigma=1 时均值为 exp(mu + 0.5)，反推 mu 让均值等于 mean
+        return int(rng.lognormvariate(math.log(mean) - 0.5, 1.0))
+    # pareto: alpha=1.5 的长尾，大多数很小、少数很大
+    return int(mean / 3 * rng.paretovariate(1.5))
+
+def plan_files(args):
+    """
+    按种子生成完整的文件计划，逐块产出 [(相对路径, 文件名, 大小, 期望分类), ...]。
+    所有随机数都在这里 (主进程) 用同一个 Random 抽取，写文件的进程只管落盘，
+    所以同一个种子无论开几个进程，生成的语料都完全一样。
+    """
+    rng = random.Random(args.seed)
+    type_keys = list(EXT_GROUPS.keys())
+    group_weights = parse_weights(args.group_weights, type_keys)
+    base_weights = parse_weights(args.name_weights, BASE_NAMES)
+    round_robin = not args.group_weights   # 默认和原来一样轮询大类
+
+    chunk = []
+    for i in range(1, args.count + 1):
+        # 1. 随机组合名字
+        prefix = rng.choice(PREFIXES)
+        base_name = rng.choices(BASE_NAMES, base_weights)[0]
+
+        # 2. 随机选类型 (默认轮询大类；指定权重时按权重抽)
+        type_key = type_keys[i % len(type_keys)] if round_robin else rng.choices(type_keys, group_weights)[0]
+        extension = rng.choice(EXT_GROUPS[type_key])
+
+        # 3. 随机数 + 序号，几百万个文件也不会重名
+        random_suffix = rng.randint(100, 999)
+        file_name = f"{prefix}{base_name}_{random_suffix}_{i}{extension}"
+
+        # 4. 嵌套目录：每层随机挑一个子目录
+        parts = [f"子目录{rng.randrange(args.fanout):02d}" for _ in range(args.depth)]
+        chunk.append(("/".join(parts), file_name, pick_size(rng, args.size_dist, args.size_mean),
+                      expected_category(base_name, type_key, extension)))
+
+        if len(chunk) >= CHUNK_FILES:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_chunk(job):
+    """子进程：把一块文件写到磁盘，返回写入的字节数"""
+    target_path, chunk = job
+    written = 0
+    padding = b"#" * 65536
+    for subdir, file_name, size, _ in chunk:
+        folder = os.path.join(target_path, subdir) if subdir else target_path
+        # 创建文件 (写入一点点内容，防止某些系统把空文件当垃圾清理)
+        header = f"这是 Agent 测试文件: {file_name}".encode("utf-8")
+        try:
+            f = open(os.path.join(folder, file_name), "wb")
+        except FileNotFoundError:
+            os.makedirs(folder, exist_ok=True)
+            f = open(os.path.join(folder, file_name), "wb")
+        with f:
+            if size is None:
+                f.write(header)
+                written += len(header)
+                continue
+            data = header[:size]
+            f.write(data)
+            remaining = size - len(data)
+            while remaining > 0:
+                piece = padding[:remaining]
+                f.write(piece)
+                remaining -= len(piece)
+            written += size
+    return written
+
+def bounded_submit(pool, fn, jobs, max_pending):
+    """同时挂起的任务不超过 max_pending 个，几百万文件的计划不会一次性堆在内存里"""
+    pending = set()
+    for job in jobs:
+        pending.add(pool.submit(fn, job))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from done
+    yield from pending
+
+def manifest_path(target_path):
+    return target_path.parent / (target_path.name + MANIFEST_SUFFIX)
+
+def create_test_files(args):
     # --- 路径准备 ---
     current_dir = get_base_dir()
     target_path = current_dir / TARGET_FOLDER_NAME
+    if args.seed is None:
+        args.seed = random.randrange(2 ** 32)
 
     print(f"脚本位置: {current_dir}")
     print(f"目标目录: {target_path}")
@@ -61,46 +206,50 @@ def create_test_files():
 
     # --- 创建新目录 ---
     target_path.mkdir(parents=True, exist_ok=True)
-    print(f"🚀 开始生成 {FILE_COUNT} 个随机文件...")
+    print(f"🚀 开始生成 {args.count} 个随机文件 (种子 {args.seed}，{args.workers} 个进程)...")
 
-    # --- 循环生成 ---
-    type_keys = list(EXT_GROUPS.keys())
+    # --- 清单：第一行是生成参数，之后每行一个文件及其应归入的分类 ---
+    started = time.perf_counter()
+    done = 0
+    total_bytes = 0
+    with open(manifest_path(target_path), "w", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=args.workers) as pool:
+        meta = {k: getattr(args, k) for k in
+                ("seed", "count", "depth", "fanout", "group_weights", "name_weights", "size_dist", "size_mean")}
+        manifest.write(json.dumps({"meta": meta}, ensure_ascii=False) + "\n")
 
-    for i in range(1, FILE_COUNT + 1):
-        # 1. 随机组合名字
-        prefix = random.choice(PREFIXES)
-        base_name = random.choice(BASE_NAMES)
-        
-        # 2. 随机选类型 (轮询大类，随机后缀)
-        type_key = type_keys[i % len(type_keys)]
-        extension = random.choice(EXT_GROUPS[type_key])
-        
-        # 3. 加个随机数防止重名
-        random_suffix = random.randint(100, 999)
-
-        # 4. 拼装完整路径
-        file_name = f"{prefix}{base_name}_{random_suffix}{extension}"
-        file_path = target_path / file_name
+        def jobs():
+            for chunk in plan_files(args):
+                # 清单在主进程按计划顺序写，和进程完成顺序无关
+                for subdir, file_name, size, category in chunk:
+                    manifest.write(json.dumps({
+                        "path": f"{subdir}/{file_name}" if subdir else file_name,
+                        "category": category,
+                        "size": size,
+                    }, ensure_ascii=False) + "\n")
+                yield str(target_path), chunk
 
-        try:
-            # 创建文件 (写入一点点内容，防止某些系统把空文件当垃圾清理)
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(f"这是 Agent 测试文件: {file_name}")
-            
-            # 打印进度点
-            print(".", end="", flush=True)
-            if i % 10 == 0:
-                print(f" {i}")
-                
-        except Exception as e:
-            print(f"\n❌ 创建失败: {e}")
+        for future in bounded_submit(pool, write_chunk, jobs(), max_pending=args.workers * 2):
+            try:
+                total_bytes += future.result()
+            except Exception as e:
+                print(f"\n❌ 创建失败: {e}")
+                continue
+            done += 1
+            # 打印进度 (每个任务一块)
+            print(f"\r   已写入 {min(done * CHUNK_FILES, args.count)}/{args.count}", end="", flush=True)
 
+    elapsed = time.perf_counter() - started
     print("\n" + "=" * 40)
-    print(f"✅ 大功告成！已生成 {FILE_COUNT} 个文件。")
+    print(f"✅ 大功告成！已生成 {args.count} 个文件，共 {total_bytes / 1024 / 1024:.1f}MB，"
+          f"耗时 {elapsed:.1f}s ({args.count / elapsed:.0f} 个/秒)。")
     print(f"📂 请去这里查看: {target_path}")
+    print(f"🧾 期望分类清单: {manifest_path(target_path)} (整理完后用 --score 打分)")
     print("=" * 40)
 
     # --- 尝试自动打开文件夹 ---
+    if args.no_open:
+        return
     try:
         if platform.system() == "Windows":
             os.startfile(target_path)
@@ -109,5 +258,73 @@ def create_test_files():
     except Exception:
         pass
 
+# ==========================================
+# 3. 打分：对照清单检查整理结果
+# ==========================================
+def read_manifest():
+    """返回 (生成参数, 每个文件的清单条目列表)"""
+    with open(manifest_path(get_base_dir() / TARGET_FOLDER_NAME), "r", encoding="utf-8") as f:
+        meta = json.loads(f.readline())["meta"]
+        return meta, [json.loads(line) for line in f]
+
+def score_corpus():
+    """
+    整理器默认把文件移到 <目标目录>/<分类>/<文件名>。
+    扫一遍整个目录树，按文件名找到每个文件现在所在的文件夹，和清单里的期望分类比对。
+    打印结果并返回汇总字典。
+    """
+    target_path = get_base_dir() / TARGET_FOLDER_NAME
+    located = {}
+    for folder, _, files in os.walk(target_path):
+        rel = os.path.relpath(folder, target_path)
+        for name in files:
+            located[name] = "" if rel == "." else rel.replace(os.sep, "/")
+
+    total = correct = missing = untouched = 0
+    wrong = {}
+    meta, entries = read_manifest()
+    for entry in entries:
+        name = entry["path"].rsplit("/", 1)[-1]
+        original_dir = entry["path"].rpartition("/")[0]
+        total += 1
+        where = located.get(name)
+        if where is None:
+            missing += 1
+        elif where == entry["category"]:
+            correct += 1
+        elif where == original_dir:
+            untouched += 1
+        else:
+            key = f"{entry['category']} -> {where}"
+            wrong[key] = wrong.get(key, 0) + 1
+
+    print(f"🧮 语料种子 {meta['seed']}，共 {total} 个文件")
+    print(f"   ✅ 分类正确 {correct} ({correct / total:.1%}) | 未整理 {untouched} | 丢失 {missing} | "
+          f"分错 {sum(wrong.values())}")
+    for key, count in sorted(wrong.items(), key=lambda kv: -kv[1])[:10]:
+        print(f"   ❌ {key}: {count}")
+    return {"seed": meta["seed"], "total": total, "correct": correct, "untouched": untouched,
+            "missing": missing, "wrong": sum(wrong.values()), "accuracy": correct / total if total else 0.0}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="生成可复现的文件整理基准语料")
+    parser.add_argument("--seed", type=int, help="随机种子，不填则随机生成并写进清单")
+    parser.add_argument("--count", type=int, default=FILE_COUNT, help="文件数量，可以是几百万")
+    parser.add_argument("--depth", type=int, default=0, help="嵌套目录层数，0 表示全部平铺")
+    parser.add_argument("--fanout", type=int, default=SUBDIR_FANOUT, help="嵌套时每层的子目录数")
+    parser.add_argument("--group-weights", help=f"后缀大类权重，例如 'Docs=3,Images=1'，可选: {', '.join(EXT_GROUPS)}")
+    parser.add_argument("--name-weights", help="BASE_NAMES 的权重，例如 '张伟_个人简历=5,随手记=1'")
+    parser.add_argument("--size-dist", choices=SIZE_DISTS, default="text",
+                        help="文件大小分布；text 表示只写一句话")
+    parser.add_argument("--size-mean", type=int, default=4096, help="平均文件大小 (字节)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="写文件的进程数")
+    parser.add_argument("--no-open", action="store_true", help="生成后不自动打开文件夹")
+    parser.add_argument("--score", action="store_true", help="不生成，对照清单给当前的整理结果打分")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    create_test_files()
\ No newline at end of file
+    cli_args = parse_args()
+    if cli_args.score:
+        score_corpus()
+    else:
+        create_test_files(cli_args)
@@ -0,0 +1,106 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ==========================================
+# 配置
+# ==========================================
+TOOL_WORKERS = 8        # 同一阶段内最多并发执行的工具调用数
+EVERYTHING = "*"        # 占用整个目录的标记
+
+# ==========================================
+# 1. 冲突检测：每个调用读/写了哪些资源
+# ==========================================
+def tool_footprint(function_name, function_args):
+    """
+    返回 (reads, writes) 两个集合，元素是文件名或 EVERYTHING。
+    - list_files 读整个目录：必须排在它前面的移动之后、后面的移动之前
+    - move_file / move_files 写各自涉及的文件名 (目标分类目录用 makedirs(exist_ok=True) 创建，
+      移到同一分类的调用可以并发，不必把目录算进占用)
+    - 不认识的工具一律当成独占整个目录，宁可串行也不出错
+    """
+    if function_name == "list_files":
+        return {EVERYTHING}, set()
+    if function_name == "move_file":
+        return set(), {function_args.get("filename")}
+    if function_name == "move_files":
+        return set(), {m.get("filename") for m in function_args.get("moves") or []}
+    return set(), {EVERYTHING}
+
+def conflicts(a, b):
+    """a、b 是 (reads, writes)；有写-写或读-写交集就不能并发"""
+    reads_a, writes_a = a
+    reads_b, writes_b = b
+    if EVERYTHING in writes_a and (reads_b or writes_b):
+        return True
+    if EVERYTHING in writes_b and (reads_a or writes_a):
+        return True
+    if EVERYTHING in reads_a and writes_b or EVERYTHING in reads_b and writes_a:
+        return True
+    return bool(writes_a & writes_b or reads_a & writes_b or reads_b & writes_a)
+
+def plan_stages(footprints):
+    """
+    按原始顺序把调用切成若干阶段：阶段内两两不冲突，可以并发；阶段之间严格串行。
+    只往后切、不重排，所以任何有依赖的两个调用的相对顺序都保持不变。
+    """
+    stages = []
+    current = []
+    for index, footprint in enumerate(footprints):
+        if any(conflicts(footprint, footprints[other]) for other in current):
+            stages.append(current)
+            current = []
+        current.append(index)
+    if current:
+        stages.append(current)
+    return stages
+
+# ==========================================
+# 2. 执行
+# ==========================================
+def _run_one(functions, function_name, function_args, parse_error):
+    start = time.perf_counter()
+    if parse_error:
+        response = json.dumps({"error": f"参数不是合法 JSON: {parse_error}"}, ensure_ascii=False)
+    elif function_name not in functions:
+        response = json.dumps({"error": f"未知工具: {function_name}"}, ensure_ascii=False)
+    else:
+        try:
+            response = functions[function_name](function_args)
+        except Exception as e:
+            response = json.dumps({"error": str(e)}, ensure_ascii=False)
+    return response, (time.perf_counter() - start) * 1000
+
+def execute_tool_calls(tool_calls, functions, max_workers=TOOL_WORKERS):
+    """
+    并发执行一轮里的全部工具调用。
+    返回与 tool_calls 顺序一致的列表：[{"tool_call", "name", "args", "content", "latency_ms"}, ...]
+    """
+    parsed = []
+    for tool_call in tool_calls:
+        try:
+            args = json.loads(tool_call.function.arguments or "{}")
+            parsed.append((tool_call.function.name, args, None))
+        except ValueError as e:
+            parsed.append((tool_call.function.name, {}, str(e)))
+
+    footprints = [tool_footprint(name, args) for name, args, _ in parsed]
+    results = [None] * len(tool_calls)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for stage in plan_stages(footprints):
+            if len(stage) == 1:
+                # 单个调用没必要过线程池
+                outputs = [_run_one(functions, *parsed[stage[0]])]
+            else:
+                outputs = list(pool.map(lambda i: _run_one(functions, *parsed[i]), stage))
+            for index, (content, latency_ms) in zip(stage, outputs):
+                name, args, _ = parsed[index]
+                results[index] = {
+                    "tool_call": tool_calls[index],
+                    "name": name,
+                    "args": args,
+                    "content": content,
+                    "latency_ms": latency_ms,
+                }
+    return results
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+
+from agent_tools import BASE_PATH, TARGET_DIR_NAME, dir_signature
+from ai_organizer import pre_classify, run_agent
+
+# ==========================================
+# 1. 配置区域
+# ==========================================
+POLL_INTERVAL = 1.0       # 多久扫一次目录 (秒)
+DEBOUNCE_SECONDS = 2.0    # 文件大小/修改时间连续这么久不变，才认为已经写完
+MAX_WAIT_SECONDS = 10.0   # 一直有新文件进来时，最老的文件最多等这么久就强制出批
+MAX_BATCH = 500           # 单个微批次最多多少个文件
+
+# 状态文件放在脚本旁边而不是被监听的目录里：每次写入都会改动目录的 mtime，触发无谓的重扫
+STATUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".watch_status.json")
+
+# ==========================================
+# 2. 目录快照：scandir + mtime/size，纯 Python，不依赖各平台的文件通知 API
+# ==========================================
+def scan_snapshot():
+    """返回 {文件名: (mtime_ns, size)}，只看顶层的普通文件"""
+    snapshot = {}
+    with os.scandir(BASE_PATH) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue   # 扫描途中被移走了
+            snapshot[entry.name] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))]
+
+# ==========================================
+# 3. 监听器：发现新文件 -> 防抖 -> 攒成微批次放进队列
+# ==========================================
+class Watcher:
+    """
+    主线程负责轮询目录、给新文件防抖并切成微批次；后台线程从队列里取批次，
+    先走本地规则，再把拿不准的少量文件交给 Agent。
+    """
+
+    def __init__(self, debounce=DEBOUNCE_SECONDS, max_wait=MAX_WAIT_SECONDS, max_batch=MAX_BATCH,
+                 use_agent=True, initial=False):
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.use_agent = use_agent
+
+        self.known = {} if initial else scan_snapshot()   # 已经见过 (不必再处理) 的文件
+        self.pending = {}      # 文件名 -> {"sig", "first_seen", "last_change"}，还在防抖
+        self.batches = queue.Queue()
+        self.queued_files = 0  # 已出批、还没处理完的文件数
+        self.dir_sig = None
+        self._lock = threading.Lock()
+
+        self.latencies = []    # 每个文件从被发现到处理完的秒数
+        self.processed = 0
+        self.moved_by_rules = 0
+        self.sent_to_agent = 0
+        self.batch_count = 0
+        self.agent_calls = 0
+
+    # ---------- 发现 ----------
+    def poll(self):
+        now = time.time()
+        dir_sig = dir_signature(BASE_PATH)
+        if dir_sig != self.dir_sig:
+            # 目录项有增删才需要整个重扫；mtime 精度粗时，同一刻度里的第二个新文件靠条目数发现
+            self.dir_sig = dir_sig
+            current = scan_snapshot()
+            for name in list(self.known):
+                if name not in current:
+                    del self.known[name]
+            for name in list(self.pending):
+                if name not in current:
+                    del self.pending[name]   # 还没处理就被别人拿走了
+            for name, sig in current.items():
+                if name not in self.known and name not in self.pending:
+                    self.pending[name] = {"sig": sig, "first_seen": now, "last_change": now}
+
+        # 正在写入的文件只改大小/mtime、不改目录，所以防抖中的文件单独 stat
+        for name, info in list(self.pending.items()):
+            try:
+                st = os.stat(os.path.join(BASE_PATH, name))
+            except FileNotFoundError:
+                del self.pending[name]
+                continue
+            sig = (st.st_mtime_ns, st.st_size)
+            if sig != info["sig"]:
+                info["sig"] = sig
+                info["last_change"] = now
+
+        self._cut_batches(now)
+
+    def _cut_batches(self, now):
+        ready = [name for name, info in self.pending.items() if now - info["last_change"] >= self.debounce]
+        if not ready:
+            return
+        oldest = min(info["first_seen"] for info in self.pending.values())
+        still_writing = len(ready) < len(self.pending)
+        # 还有文件在写、批次又不大、也没等太久：再攒一会儿，让同一波到达的文件进同一批
+        if still_writing and len(ready) < self.max_batch and now - oldest < self.max_wait:
+            return
+        ready.sort(key=lambda name: self.pending[name]["first_seen"])
+        for start in range(0, len(ready), self.max_batch):
+            chunk = ready[start:start + self.max_batch]
+            batch = [(name, self.pending.pop(name)) for name in chunk]
+            for name, info in batch:
+                self.known[name] = info["sig"]
+            with self._lock:
+                self.queued_files += len(batch)
+            self.batches.put(batch)
+
+    # ---------- 处理 ----------
+    def process(self, batch):
+        names = [name for name, _ in batch]
+        moved, ambiguous = pre_classify(names)
+        if ambiguous and self.use_agent:
+            run_agent(
+                f"文件夹里新到了 {len(ambiguous)} 个文件，只需要整理这些文件，其他文件不要动：{'、'.join(ambiguous)}"
+            )
+
+        done = time.time()
+        with self._lock:
+            self.queued_files -= len(batch)
+            self.latencies.extend(done - info["first_seen"] for _, info in batch)
+            self.processed += len(batch)
+            self.moved_by_rules += moved
+            self.batch_count += 1
+            if ambiguous and self.use_agent:
+                self.sent_to_agent += len(ambiguous)
+                self.agent_calls += 1
+
+        note = ""
+        if ambiguous:
+            note = f"，{len(ambiguous)} 个交给 Agent" if self.use_agent else f"，{len(ambiguous)} 个规则无法判断，留在原处"
+        print(f"📦 第 {self.batch_count} 批 {len(batch)} 个文件：规则移动 {moved}{note} | "
+              f"端到端 p50 {percentile(self.latencies, 50):.1f}s | 队列 {self.queue_depth()}")
+
+    def worker(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                break
+            try:
+                self.process(batch)
+            except Exception as e:
+                print(f"❌ 批次处理失败: {e}")
+                with self._lock:
+                    self.queued_files -= len(batch)
+
+    # ---------- 指标 ----------
+    def queue_depth(self):
+        """还没处理完的文件数 = 防抖中的 + 已出批等待处理的"""
+        with self._lock:
+            return len(self.pending) + self.queued_files
+
+    def status(self):
+        with self._lock:
+            latencies = list(self.latencies)
+            queued = self.queued_files
+        return {
+            "updated_at": time.time(),
+            "queue_depth": len(self.pending) + queued,
+            "debouncing": len(self.pending),
+            "queued": queued,
+            "batches": self.batch_count,
+            "processed": self.processed,
+            "moved_by_rules": self.moved_by_rules,
+            "sent_to_agent": self.sent_to_agent,
+            "agent_runs": self.agent_calls,
+            "latency_p50_s": percentile(latencies, 50),
+            "latency_p95_s": percentile(latencies, 95),
+            "latency_max_s": max(latencies, default=0.0),
+        }
+
+    def write_status(self):
+        tmp = STATUS_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.status(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, STATUS_PATH)
+
+# ==========================================
+# 4. 主循环
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="监听整理目录，新文件一到就按微批次整理")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="轮询间隔 (秒)")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS, help="文件稳定多久才处理 (秒)")
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT_SECONDS, help="最老的文件最多等多久就出批 (秒)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="单批最多文件数")
+    parser.add_argument("--initial", action="store_true", help="启动时把目录里已有的文件也整理一遍")
+    parser.add_argument("--no-agent", action="store_true", help="只用本地规则，拿不准的文件留在原处")
+    args = parser.parse_args()
+
+    if not os.path.exists(BASE_PATH):
+        print(f"❌ 找不到目录 {TARGET_DIR_NAME}，请先运行 generate_files.py 生成测试文件。")
+        return
+
+    watcher = Watcher(debounce=args.debounce, max_wait=args.max_wait, max_batch=args.max_batch,
+                      use_agent=not args.no_agent, initial=args.initial)
+    worker = threading.Thread(target=watcher.worker, daemon=True)
+    worker.start()
+
+    print(f"👀 正在监听 {TARGET_DIR_NAME} (已有 {len(watcher.known)} 个文件不处理)，Ctrl+C 退出")
+    print(f"   队列深度、端到端延迟实时写入 {STATUS_PATH}")
+    try:
+        while True:
+            watcher.poll()
+            watcher.write_status()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n🛑 收到退出信号，处理完队列里的批次再退出...")
+        watcher.batches.put(None)
+        worker.join()
+        watcher.write_status()
+
+    s = watcher.status()
+    print("-" * 50)
+    print(f"📊 共 {s['batches']} 批 {s['processed']} 个文件 | 规则移动 {s['moved_by_rules']} | "
+          f"交给 Agent {s['sent_to_agent']} 个 ({s['agent_runs']} 次)")
+    print(f"⏱️ 端到端延迟 p50 {s['latency_p50_s']:.1f}s | p95 {s['latency_p95_s']:.1f}s | 最大 {s['latency_max_s']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+
+# ==========================================
+# 缓存配置
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ANSWER_CACHE_PATH = os.path.join(BASE_DIR, "answer_cache.sqlite3")
+# 入库脚本每次改动知识库都会换一个新的“代号”写到这里，问答缓存据此整体失效
+INGEST_STAMP_PATH = os.path.join(BASE_DIR, "my_rag_db.stamp")
+
+MAX_DISTANCE = 0.08          # 语义层：余弦距离小于它就认为是同一个问题换了种问法
+TTL_SECONDS = 24 * 3600      # 缓存的回答最多用一天
+MAX_ENTRIES = 2000           # 超过后按 LRU 淘汰
+
+_PUNCT_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+def normalize_question(text):
+    """全半角统一、转小写、去掉空白和标点：“年假 能换啥？” 和 “年假能换啥” 是同一个键"""
+    return _PUNCT_RE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+def read_ingest_stamp():
+    try:
+        with open(INGEST_STAMP_PATH, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+def bump_ingest_stamp():
+    """知识库内容变了就调用一次，让所有进程里的问答缓存失效"""
+    with open(INGEST_STAMP_PATH, "w", encoding="utf-8") as f:
+        f.write(uuid.uuid4().hex)
+
+# ==========================================
+# 两层问答缓存：精确层 + 语义层
+# ==========================================
+class AnswerCache:
+    """
+    - 精确层：规范化后的问题文本完全一致，直接返回
+    - 语义层：问题向量与某条缓存问题的余弦距离 <= max_distance，复用那条回答
+    条目带 TTL，超出 max_entries 按最近使用时间淘汰；知识库重新入库后整体清空。
+    scope 描述检索配置 (后端、检索方式、top_k...)，不同配置检索到的资料不同，回答互不复用。
+    """
+
+    def __init__(self, path=ANSWER_CACHE_PATH, max_distance=MAX_DISTANCE,
+                 ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, scope=""):
+        self.max_distance = max_distance
+        self.scope = scope
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key         TEXT PRIMARY KEY,
+                question    TEXT NOT NULL,
+                answer      TEXT NOT NULL,
+                sources     TEXT NOT NULL,
+                embedding   BLOB,
+                created_at  REAL NOT NULL,
+                last_used   REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers(last_used);
+            CREATE TABLE IF NOT EXISTS meta (
+                name   TEXT PRIMARY KEY,
+                value  TEXT
+            );
+        """)
+        self._check_generation()
+        self._purge_expired()
+        self._load_embeddings()
+
+    def _check_generation(self):
+        stamp = read_ingest_stamp()
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'ingest_stamp'").fetchone()
+        if row is None or row[0] != stamp:
+            # 知识库已经变了，旧回答可能引用了被删改的条款，全部作废
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('ingest_stamp', ?)", (stamp,))
+            self._conn.commit()
+        self._stamp = stamp
+
+    def _purge_expired(self):
+        self._conn.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl,))
+        self._conn.commit()
+
+    def _key(self, question):
+        """缓存键 = scope + 规范化的问题；问题只剩标点时返回 None，不参与缓存"""
+        normalized = normalize_question(question)
+        return f"{self.scope}|{normalized}" if normalized else None
+
+    def _load_embeddings(self):
+        """
+        语义层在内存里放一份问题向量矩阵 (只含当前 scope)，查找就是一次矩阵乘法。
+        只在启动和知识库换代时从 SQLite 整体加载，之后 put / 删除都原地增删行。
+        """
+        prefix = f"{self.scope}|"
+        rows = self._conn.execute(
+            "SELECT key, embedding FROM answers WHERE embedding IS NOT NULL AND substr(key, 1, ?) = ?",
+            (len(prefix), prefix),
+        ).fetchall()
+        self._keys = [key for key, _ in rows]
+        self._rows = {key: i for i, key in enumerate(self._keys)}
+        self._free = []
+        if rows:
+            self._matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+        else:
+            self._matrix = None
+
+    def _index_add(self, key, vector):
+        """放进空出来的行，没有空行时容量翻倍，避免每次 put 都复制整个矩阵"""
+        if key in self._rows:
+            self._matrix[self._rows[key]] = vector
+            return
+        if self._free:
+            row = self._free.pop()
+            self._keys[row] = key
+        else:
+            row = len(self._keys)
+            self._keys.append(key)
+            if self._matrix is None:
+                self._matrix = np.zeros((4, len(vector)), dtype=np.float32)
+            elif row >= len(self._matrix):
+                grown = np.zeros((len(self._matrix) * 2, self._matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+        self._matrix[row] = vector
+        self._rows[key] = row
+
+    def _index_remove(self, keys):
+        for key in keys:
+            row = self._rows.pop(key, None)
+            if row is None:
+                continue
+            # 置零后余弦相似度为 0 (距离 1)，永远不会被当作命中
+            self._matrix[row] = 0.0
+            self._keys[row] = None
+            self._free.append(row)
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _fresh_row(self, key):
+        row = self._conn.execute(
+            "SELECT question, answer, sources, created_at FROM answers WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[3] < time.time() - self.ttl:
+            self._delete_keys([key])
+            return None
+        self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return {"question": row[0], "answer": row[1], "sources": json.loads(row[2])}
+
+    def lookup(self, question, embedding=None):
+        """
+        返回 (命中层级, 缓存条目) ；命中层级为 "exact" / "semantic"，未命中返回 (None, None)。
+        embedding 为空时只查精确层。
+        """
+        with self._lock:
+            if read_ingest_stamp() != self._stamp:
+                self._check_generation()
+                self._load_embeddings()
+
+            key = self._key(question)
+            if key is None:
+                self.misses += 1
+                return None, None
+
+            hit = self._fresh_row(key)
+            if hit:
+                self.exact_hits += 1
+                return "exact", hit
+
+            if embedding is not None and self._rows:
+                sims = self._matrix[:len(self._keys)] @ self._unit(embedding)
+                # 最像的那条可能已经过期，依次往下试，直到超出距离阈值
+                for row in np.argsort(-sims):
+                    distance = 1.0 - float(sims[row])
+                    if distance > self.max_distance:
+                        break
+                    candidate = self._keys[row]
+                    if candidate is None:
+                        continue
+                    hit = self._fresh_row(candidate)
+                    if hit:
+                        self.semantic_hits += 1
+                        hit["distance"] = distance
+                        return "semantic", hit
+
+            self.misses += 1
+            return None, None
+
+    def put(self, question, answer, sources, embedding=None):
+        key = self._key(question)
+        if key is None:
+            return
+        vector = self._unit(embedding) if embedding is not None else None
+        blob = vector.tobytes() if vector is not None else None
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, question, answer, sources, embedding, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, question, answer, json.dumps(sources, ensure_ascii=False), blob, now, now),
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                victims = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM answers ORDER BY last_used LIMIT ?", (overflow,))]
+                self._delete_keys(victims, commit=False)
+            self._conn.commit()
+            if vector is not None:
+                self._index_add(key, vector)
+            else:
+                self._index_remove([key])
+
+    def _delete_keys(self, keys, commit=True):
+        self._conn.executemany("DELETE FROM answers WHERE key = ?", [(k,) for k in keys])
+        if commit:
+            self._conn.commit()
+        self._index_remove(keys)
+
+    def stats(self):
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
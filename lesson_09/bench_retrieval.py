@@ -0,0 +1,254 @@
+import os
+import re
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import platform
+import statistics
+from datetime import datetime
+
+from embedding_utils import HashingEmbeddingFunction, OllamaEmbeddingFunction
+from lexical_index import LexicalIndex
+from retrieval import vector_search, hybrid_search, HYBRID_CANDIDATES
+from split_and_save import (
+    FILE_PATH, SOURCE_NAME, MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP, HEADERS_TO_SPLIT_ON,
+    split_markdown, build_chunks,
+)
+from vector_store import open_collection as open_store, BACKENDS
+
+# ==========================================
+# 离线检索基准：召回率 / MRR / 入库耗时 / 查询延迟
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_PATH = os.path.join(BASE_DIR, "bench_questions.jsonl")
+RESULTS_DIR = os.path.join(BASE_DIR, "bench_results")
+
+# company_rules.md 只切得出十来块，recall@5 几乎就是“取回一半的库”，分不出配置的好坏。
+# 所以默认再混入一批确定性生成的干扰文档：用原文里不含任何 evidence 的句子重新拼成
+# 其他分部的“管理细则”，词汇和原文高度重合 (难负例)，但不可能被误判为命中。
+DISTRACTOR_DOCS = 200        # 干扰文档数，0 表示只用 company_rules.md
+DISTRACTOR_SEED = 2026
+DEPARTMENTS = ["研发", "市场", "销售", "财务", "行政", "法务", "客服", "运营", "设计", "采购", "仓储", "培训"]
+CN_ORDINALS = "一二三四五六七八九十"
+_SENTENCE_RE = re.compile(r"[^。！？!?\n]+[。！？!?]?")
+_ARTICLE_RE = re.compile(r"^\*\*第[^条]+条[:：](.+?)\*\*$")
+
+def load_questions(path):
+    """每行一个 {"question", "article", "evidence"}，evidence 是只在目标条款里出现的原文片段"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def build_distractors(md_text, evidence, count=DISTRACTOR_DOCS, seed=DISTRACTOR_SEED):
+    """
+    生成 count 篇干扰文档，返回 [(source, markdown), ...]。
+    素材是原文的条款标题和句子，凡是包含任何一个 evidence 的都剔除。
+    """
+    titles, sentences = [], []
+    for line in md_text.splitlines():
+        line = line.strip()
+        if not line or line.startswith(("#", "---")):
+            continue
+        match = _ARTICLE_RE.match(line)
+        if match:
+            titles.append(match.group(1))
+            continue
+        sentences.extend(s.strip() for s in _SENTENCE_RE.findall(line.lstrip("-* ")) if len(s.strip()) > 4)
+    titles = [t for t in titles if not any(e in t for e in evidence)]
+    sentences = [s for s in sentences if not any(e in s for e in evidence)]
+
+    rng = random.Random(seed)
+    docs = []
+    for i in range(count):
+        department = DEPARTMENTS[i % len(DEPARTMENTS)]
+        lines = [f"# 《{department}分部 · 管理细则 第{i // len(DEPARTMENTS) + 1}版》", ""]
+        article = 0
+        for chapter in range(rng.randint(2, 3)):
+            lines += [f"## **第{CN_ORDINALS[chapter]}章：{rng.choice(titles)}**", ""]
+            for _ in range(rng.randint(2, 3)):
+                article += 1
+                lines.append(f"**第{article}条：{rng.choice(titles)}**")
+                lines.append("".join(rng.sample(sentences, rng.randint(2, 4))))
+                lines.append("")
+        docs.append((f"distractor_{i:04d}.md", "\n".join(lines)))
+    return docs
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def first_hit_rank(hits, evidence):
+    """返回第一个来自 company_rules.md 且包含 evidence 的片段的名次 (从 1 开始)，没命中返回 None"""
+    for rank, hit in enumerate(hits, start=1):
+        if hit["metadata"].get("source") == SOURCE_NAME and evidence in hit["document"]:
+            return rank
+    return None
+
+def make_embedder(name):
+    if name == "hash":
+        return HashingEmbeddingFunction()
+    # 真实模型：关闭进度打印，免得刷屏
+    embedder = OllamaEmbeddingFunction(model_name=MODEL_NAME)
+    embedder.pipeline.verbose = False
+    return embedder
+
+def run(args):
+    questions = load_questions(args.questions)
+    ks = sorted(set(args.k))
+    depth = max(ks)
+    headers = [tuple(h.split("=", 1)) for h in args.headers] if args.headers else HEADERS_TO_SPLIT_ON
+
+    workdir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        embedder = make_embedder(args.embedder)
+
+        # ---------- 入库 ----------
+        t0 = time.perf_counter()
+        with open(FILE_PATH, "r", encoding="utf-8") as f:
+            md_text = f.read()
+        documents = [(SOURCE_NAME, md_text)]
+        documents += build_distractors(md_text, [q["evidence"] for q in questions],
+                                       count=args.distractors, seed=args.seed)
+        ids, texts, metadatas = [], [], []
+        for source, text in documents:
+            splits = split_markdown(text, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                    headers=headers)
+            doc_ids, doc_texts, doc_metadatas = build_chunks(splits, source)
+            ids += doc_ids
+            texts += doc_texts
+            metadatas += doc_metadatas
+        t1 = time.perf_counter()
+
+        collection = open_store(
+            args.backend, "bench", embedding_function=embedder, create=True,
+            chroma_path=os.path.join(workdir, "chroma"), numpy_path=os.path.join(workdir, "npy"),
+        )
+        collection.add(ids=ids, documents=texts, metadatas=metadatas)
+        t2 = time.perf_counter()
+
+        lexical = None
+        if args.mode == "hybrid":
+            lexical = LexicalIndex(os.path.join(workdir, "lexical.sqlite3"))
+            lexical.add(ids, texts, metadatas)
+        t3 = time.perf_counter()
+
+        # ---------- 查询 ----------
+        # 先把每个问题跑一遍预热，再正式计时
+        def search(question):
+            if lexical is not None:
+                return hybrid_search(collection, lexical, question, n_results=depth, candidates=args.candidates)
+            return vector_search(collection, question, n_results=depth)
+
+        for item in questions:
+            search(item["question"])
+
+        latencies = []
+        per_question = []
+        for item in questions:
+            samples = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                hits = search(item["question"])
+                samples.append((time.perf_counter() - start) * 1000)
+            latencies.extend(samples)
+            rank = first_hit_rank(hits, item["evidence"])
+            per_question.append({
+                "question": item["question"],
+                "article": item["article"],
+                "rank": rank,
+                "latency_ms": statistics.median(samples),
+            })
+
+        if lexical is not None:
+            lexical.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    ranks = [q["rank"] for q in per_question]
+    metrics = {
+        f"recall@{k}": sum(1 for r in ranks if r is not None and r <= k) / len(ranks) for k in ks
+    }
+    metrics["mrr"] = sum(1.0 / r for r in ranks if r is not None) / len(ranks)
+    metrics.update({
+        "chunks": len(ids),
+        "split_s": t1 - t0,
+        "embed_and_write_s": t2 - t1,
+        "lexical_index_s": t3 - t2,
+        "ingest_s": t3 - t0,
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "latency_p99_ms": percentile(latencies, 99),
+    })
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "embedder": embedder.name(),
+            "backend": args.backend,
+            "mode": args.mode,
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "headers": [list(h) for h in headers],
+            "k": ks,
+            "candidates": args.candidates,
+            "distractors": args.distractors,
+            "seed": args.seed,
+            "rounds": args.rounds,
+            "questions": len(questions),
+            "python": platform.python_version(),
+        },
+        "metrics": metrics,
+        "per_question": per_question,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="company_rules.md 检索基准 (默认完全离线)")
+    parser.add_argument("--embedder", choices=["hash", "ollama"], default="hash",
+                        help="hash: 确定性哈希嵌入，离线可跑；ollama: 真实 bge 模型")
+    parser.add_argument("--backend", choices=BACKENDS, default="numpy")
+    parser.add_argument("--mode", choices=["vector", "hybrid"], default="vector")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--headers", nargs="*", metavar="符号=名称",
+                        help="自定义标题切分规则，例如 '#=一级标题' '##=二级标题'")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5], help="要统计的 recall@k")
+    parser.add_argument("--candidates", type=int, default=HYBRID_CANDIDATES)
+    parser.add_argument("--distractors", type=int, default=DISTRACTOR_DOCS,
+                        help="混入的干扰文档数，0 表示只用 company_rules.md (召回率会接近饱和)")
+    parser.add_argument("--seed", type=int, default=DISTRACTOR_SEED, help="干扰文档的随机种子")
+    parser.add_argument("--rounds", type=int, default=5, help="每个问题重复查询的次数 (用于延迟统计)")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--output", help="结果 JSON 路径，默认写到 bench_results/ 下按时间命名")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    result = run(args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"retrieval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    m = result["metrics"]
+    print("=" * 56)
+    print(f"📐 {result['config']['embedder']} | {args.backend} | {args.mode} | "
+          f"chunk {args.chunk_size}/{args.chunk_overlap} | {m['chunks']} 块")
+    print("   " + " | ".join(f"{k} {v:.3f}" for k, v in m.items() if k.startswith("recall@")) + f" | MRR {m['mrr']:.3f}")
+    print(f"   入库 {m['ingest_s']:.2f}s (切分 {m['split_s']:.2f}s + 向量化写入 {m['embed_and_write_s']:.2f}s)")
+    print(f"   查询延迟 p50 {m['latency_p50_ms']:.2f}ms | p95 {m['latency_p95_ms']:.2f}ms | p99 {m['latency_p99_ms']:.2f}ms")
+    if m["chunks"] < 10 * max(args.k):
+        print(f"   ⚠️ 库里只有 {m['chunks']} 块，recall@{max(args.k)} 接近饱和，区分不出配置差异")
+    missed = [q["question"] for q in result["per_question"] if q["rank"] is None]
+    if missed:
+        print(f"   ❗ 前 {max(args.k)} 名都没命中: {missed}")
+    print("=" * 56)
+    print(f"💾 结果已写入 {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+import numpy as np
+
+from vector_store import NumpyCollection, DTYPES
+
+# ==========================================
+# 向量库后端基准：打开耗时 / 查询延迟 / 召回率
+# ==========================================
+# 用随机向量代替真实 embedding，整个基准不依赖 Ollama。
+# 召回率以 float32 精确检索 (暴力矩阵乘) 的 top-k 为标准答案。
+
+COLLECTION_NAME = "bench"
+
+# 冷启动要在全新的子进程里测，才能把 import 和初始化的开销算进去
+OPEN_SNIPPETS = {
+    "chroma": (
+        "import time; t=time.perf_counter(); import chromadb; "
+        "c=chromadb.PersistentClient(path={path!r}).get_collection({name!r}); c.count(); "
+        "print(time.perf_counter()-t)"
+    ),
+    "numpy": (
+        "import time; t=time.perf_counter(); from vector_store import NumpyCollection; "
+        "c=NumpyCollection({path!r}, {name!r}); c.count(); "
+        "print(time.perf_counter()-t)"
+    ),
+}
+
+def cold_open_seconds(backend, path, repeats):
+    code = OPEN_SNIPPETS[backend].format(path=path, name=COLLECTION_NAME)
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def exact_top_k(vectors, queries, k):
+    sims = queries @ vectors.T
+    return [list(np.argsort(-row)[:k]) for row in sims]
+
+def recall(found_ids, truth_idx):
+    total = 0.0
+    for found, truth in zip(found_ids, truth_idx):
+        truth = {str(i) for i in truth}
+        total += len(truth & set(found)) / len(truth)
+    return total / len(truth_idx)
+
+def time_queries(collection, queries, k):
+    latencies = []
+    found = []
+    for q in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[q.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(result["ids"][0])
+    return statistics.median(latencies), found
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 ChromaDB 和 NumPy 内存映射向量库")
+    parser.add_argument("--n", type=int, default=5000, help="向量条数")
+    parser.add_argument("--dim", type=int, default=512, help="向量维度 (bge-small-zh 是 512)")
+    parser.add_argument("--queries", type=int, default=200, help="查询条数")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3, help="冷启动重复次数，取中位数")
+    parser.add_argument("--skip-chroma", action="store_true", help="没装 chromadb 时只测 numpy")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(args.n, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # 查询向量取库里的向量加噪声，模拟“问题和答案语义接近”
+    picks = rng.integers(0, args.n, size=args.queries)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    ids = [str(i) for i in range(args.n)]
+    documents = [f"doc-{i}" for i in range(args.n)]
+    metadatas = [{"source": f"file-{i % 50}.md"} for i in range(args.n)]
+
+    workdir = tempfile.mkdtemp(prefix="bench_vector_store_")
+    rows = []
+    try:
+        if not args.skip_chroma:
+            import chromadb
+            path = os.path.join(workdir, "chroma")
+            client = chromadb.PersistentClient(path=path)
+            collection = client.create_collection(
+                COLLECTION_NAME, embedding_function=None, metadata={"hnsw:space": "cosine"}
+            )
+            start = time.perf_counter()
+            # chroma 单次 add 有条数上限，分批写
+            for i in range(0, args.n, 5000):
+                collection.add(ids=ids[i:i + 5000], documents=documents[i:i + 5000],
+                               metadatas=metadatas[i:i + 5000], embeddings=vectors[i:i + 5000])
+            build = time.perf_counter() - start
+            latency, found = time_queries(collection, queries, args.k)
+            del client, collection
+            rows.append(("chroma", build, cold_open_seconds("chroma", path, args.repeats), latency,
+                         recall(found, truth)))
+
+        for dtype in DTYPES:
+            path = os.path.join(workdir, f"numpy_{dtype}")
+            collection = NumpyCollection(path, COLLECTION_NAME, dtype=dtype)
+            start = time.perf_counter()
+            collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+            build = time.perf_counter() - start
+            latency, found = time_queries(collection, queries, args.k)
+            del collection
+            rows.append((f"numpy/{dtype}", build, cold_open_seconds("numpy", path, args.repeats), latency,
+                         recall(found, truth)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"📊 n={args.n} dim={args.dim} queries={args.queries} k={args.k}")
+    print("=" * 72)
+    print(f"{'后端':<16}{'建库(s)':>10}{'冷启动(ms)':>14}{'查询p50(ms)':>14}{f'recall@{args.k}':>12}")
+    for name, build, open_s, latency, rec in rows:
+        print(f"{name:<16}{build:>10.2f}{open_s * 1000:>14.1f}{latency:>14.3f}{rec:>12.3f}")
+    print("=" * 72)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import time
+import argparse
+import statistics
+from embedding_cache import EmbeddingCache
+from lexical_index import LexicalIndex
+from query import open_collection, N_RESULTS
+from retrieval import vector_search, hybrid_search, HYBRID_CANDIDATES
+from vector_store import BACKENDS
+
+# ==========================================
+# 对比用的问题：一半是条款编号这种精确词，一半是自然语言
+# ==========================================
+QUESTIONS = [
+    "第五条讲的是什么？",
+    "第十二条的摸鱼币怎么获得？",
+    "第二十条离职面试是什么形式？",
+    "第九条的预警系统是干嘛的？",
+    "年假不用可以换什么？",
+    "宠物可以带来上班吗？",
+    "犯了错误要写检讨吗？",
+    "开会有什么特别的要求？",
+]
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def measure(fn, questions, rounds):
+    latencies = []
+    results = {}
+    for _ in range(rounds):
+        for question in questions:
+            start = time.perf_counter()
+            results[question] = fn(question)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, results
+
+def main():
+    parser = argparse.ArgumentParser(description="对比纯向量检索和混合检索的延迟")
+    parser.add_argument("--rounds", type=int, default=5, help="每个问题重复的轮数")
+    parser.add_argument("--top-k", type=int, default=N_RESULTS)
+    parser.add_argument("--candidates", type=int, default=HYBRID_CANDIDATES)
+    parser.add_argument("--backend", choices=BACKENDS, default="chroma")
+    args = parser.parse_args()
+
+    # 开着向量缓存，避免把 Ollama 的抖动算进检索延迟里
+    collection = open_collection(EmbeddingCache(), backend=args.backend)
+    lexical = LexicalIndex()
+
+    # 先各跑一遍预热 (问题向量进缓存，SQLite 页进内存)
+    for question in QUESTIONS:
+        vector_search(collection, question, n_results=args.top_k)
+        hybrid_search(collection, lexical, question, n_results=args.top_k, candidates=args.candidates)
+
+    vector_lat, vector_res = measure(
+        lambda q: vector_search(collection, q, n_results=args.top_k), QUESTIONS, args.rounds)
+    hybrid_lat, hybrid_res = measure(
+        lambda q: hybrid_search(collection, lexical, q, n_results=args.top_k, candidates=args.candidates),
+        QUESTIONS, args.rounds)
+
+    print("=" * 56)
+    print(f"{'模式':<8}{'平均(ms)':>12}{'p50(ms)':>12}{'p95(ms)':>12}")
+    for name, lat in [("vector", vector_lat), ("hybrid", hybrid_lat)]:
+        print(f"{name:<8}{statistics.mean(lat):>12.2f}{percentile(lat, 50):>12.2f}{percentile(lat, 95):>12.2f}")
+    print("=" * 56)
+
+    # 顺便看看两种模式召回的片段有多少不一样
+    for question in QUESTIONS:
+        v_ids = [h["id"] for h in vector_res[question]]
+        h_ids = [h["id"] for h in hybrid_res[question]]
+        overlap = len(set(v_ids) & set(h_ids))
+        print(f"📌 {question} -> 重合 {overlap}/{args.top_k}")
+        print(f"   向量: {[h['document'][:16] for h in vector_res[question]]}")
+        print(f"   混合: {[h['document'][:16] for h in hybrid_res[question]]}")
+
+    lexical.close()
+
+if __name__ == "__main__":
+    main()
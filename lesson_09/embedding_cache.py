@@ -0,0 +1,161 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+# ==========================================
+# 缓存配置
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, "embedding_cache.sqlite3")
+MAX_CACHE_BYTES = 256 * 1024 * 1024   # 向量数据最多占 256MB，超出后按 LRU 淘汰
+
+# ==========================================
+# 持久化向量缓存 (SQLite)
+# ==========================================
+class EmbeddingCache:
+    """
+    以 (模型名, 文本哈希) 为键的磁盘向量缓存，入库和查询脚本共用一个文件。
+    - 换了 MODEL_NAME 只会让该模型的条目失效，其他模型的缓存不受影响
+    - 向量按 float32 二进制存储，超过 max_bytes 时淘汰最久没被用过的条目
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model      TEXT    NOT NULL,
+                text_hash  TEXT    NOT NULL,
+                vector     BLOB    NOT NULL,
+                size       INTEGER NOT NULL,
+                last_used  REAL    NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        self._total_bytes = row[0]
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model, texts):
+        """批量查缓存，返回与 texts 等长的列表，未命中的位置是 None"""
+        hashes = [self.text_hash(t) for t in texts]
+        found = {}
+        with self._lock:
+            # SQLite 单条语句的参数个数有限，分段查询
+            unique = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+
+            if found:
+                # 命中的条目刷新访问时间，LRU 淘汰时排在后面
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+
+        results = [found.get(h) for h in hashes]
+        hit = sum(1 for r in results if r is not None)
+        self.hits += hit
+        self.misses += len(results) - hit
+        return results
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        # 同一批里重复的文本只保留一条 (后写的为准)，否则体积会被重复累加
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            blob = array("f", vector).tobytes()
+            text_hash = self.text_hash(text)
+            rows[text_hash] = (model, text_hash, blob, len(blob), now)
+        rows = list(rows.values())
+
+        with self._lock:
+            # 覆盖写入前先扣掉旧条目的体积，保证计数准确
+            for model_name, text_hash, _, _, _ in rows:
+                old = self._conn.execute(
+                    "SELECT size FROM embeddings WHERE model = ? AND text_hash = ?",
+                    (model_name, text_hash),
+                ).fetchone()
+                if old:
+                    self._total_bytes -= old[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._total_bytes += sum(r[3] for r in rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """按 last_used 从旧到新删除，直到总体积回到上限以内 (调用方持有锁)"""
+        while self._total_bytes > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT model, text_hash, size FROM embeddings ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not victims:
+                self._total_bytes = 0
+                break
+            for model, text_hash, size in victims:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE model = ? AND text_hash = ?", (model, text_hash)
+                )
+                self._total_bytes -= size
+                self.evictions += 1
+
+    def clear(self, model=None):
+        """清空缓存；指定 model 时只清该模型的条目"""
+        with self._lock:
+            if model is None:
+                self._conn.execute("DELETE FROM embeddings")
+            else:
+                self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+            self._conn.commit()
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+            self._total_bytes = row[0]
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "evictions": self.evictions,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,165 @@
+import time
+import math
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import ollama
+
+from lexical_index import tokenize
+
+# ==========================================
+# 向量化流水线的默认参数
+# ==========================================
+BATCH_SIZE = 64      # 每次请求 Ollama 的文本条数
+MAX_WORKERS = 4      # 同时在路上的批次数量上限
+MAX_RETRIES = 3      # 单个批次失败后的最大重试次数
+BACKOFF_BASE = 0.5   # 退避基数 (秒)，第 n 次重试等待 BACKOFF_BASE * 2^(n-1)
+
+# ==========================================
+# 批处理 + 线程池 + 重试 的向量化流水线
+# ==========================================
+class EmbeddingPipeline:
+    """
+    把一大坨文本切成固定大小的批次，用有界线程池并发请求 Ollama。
+    每个批次独立重试，结果按输入顺序拼回去。
+    """
+
+    def __init__(self, model_name, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, verbose=True):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.verbose = verbose
+
+        # 累计统计，供调用方打印吞吐量
+        self.total_chunks = 0
+        self.total_seconds = 0.0
+
+    def _embed_batch(self, batch):
+        """请求单个批次，失败按指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = ollama.embed(model=self.model_name, input=batch)
+                return response['embeddings']
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                wait = self.backoff_base * (2 ** attempt)
+                print(f"\n⚠️ 批次向量化失败 ({e})，{wait:.1f}s 后第 {attempt + 1} 次重试...")
+                time.sleep(wait)
+
+    def embed(self, texts):
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        start = time.perf_counter()
+
+        # 只有一个批次时不值得开线程池 (查询时通常就是一句话)
+        if len(batches) == 1:
+            embeddings = self._embed_batch(batches[0])
+        else:
+            embeddings = []
+            done = 0
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                # map 按提交顺序返回结果，天然保证输出顺序和输入一致
+                for batch, vectors in zip(batches, pool.map(self._embed_batch, batches)):
+                    embeddings.extend(vectors)
+                    done += len(batch)
+                    if self.verbose:
+                        print(f"\r📦 向量化进度: {done}/{len(texts)}", end="", flush=True)
+            if self.verbose:
+                print()
+
+        elapsed = time.perf_counter() - start
+        self.total_chunks += len(texts)
+        self.total_seconds += elapsed
+        if self.verbose and len(batches) > 1:
+            print(f"⚡ 本次向量化 {len(texts)} 块，耗时 {elapsed:.2f}s，"
+                  f"吞吐 {len(texts) / max(elapsed, 1e-9):.1f} 块/秒")
+        return embeddings
+
+    def throughput(self):
+        """累计吞吐量 (块/秒)"""
+        if self.total_seconds <= 0:
+            return 0.0
+        return self.total_chunks / self.total_seconds
+
+# ==========================================
+# 定义 Ollama 嵌入函数 (供 ChromaDB 调用)
+# ==========================================
+class OllamaEmbeddingFunction:
+    def __init__(self, model_name, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS, cache=None):
+        self.model_name = model_name
+        self.pipeline = EmbeddingPipeline(model_name, batch_size=batch_size, max_workers=max_workers)
+        # 可选的 EmbeddingCache，命中的文本不再请求 Ollama
+        self.cache = cache
+
+    def __call__(self, input):
+        if isinstance(input, str):
+            input = [input]
+        if self.cache is None:
+            # 自动调用本地 Ollama 计算句向量 (内部分批并发，顺序与输入一致)
+            return self.pipeline.embed(input)
+
+        embeddings = self.cache.get_many(self.model_name, input)
+        miss_idx = [i for i, vector in enumerate(embeddings) if vector is None]
+        if miss_idx:
+            miss_texts = [input[i] for i in miss_idx]
+            fresh = self.pipeline.embed(miss_texts)
+            self.cache.put_many(self.model_name, miss_texts, fresh)
+            for i, vector in zip(miss_idx, fresh):
+                embeddings[i] = vector
+        return embeddings
+
+    def name(self):
+        return self.model_name
+
+    def embed_query(self, input):
+        return self.__call__(input)
+
+    def embed_documents(self, input):
+        return self.__call__(input)
+
+# ==========================================
+# 离线替身：确定性哈希嵌入 (基准测试用)
+# ==========================================
+class HashingEmbeddingFunction:
+    """
+    不依赖 Ollama 的确定性嵌入：把字的 1/2-gram 哈希进固定维度的桶里，再做 L2 归一化。
+    同样的文本在任何机器、任何进程里都得到同样的向量，语义能力当然远不如 bge，
+    但足够让基准测试离线跑起来、并比较切分参数等改动带来的相对变化。
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def _embed_one(self, text):
+        vector = [0.0] * self.dim
+        for token in tokenize(text):
+            # 不能用内置 hash()，它每个进程的随机种子都不一样
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dim] += sign
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def __call__(self, input):
+        if isinstance(input, str):
+            input = [input]
+        return [self._embed_one(text) for text in input]
+
+    def name(self):
+        return self.model_name
+
+    def embed_query(self, input):
+        return self.__call__(input)
+
+    def embed_documents(self, input):
+        return self.__call__(input)
@@ -0,0 +1,133 @@
+import os
+import re
+import math
+import sqlite3
+import threading
+from collections import Counter
+
+# ==========================================
+# 配置：倒排索引和向量库放在一起
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEXICAL_PATH = os.path.join(BASE_DIR, "my_rag_lexical.sqlite3")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# 中日韩统一表意文字 + 英文/数字单词
+_TOKEN_RE = re.compile(r"[一-鿿]+|[a-z0-9]+")
+
+def tokenize(text):
+    """
+    中文不做分词，直接用字的 1-gram + 2-gram；英文和数字按单词切。
+    “第五条” -> 第 / 五 / 条 / 第五 / 五条，条款编号这种精确词也能命中。
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if run[0].isascii():
+            tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+# ==========================================
+# 基于 SQLite 的 BM25 倒排索引
+# ==========================================
+class LexicalIndex:
+    """
+    和 Chroma 共用同一套 chunk ID，入库时增量 add/delete，查询时算 BM25。
+    """
+
+    def __init__(self, path=LEXICAL_PATH):
+        self.path = path
+        # 批量问答会在线程池里并发检索，连接允许跨线程，读写用锁串行
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id      TEXT PRIMARY KEY,
+                source  TEXT,
+                length  INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_docs_source ON docs(source);
+            CREATE TABLE IF NOT EXISTS postings (
+                term    TEXT NOT NULL,
+                doc_id  TEXT NOT NULL,
+                tf      INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id);
+        """)
+        self._conn.commit()
+
+    def add(self, ids, texts, metadatas=None):
+        """写入 (或覆盖) 一批文档"""
+        metadatas = metadatas or [{}] * len(ids)
+        self._delete_ids(ids)
+        doc_rows = []
+        posting_rows = []
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            counts = Counter(tokenize(text))
+            doc_rows.append((doc_id, (metadata or {}).get("source"), sum(counts.values())))
+            posting_rows.extend((term, doc_id, tf) for term, tf in counts.items())
+        self._conn.executemany("INSERT INTO docs (id, source, length) VALUES (?, ?, ?)", doc_rows)
+        self._conn.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", posting_rows)
+        self._conn.commit()
+
+    def delete(self, ids):
+        self._delete_ids(ids)
+        self._conn.commit()
+
+    def delete_source(self, source):
+        ids = [row[0] for row in self._conn.execute("SELECT id FROM docs WHERE source = ?", (source,))]
+        self.delete(ids)
+
+    def _delete_ids(self, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            self._conn.execute(f"DELETE FROM postings WHERE doc_id IN ({placeholders})", part)
+            self._conn.execute(f"DELETE FROM docs WHERE id IN ({placeholders})", part)
+
+    def clear(self):
+        self._conn.execute("DELETE FROM postings")
+        self._conn.execute("DELETE FROM docs")
+        self._conn.commit()
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def search(self, query, k=10):
+        """返回 [(chunk_id, bm25_score), ...]，按得分从高到低"""
+        with self._lock:
+            return self._search(query, k)
+
+    def _search(self, query, k):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        n_docs, avg_len = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+        if not n_docs:
+            return []
+        avg_len = avg_len or 1.0
+
+        scores = Counter()
+        for term in terms:
+            rows = self._conn.execute(
+                "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.doc_id WHERE p.term = ?",
+                (term,),
+            ).fetchall()
+            if not rows:
+                continue
+            df = len(rows)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf, length in rows:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / norm
+        return scores.most_common(k)
+
+    def close(self):
+        self._conn.close()
@@ -1,8 +1,20 @@
 import os
-import chromadb
-import ollama
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
 from dotenv import load_dotenv
-from openai import OpenAI
+import openai
+from openai import OpenAI, AsyncOpenAI
+from embedding_utils import OllamaEmbeddingFunction
+from embedding_cache import EmbeddingCache
+from lexical_index import LexicalIndex, LEXICAL_PATH
+from retrieval import vector_search, hybrid_search, HYBRID_CANDIDATES
+from vector_store import open_collection as open_store, BACKENDS
+from answer_cache import AnswerCache, MAX_DISTANCE, TTL_SECONDS
 
 # ==========================================
 # 1. 基础配置
@@ -11,85 +23,50 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "my_rag_db")
 COLLECTION_NAME = "company_knowledge"
 MODEL_NAME = "quentinz/bge-small-zh-v1.5"
+N_RESULTS = 3  # 提取最相关的 3 个片段
+
+# 批量问答参数
+BATCH_CONCURRENCY = 8   # 同时处理的问题数
+BATCH_RPM = 0           # 每分钟最多发给 DeepSeek 的请求数，0 表示不限
+BATCH_MAX_RETRIES = 3   # 限流/网络错误时的最大重试次数
 
 load_dotenv()
 api_key = os.getenv("DEEP_SEEK_API_KEY")
 base_url = os.getenv("DEEP_SEEK_API_URL")
 
-llm_client = OpenAI(api_key=api_key, base_url=base_url)
-
 # ==========================================
-# 2. 准备向量数据库的连接 
+# 2. 准备向量数据库的连接
 # ==========================================
-class OllamaEmbeddingFunction:
-    def __init__(self, model_name):
-        self.model_name = model_name
-
-    def __call__(self, input):
-        response = ollama.embed(model=self.model_name, input=input)
-        return response['embeddings']
-        
-    def name(self): 
-        return self.model_name
-
-    def embed_query(self, input):
-        return self.__call__(input)
-        
-    def embed_documents(self, input):
-        return self.__call__(input)
-
-db_client = chromadb.PersistentClient(path=DB_PATH)
-
-try:
-    collection = db_client.get_collection(
-        name=COLLECTION_NAME, 
-        embedding_function=OllamaEmbeddingFunction(model_name=MODEL_NAME)
-    )
-except Exception as e:
-    print("❌ 找不到集合，请确保你已经成功运行了入库脚本！")
-    exit()
-
-print("🎉 知识库加载成功！《不正经有限公司》 管理助手已就绪。")
-print("==========================================")
-
-# ==========================================
-# 3. 开启命令行交互循环
-# ==========================================
-while True:
-    # 获取用户终端输入
-    user_question = input("\n🙋 请输入你的问题 (输入 'q' 或 'exit' 退出): ").strip()
-    
-    # 判断是否退出
-    if user_question.lower() in ['q', 'exit', 'quit']:
-        print("👋 拜拜！下次再聊！")
-        break
-        
-    # 如果用户直接按了回车没打字，就跳过这次循环
-    if not user_question:
-        continue
-
-    print(f"\n🔍 正在知识库中检索...")
-
-    # A：检索 (Retrieval)
-    results = collection.query(
-        query_texts=[user_question],
-        n_results=3  # 提取最相关的 3 个片段
+def open_collection(embedding_cache=None, backend="chroma", embedding_function=None):
+    if embedding_function is None:
+        embedding_function = OllamaEmbeddingFunction(model_name=MODEL_NAME, cache=embedding_cache)
+    return open_store(
+        backend, COLLECTION_NAME,
+        embedding_function=embedding_function,
+        chroma_path=DB_PATH,
     )
 
+def format_context(hits):
     retrieved_context = ""
-    distances = results['distances'][0]
-    documents = results['documents'][0]
-    metadatas = results['metadatas'][0]
-
-    for i in range(len(documents)):
-        source = metadatas[i].get('source', '未知来源')
-        retrieved_context += f"--- 来源文档: {source} (差异度: {distances[i]:.4f}) ---\n"
-        retrieved_context += f"{documents[i]}\n\n"
+    for hit in hits:
+        source = hit["metadata"].get('source', '未知来源')
+        if hit["distance"] is None:
+            # 只被 BM25 命中的片段没有向量距离
+            retrieved_context += f"--- 来源文档: {source} (关键词命中) ---\n"
+        else:
+            retrieved_context += f"--- 来源文档: {source} (差异度: {hit['distance']:.4f}) ---\n"
+        retrieved_context += f"{hit['document']}\n\n"
+    return retrieved_context
 
-    # B：增强生成 (Augmented Generation)
-    print("🧠 DeepSeek 正在思考...")
+def retrieve(collection, lexical, question, args, timings=None):
+    """按命令行参数选择纯向量或混合检索"""
+    if lexical is not None:
+        return hybrid_search(collection, lexical, question, n_results=args.top_k,
+                             candidates=args.candidates, timings=timings)
+    return vector_search(collection, question, n_results=args.top_k)
 
-    system_prompt = f"""
+def build_system_prompt(retrieved_context):
+    return f"""
     你是一个专业的内部知识库问答助手。
     请**严格根据**以下<参考资料>中的信息来回答用户的问题。
     如果参考资料中没有明确提及该问题的答案，请如实回答“根据现有资料无法得出结论”，绝对不要编造！
@@ -99,19 +76,383 @@ while True:
     </参考资料>
     """
 
-    try:
+# ==========================================
+# 生成：普通模式 / 流式模式，顺便记录耗时
+# ==========================================
+def generate_answer(llm_client, system_prompt, user_question, stream=False):
+    """
+    返回 (回答全文, 指标字典)。
+    指标: gen_ms 生成总耗时、ttft_ms 首 token 耗时 (仅流式)、completion_tokens、tokens_per_s
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_question},
+    ]
+    start = time.perf_counter()
+
+    if not stream:
         response = llm_client.chat.completions.create(
             model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_question},
-            ],
-            temperature=0.1 
+            messages=messages,
+            temperature=0.1
         )
-        
-        print("\n🤖 助手回答：")
-        print(response.choices[0].message.content)
-        print("\n" + "="*40) # 打印一条分割线，方便看下一次提问
+        gen_s = time.perf_counter() - start
+        answer = response.choices[0].message.content
+        tokens = response.usage.completion_tokens if response.usage else None
+        return answer, {
+            "gen_ms": gen_s * 1000,
+            "ttft_ms": None,
+            "completion_tokens": tokens,
+            "tokens_per_s": tokens / gen_s if tokens and gen_s > 0 else None,
+        }
+
+    response = llm_client.chat.completions.create(
+        model="deepseek-chat",
+        messages=messages,
+        temperature=0.1,
+        stream=True,
+        # 最后一个 chunk 会带上 usage，用来算真实的 token 速率
+        stream_options={"include_usage": True},
+    )
+    first_token_at = None
+    pieces = []
+    usage = None
+    chunk_count = 0
+    for chunk in response:
+        if chunk.usage:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        chunk_count += 1
+        pieces.append(delta)
+        print(delta, end="", flush=True)
+    print()
+
+    end = time.perf_counter()
+    # 服务端没返回 usage 时，用 chunk 数近似 token 数
+    tokens = usage.completion_tokens if usage else chunk_count
+    decode_s = end - (first_token_at or start)
+    return "".join(pieces), {
+        "gen_ms": (end - start) * 1000,
+        "ttft_ms": (first_token_at - start) * 1000 if first_token_at else None,
+        "completion_tokens": tokens,
+        "tokens_per_s": tokens / decode_s if tokens and decode_s > 0 else None,
+    }
+
+def answer_cache_scope(args):
+    """检索配置不同，送给大模型的资料就不同，回答不能混用"""
+    scope = f"{args.backend}:{args.mode}:top{args.top_k}"
+    return scope + f":cand{args.candidates}" if args.mode == "hybrid" else scope
+
+def print_answer_cache_stats(answer_cache, file=None):
+    if answer_cache is None:
+        return
+    stats = answer_cache.stats()
+    print(f"💬 问答缓存命中率: {stats['hit_rate']:.1%} (精确 {stats['exact_hits']} | "
+          f"语义 {stats['semantic_hits']} | 未命中 {stats['misses']})", file=file)
+
+def print_timing_summary(records):
+    """退出时打印本次会话的耗时汇总"""
+    if not records:
+        return
+
+    def describe(key, unit):
+        values = [r[key] for r in records if r.get(key) is not None]
+        if not values:
+            return None
+        return f"平均 {statistics.mean(values):.1f}{unit} | 中位 {statistics.median(values):.1f}{unit} | 最大 {max(values):.1f}{unit}"
+
+    print("\n📈 本次会话耗时统计 (共 {} 个问题)".format(len(records)))
+    for key, label, unit in [
+        ("retrieval_ms", "检索", "ms"),
+        ("ttft_ms", "首 token", "ms"),
+        ("gen_ms", "生成总耗时", "ms"),
+        ("tokens_per_s", "生成速度", " tok/s"),
+    ]:
+        line = describe(key, unit)
+        if line:
+            print(f"   {label}: {line}")
+
+# ==========================================
+# 4. 批量问答：异步并发 + 限速 + 按输入顺序输出
+# ==========================================
+class AsyncRateLimiter:
+    """把请求均匀地摊到每分钟 rpm 个时间槽里，rpm <= 0 时不限速"""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def read_questions(path):
+    """每行一个问题：可以是纯文本，也可以是带 question 字段的 JSON；'-' 表示从标准输入读"""
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    yield json.loads(line)["question"]
+                    continue
+                except (ValueError, KeyError):
+                    pass
+            yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+async def answer_one(index, question, collection, lexical, args, async_client, limiter, semaphore,
+                     embedding_function=None, answer_cache=None):
+    record = {"index": index, "question": question}
+    start = time.perf_counter()
+    async with semaphore:
+        try:
+            # Chroma / SQLite 都是同步接口，丢到线程里跑，不阻塞事件循环
+            # 缓存命中也照样检索一遍：每条记录都要有 sources / distances / retrieval_ms，回归对比才有意义
+            hits = await asyncio.to_thread(retrieve, collection, lexical, question, args)
+            record["retrieval_ms"] = (time.perf_counter() - start) * 1000
+            record["sources"] = [hit["metadata"].get("source", "未知来源") for hit in hits]
+            record["distances"] = [hit["distance"] for hit in hits]
+
+            question_embedding = None
+            if answer_cache is not None:
+                question_embedding = (await asyncio.to_thread(embedding_function, [question]))[0]
+                tier, cached = await asyncio.to_thread(answer_cache.lookup, question, question_embedding)
+                if cached:
+                    # cached_sources 是当初生成这条回答时用到的文档，可能和这次检索的结果不同
+                    record.update(answer=cached["answer"], cached_sources=cached["sources"], cache=tier)
+                    record["latency_ms"] = (time.perf_counter() - start) * 1000
+                    return record
+
+            system_prompt = build_system_prompt(format_context(hits))
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                await limiter.acquire()
+                try:
+                    gen_start = time.perf_counter()
+                    response = await async_client.chat.completions.create(
+                        model="deepseek-chat",
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": question},
+                        ],
+                        temperature=0.1
+                    )
+                    record["gen_ms"] = (time.perf_counter() - gen_start) * 1000
+                    record["answer"] = response.choices[0].message.content
+                    break
+                except (openai.RateLimitError, openai.APIConnectionError,
+                        openai.APITimeoutError, openai.InternalServerError) as e:
+                    if attempt == BATCH_MAX_RETRIES:
+                        raise
+                    # 指数退避 + 随机抖动，避免所有协程在同一时刻一起重试
+                    await asyncio.sleep((2 ** attempt) + random.random())
+            if answer_cache is not None and record.get("answer"):
+                await asyncio.to_thread(answer_cache.put, question, record["answer"],
+                                        record["sources"], question_embedding)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_ms"] = (time.perf_counter() - start) * 1000
+    return record
 
+async def run_batch(args, collection, lexical, embedding_function=None, answer_cache=None):
+    async_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    limiter = AsyncRateLimiter(args.rpm)
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    out = sys.stdout if not args.output else open(args.output, "w", encoding="utf-8")
+
+    questions = list(read_questions(args.batch))
+    print(f"📥 读取到 {len(questions)} 个问题，并发 {args.concurrency}，"
+          f"限速 {args.rpm or '不限'} 次/分钟", file=sys.stderr)
+
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(answer_one(i, q, collection, lexical, args, async_client, limiter, semaphore,
+                                       embedding_function, answer_cache))
+        for i, q in enumerate(questions)
+    ]
+
+    # 谁先完成就先放进缓冲区，但只按输入顺序连续地往外写
+    finished = {}
+    next_index = 0
+    failed = 0
+    latencies = []
+    for task in asyncio.as_completed(tasks):
+        record = await task
+        finished[record["index"]] = record
+        latencies.append(record["latency_ms"])
+        failed += "error" in record
+        while next_index in finished:
+            out.write(json.dumps(finished.pop(next_index), ensure_ascii=False) + "\n")
+            out.flush()
+            next_index += 1
+        print(f"\r⏳ 已完成 {len(latencies)}/{len(tasks)} (失败 {failed})", end="", file=sys.stderr, flush=True)
+
+    if out is not sys.stdout:
+        out.close()
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    if latencies:
+        print(f"✅ 批量问答完成：{len(tasks)} 个问题，用时 {elapsed:.1f}s，"
+              f"单题延迟中位 {statistics.median(latencies):.0f}ms，失败 {failed} 个", file=sys.stderr)
+    await async_client.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="《不正经有限公司》知识库问答")
+    parser.add_argument(
+        "--mode", choices=["vector", "hybrid"], default="vector",
+        help="检索方式：vector 纯向量；hybrid 向量 + BM25 倒排索引，用 RRF 融合"
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default="chroma", help="向量库后端 (需与入库时一致)")
+    parser.add_argument("--stream", action="store_true", help="流式输出回答，并统计首 token 耗时")
+    parser.add_argument("--batch", metavar="PATH", help="批量模式：从文件 (JSONL 或每行一个问题) 读取，'-' 表示标准输入")
+    parser.add_argument("--output", help="批量模式的 JSONL 输出路径，默认打印到标准输出")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="批量模式的并发数")
+    parser.add_argument("--rpm", type=int, default=BATCH_RPM, help="批量模式每分钟最多请求 DeepSeek 的次数，0 为不限")
+    # 交互模式默认开启问答缓存；批量模式多用于回归测试，默认关闭，避免重放旧回答
+    parser.add_argument("--answer-cache", dest="answer_cache", action="store_true", default=None,
+                        help="开启问答缓存 (批量模式默认关闭)")
+    parser.add_argument("--no-answer-cache", dest="answer_cache", action="store_false",
+                        help="关闭问答缓存，每个问题都重新检索和生成")
+    parser.add_argument("--cache-distance", type=float, default=MAX_DISTANCE,
+                        help="语义缓存的余弦距离阈值，越小越保守")
+    parser.add_argument("--cache-ttl", type=float, default=TTL_SECONDS, help="缓存回答的有效期 (秒)")
+    parser.add_argument("--top-k", type=int, default=N_RESULTS, help="送给大模型的片段数")
+    parser.add_argument("--candidates", type=int, default=HYBRID_CANDIDATES, help="混合检索时每一路召回的候选数")
+    return parser.parse_args()
+
+# ==========================================
+# 3. 开启命令行交互循环
+# ==========================================
+def main():
+    args = parse_args()
+    llm_client = OpenAI(api_key=api_key, base_url=base_url)
+
+    # 常见问题反复被问，问题的向量直接从本地缓存取
+    embedding_cache = EmbeddingCache()
+
+    embedding_function = OllamaEmbeddingFunction(model_name=MODEL_NAME, cache=embedding_cache)
+    answer_cache = None
+    if args.answer_cache if args.answer_cache is not None else not args.batch:
+        answer_cache = AnswerCache(max_distance=args.cache_distance, ttl=args.cache_ttl,
+                                   scope=answer_cache_scope(args))
+
+    try:
+        collection = open_collection(backend=args.backend, embedding_function=embedding_function)
     except Exception as e:
-        print(f"\n❌ 调用 DeepSeek 失败: {e}")
\ No newline at end of file
+        print("❌ 找不到集合，请确保你已经成功运行了入库脚本！")
+        exit()
+
+    lexical = None
+    if args.mode == "hybrid":
+        if not os.path.exists(LEXICAL_PATH):
+            print("❌ 找不到 BM25 倒排索引，请先重新运行一次入库脚本！")
+            exit()
+        lexical = LexicalIndex()
+
+    if args.batch:
+        asyncio.run(run_batch(args, collection, lexical, embedding_function, answer_cache))
+        print_answer_cache_stats(answer_cache, file=sys.stderr)
+        return
+
+    print("🎉 知识库加载成功！《不正经有限公司》 管理助手已就绪。")
+    print(f"🔎 检索模式: {args.mode}")
+    print("==========================================")
+
+    timing_records = []
+    while True:
+        # 获取用户终端输入 (Ctrl+C / Ctrl+D 也当作退出，照样打印统计)
+        try:
+            user_question = input("\n🙋 请输入你的问题 (输入 'q' 或 'exit' 退出): ").strip()
+        except (KeyboardInterrupt, EOFError):
+            print()
+            break
+
+        # 判断是否退出
+        if user_question.lower() in ['q', 'exit', 'quit']:
+            break
+
+        # 如果用户直接按了回车没打字，就跳过这次循环
+        if not user_question:
+            continue
+
+        # 先查问答缓存：同一个问题或者换个说法的同一个问题，直接复用之前的回答
+        question_embedding = None
+        if answer_cache is not None:
+            question_embedding = embedding_function([user_question])[0]
+            tier, cached = answer_cache.lookup(user_question, question_embedding)
+            if cached:
+                label = "精确命中" if tier == "exact" else f"语义命中，相似问题: {cached['question']}"
+                print(f"\n⚡ 缓存{label}")
+                print("\n🤖 助手回答：")
+                print(cached["answer"])
+                print("\n" + "="*40)
+                continue
+
+        print(f"\n🔍 正在知识库中检索...")
+
+        # A：检索 (Retrieval)
+        start = time.perf_counter()
+        timings = {}
+        hits = retrieve(collection, lexical, user_question, args, timings)
+        retrieval_ms = (time.perf_counter() - start) * 1000
+
+        if timings:
+            print(f"⏱️ 检索耗时 {retrieval_ms:.1f}ms "
+                  f"(向量 {timings['vector_ms']:.1f}ms | BM25 {timings['bm25_ms']:.1f}ms | 融合 {timings['fuse_ms']:.1f}ms)")
+        else:
+            print(f"⏱️ 检索耗时 {retrieval_ms:.1f}ms")
+
+        retrieved_context = format_context(hits)
+
+        # B：增强生成 (Augmented Generation)
+        print("🧠 DeepSeek 正在思考...")
+
+        system_prompt = build_system_prompt(retrieved_context)
+
+        try:
+            if args.stream:
+                print("\n🤖 助手回答：")
+                answer, metrics = generate_answer(llm_client, system_prompt, user_question, stream=True)
+            else:
+                answer, metrics = generate_answer(llm_client, system_prompt, user_question)
+                print("\n🤖 助手回答：")
+                print(answer)
+
+            metrics["retrieval_ms"] = retrieval_ms
+            timing_records.append(metrics)
+            if answer_cache is not None and answer:
+                sources = [hit["metadata"].get("source", "未知来源") for hit in hits]
+                answer_cache.put(user_question, answer, sources, question_embedding)
+            speed = f"{metrics['tokens_per_s']:.1f} tok/s" if metrics["tokens_per_s"] else "-"
+            ttft = f"首 token {metrics['ttft_ms']:.0f}ms | " if metrics["ttft_ms"] is not None else ""
+            print(f"\n⏱️ 检索 {retrieval_ms:.0f}ms | {ttft}生成 {metrics['gen_ms']:.0f}ms | {speed}")
+            print("\n" + "="*40) # 打印一条分割线，方便看下一次提问
+
+        except Exception as e:
+            print(f"\n❌ 调用 DeepSeek 失败: {e}")
+
+    print_timing_summary(timing_records)
+    print_answer_cache_stats(answer_cache)
+    stats = embedding_cache.stats()
+    print(f"🗃️ 问题向量缓存命中率: {stats['hit_rate']:.1%} (命中 {stats['hits']} / 未命中 {stats['misses']})")
+    print("👋 拜拜！下次再聊！")
+
+if __name__ == "__main__":
+    main()
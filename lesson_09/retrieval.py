@@ -0,0 +1,76 @@
+import time
+
+# ==========================================
+# 检索参数
+# ==========================================
+RRF_K = 60              # RRF 平滑常数，论文和各家实现的常用值
+HYBRID_CANDIDATES = 10  # 混合检索时两路各自召回的候选数
+
+# ==========================================
+# 纯向量检索
+# ==========================================
+def vector_search(collection, question, n_results=3):
+    """返回 [{id, document, metadata, distance}, ...]"""
+    results = collection.query(query_texts=[question], n_results=n_results)
+    hits = []
+    for i, doc_id in enumerate(results['ids'][0]):
+        hits.append({
+            "id": doc_id,
+            "document": results['documents'][0][i],
+            "metadata": results['metadatas'][0][i] or {},
+            "distance": results['distances'][0][i],
+        })
+    return hits
+
+# ==========================================
+# BM25 + 向量 混合检索 (Reciprocal Rank Fusion)
+# ==========================================
+def rrf_fuse(rankings, k=RRF_K):
+    """
+    rankings: 若干路排好序的 ID 列表。
+    每个 ID 的得分 = Σ 1 / (k + 名次)，不依赖各路分数的量纲，直接按名次融合。
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def hybrid_search(collection, lexical_index, question, n_results=3,
+                  candidates=HYBRID_CANDIDATES, timings=None):
+    """
+    两路各召回 candidates 个，再用 RRF 取前 n_results 个。
+    timings 传入字典时会写入 vector/bm25/fuse 三段耗时 (毫秒)。
+    """
+    t0 = time.perf_counter()
+    vector_hits = vector_search(collection, question, n_results=candidates)
+    t1 = time.perf_counter()
+    bm25_hits = lexical_index.search(question, k=candidates)
+    t2 = time.perf_counter()
+
+    fused = rrf_fuse([[h["id"] for h in vector_hits], [doc_id for doc_id, _ in bm25_hits]])[:n_results]
+
+    # 只被 BM25 召回的块，需要回 Chroma 取原文和元数据
+    by_id = {h["id"]: h for h in vector_hits}
+    missing = [doc_id for doc_id, _ in fused if doc_id not in by_id]
+    if missing:
+        extra = collection.get(ids=missing, include=["documents", "metadatas"])
+        for i, doc_id in enumerate(extra['ids']):
+            by_id[doc_id] = {
+                "id": doc_id,
+                "document": extra['documents'][i],
+                "metadata": extra['metadatas'][i] or {},
+                "distance": None,
+            }
+
+    hits = []
+    for doc_id, score in fused:
+        if doc_id in by_id:
+            hits.append(dict(by_id[doc_id], rrf_score=score))
+    t3 = time.perf_counter()
+
+    if timings is not None:
+        timings["vector_ms"] = (t1 - t0) * 1000
+        timings["bm25_ms"] = (t2 - t1) * 1000
+        timings["fuse_ms"] = (t3 - t2) * 1000
+    return hits
@@ -1,8 +1,15 @@
 import os
-import uuid
-import chromadb
-import ollama
+import hashlib
+import argparse
+from contextlib import nullcontext
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+from embedding_utils import OllamaEmbeddingFunction, BATCH_SIZE, MAX_WORKERS
+from embedding_cache import EmbeddingCache
+from lexical_index import LexicalIndex
+from answer_cache import bump_ingest_stamp
+from vector_store import open_collection as open_store, BACKENDS, DTYPES
 
 # ==========================================
 # 核心配置区 (动态绝对路径版)
@@ -17,25 +24,344 @@ SOURCE_NAME = "company_rules.md"
 COLLECTION_NAME = "company_knowledge"       
 MODEL_NAME = "quentinz/bge-small-zh-v1.5"
 
+# 切分参数 (bench_retrieval.py 会拿不同的组合来对比)
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 50
+HEADERS_TO_SPLIT_ON = (
+    ("#", "一级标题"),
+    ("##", "二级标题"),
+    ("###", "三级标题"),
+)
+
+# 目录模式参数
+MARKDOWN_EXTS = (".md", ".markdown")
+SPLIT_PROCESSES = os.cpu_count() or 2   # 切分用的进程数
+WRITE_BATCH_SIZE = 256                   # 每攒够这么多块就写一次 Chroma
+
 # ==========================================
-# 定义 Ollama 嵌入函数 (连接大模型)
+# 切分与内容寻址 ID
 # ==========================================
-class OllamaEmbeddingFunction:
-    def __init__(self, model_name):
-        self.model_name = model_name
+@lru_cache(maxsize=8)
+def get_splitters(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, headers=HEADERS_TO_SPLIT_ON):
+    """切分器只构造一次 (目录模式下每个子进程各构造一次)"""
+    # 第一刀：按 Markdown 标题切分 (保留结构化语义)
+    markdown_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=list(headers))
+
+    # 第二刀：按字符长度细切 (适配 bge-small 的 Token 限制)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,        # 限制每块最大字符数 (默认 400)
+        chunk_overlap=chunk_overlap   # 相邻块重叠的字符数 (默认 50)，防止一句话被生生劈断
+    )
+    return markdown_splitter, text_splitter
 
-    def __call__(self, input):
-        # 自动调用本地 Ollama 计算句向量
-        response = ollama.embed(model=self.model_name, input=input)
-        return response['embeddings']
-    def name(self):
-        return self.model_name
+def split_markdown(md_text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, headers=HEADERS_TO_SPLIT_ON):
+    """两刀切分：先按标题切，再按长度细切，返回 LangChain Document 列表"""
+    markdown_splitter, text_splitter = get_splitters(chunk_size, chunk_overlap, tuple(tuple(h) for h in headers))
+    md_header_splits = markdown_splitter.split_text(md_text)
+    return text_splitter.split_documents(md_header_splits)
 
-def main():
+def chunk_id(source, text, metadata):
+    """
+    内容寻址 ID：sha256(来源 + 标题元数据 + 正文)。
+    内容不变 ID 就不变，这是增量入库能做 diff 的前提。
+    """
+    hasher = hashlib.sha256()
+    hasher.update(source.encode("utf-8"))
+    for key in sorted(metadata):
+        if key == "source":
+            continue
+        hasher.update(b"\x00")
+        hasher.update(f"{key}={metadata[key]}".encode("utf-8"))
+    hasher.update(b"\x01")
+    hasher.update(text.encode("utf-8"))
+    return hasher.hexdigest()
+
+def build_chunks(splits, source):
+    """把切片转换成 (ids, texts, metadatas) 三元组，重复内容只保留一份"""
+    docs_ids = []
+    docs_texts = []
+    docs_metadatas = []
+    seen = set()
+
+    for doc in splits:
+        # 提取并完善 Metadata
+        metadata = dict(doc.metadata) if doc.metadata else {}
+        metadata["source"] = source  # 戴上“电子脚镣”，方便下次精准删除
+
+        doc_id = chunk_id(source, doc.page_content, metadata)
+        # 同一标题下一字不差的两块，向量也一模一样，存一份就够了
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+
+        docs_ids.append(doc_id)
+        docs_texts.append(doc.page_content)
+        docs_metadatas.append(metadata)
+
+    return docs_ids, docs_texts, docs_metadatas
+
+# ==========================================
+# 两种入库策略
+# ==========================================
+def full_rebuild(collection, source, ids, texts, metadatas, lexical=None):
+    """全量模式：先删后插，所有块都重新计算向量"""
+    print(f"🧹 正在清理数据库中旧的 [{source}] 数据...")
+    try:
+        collection.delete(where={"source": source})
+        print("✨ 旧数据清理完毕 (或原本就没有旧数据)！")
+    except Exception as e:
+        print(f"⚠️ 清理时发生异常 (通常是因为集合是空的): {e}")
+
+    print(f"\n🚀 开始将 {len(texts)} 条数据写入数据库 (会自动调用 Ollama 算向量，请耐心等待)...")
+    # 执行写入 (因为前面已经删干净了，这里直接用 add 即可)
+    collection.add(documents=texts, metadatas=metadatas, ids=ids)
+    if lexical is not None:
+        lexical.delete_source(source)
+        lexical.add(ids, texts, metadatas)
+    return {"added": len(ids), "kept": 0, "removed": None}
+
+def incremental_sync(collection, source, ids, texts, metadatas, lexical=None):
+    """
+    增量模式：和库里已有的 ID 做 diff。
+    - 新出现的 ID：算向量并 upsert
+    - 两边都有的 ID：内容没变，原样保留，不再调用 Ollama
+    - 库里有、这次没有的 ID：说明段落被改或被删，精准删除
+    """
+    existing = collection.get(where={"source": source}, include=[])
+    existing_ids = set(existing["ids"])
+    new_ids = set(ids)
+
+    to_remove = sorted(existing_ids - new_ids)
+    add_idx = [i for i, doc_id in enumerate(ids) if doc_id not in existing_ids]
+    kept = len(new_ids & existing_ids)
+
+    if to_remove:
+        print(f"🧹 删除 {len(to_remove)} 个已失效的数据块...")
+        collection.delete(ids=to_remove)
+        if lexical is not None:
+            lexical.delete(to_remove)
+
+    if add_idx:
+        print(f"\n🚀 开始写入 {len(add_idx)} 个新增/变更的数据块 (只为它们调用 Ollama 算向量)...")
+        collection.upsert(
+            ids=[ids[i] for i in add_idx],
+            documents=[texts[i] for i in add_idx],
+            metadatas=[metadatas[i] for i in add_idx],
+        )
+        if lexical is not None:
+            lexical.add(
+                [ids[i] for i in add_idx],
+                [texts[i] for i in add_idx],
+                [metadatas[i] for i in add_idx],
+            )
+    else:
+        print("\n😴 内容没有变化，无需调用 Ollama。")
+
+    return {"added": len(add_idx), "kept": kept, "removed": len(to_remove)}
+
+# ==========================================
+# 目录模式：流式遍历 + 多进程切分 + 分批写入
+# ==========================================
+def iter_markdown_files(root):
+    """用生成器逐个吐出目录树下的 Markdown 文件路径，不会一次性把几万个路径攒进内存"""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(MARKDOWN_EXTS):
+                        yield entry.path
+        except OSError as e:
+            print(f"\n⚠️ 无法读取目录 {current}: {e}")
+
+def split_file(job):
+    """
+    子进程里执行：读取单个文件并切分。
+    只返回可以 pickle 的纯数据 (ids/texts/metadatas)，不返回 Document 对象。
+    """
+    path, source = job
+    with open(path, "r", encoding="utf-8") as f:
+        md_text = f.read()
+    ids, texts, metadatas = build_chunks(split_markdown(md_text), source)
+    return source, ids, texts, metadatas
+
+def bounded_imap(pool, fn, jobs, max_pending):
+    """
+    和 pool.map 类似，但同时挂起的任务不超过 max_pending 个。
+    pool.map 会先把整个可迭代对象吃进去，目录很大时内存会跟着涨。
+    """
+    pending = set()
+    for job in jobs:
+        pending.add(pool.submit(fn, job))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future
+    for future in pending:
+        yield future
+
+def ingest_directory(collection, root, full=False, processes=SPLIT_PROCESSES, write_batch=WRITE_BATCH_SIZE,
+                     lexical=None):
+    """
+    把整个目录树入库。每个块的 source 是它相对于 root 的路径，
+    所以单个文件依旧可以用 where={"source": ...} 精准删除或增量比对。
+    块的元数据里还记着 root (不参与内容寻址 ID)，遍历结束后库里属于这个 root、
+    但磁盘上已经没有的文件，它们的块会一并删除。
+    numpy 后端在 bulk() 里批量写，整个目录只落盘一次 (Chroma 没有这个接口，照常逐批写)。
+    """
+    root = os.path.abspath(root)
+    stats = {"files": 0, "failed": 0, "added": 0, "kept": 0, "removed": 0}
+    buffer_ids, buffer_texts, buffer_metadatas = [], [], []
+    # 这次在磁盘上见到的文件 (包括切分失败的，它们的旧块先留着)
+    seen_sources = set()
+
+    def flush():
+        if not buffer_ids:
+            return
+        collection.upsert(ids=buffer_ids, documents=buffer_texts, metadatas=buffer_metadatas)
+        if lexical is not None:
+            lexical.add(buffer_ids, buffer_texts, buffer_metadatas)
+        buffer_ids.clear()
+        buffer_texts.clear()
+        buffer_metadatas.clear()
+
+    def jobs():
+        for path in iter_markdown_files(root):
+            source = os.path.relpath(path, root).replace(os.sep, "/")
+            seen_sources.add(source)
+            yield path, source
+
+    bulk = getattr(collection, "bulk", None)
+    with (bulk() if bulk else nullcontext()), ProcessPoolExecutor(max_workers=processes) as pool:
+        for future in bounded_imap(pool, split_file, jobs(), max_pending=processes * 4):
+            try:
+                source, ids, texts, metadatas = future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"\n⚠️ 文件切分失败: {e}")
+                continue
+
+            stats["files"] += 1
+            if full:
+                collection.delete(where={"source": source})
+                if lexical is not None:
+                    lexical.delete_source(source)
+                existing_ids = set()
+            else:
+                existing_ids = set(collection.get(where={"source": source}, include=[])["ids"])
+
+            new_ids = set(ids)
+            to_remove = list(existing_ids - new_ids)
+            if to_remove:
+                collection.delete(ids=to_remove)
+                if lexical is not None:
+                    lexical.delete(to_remove)
+                stats["removed"] += len(to_remove)
+            stats["kept"] += len(existing_ids & new_ids)
+
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                if doc_id in existing_ids:
+                    continue
+                metadata["root"] = root
+                buffer_ids.append(doc_id)
+                buffer_texts.append(text)
+                buffer_metadatas.append(metadata)
+                stats["added"] += 1
+                if len(buffer_ids) >= write_batch:
+                    flush()
+
+            if stats["files"] % 100 == 0:
+                print(f"📁 已处理 {stats['files']} 个文件，新增 {stats['added']} 块...")
+
+        flush()
+
+        for source in sorted(indexed_sources(collection, root) - seen_sources):
+            gone = collection.get(where={"source": source}, include=[])["ids"]
+            collection.delete(ids=gone)
+            if lexical is not None:
+                lexical.delete_source(source)
+            stats["removed"] += len(gone)
+            print(f"🗑️ 文件已不存在，删除它的 {len(gone)} 块: {source}")
+    return stats
+
+def indexed_sources(collection, root, page_size=1000):
+    """
+    库里属于 root 的全部 source。只认带 root 元数据的块：
+    单文件模式写入的块、以及加入 root 之前写入的旧块不会被误删 (旧块用 --full 重建一次即可纳入追踪)。
+    """
+    sources = set()
+    offset = 0
+    while True:
+        page = collection.get(where={"root": root}, include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        sources.update(metadata.get("source") for metadata in page["metadatas"])
+        offset += len(page["ids"])
+    return sources
+
+# ==========================================
+# BM25 倒排索引：和 Chroma 保持同步
+# ==========================================
+def rebuild_lexical(collection, lexical, page_size=1000):
+    """从 Chroma 里分页读出全部文档，重建倒排索引 (首次启用或索引丢失时用)"""
+    lexical.clear()
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        lexical.add(page["ids"], page["documents"], page["metadatas"])
+        offset += len(page["ids"])
+    print(f"🔤 倒排索引已重建，共 {offset} 块")
+
+def open_lexical(args, collection):
+    if args.no_lexical:
+        return None
+    lexical = LexicalIndex()
+    # 倒排索引是后加的：旧库没有它，增量模式又会跳过未变化的块，所以先补齐
+    if not args.full and lexical.count() == 0 and collection.count() > 0:
+        rebuild_lexical(collection, lexical)
+    return lexical
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="切分 Markdown 并写入 ChromaDB 知识库")
+    parser.add_argument(
+        "--full", action="store_true",
+        help="全量重建：删除该来源的全部旧数据后重新入库 (默认是增量同步)"
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default="chroma", help="向量库后端：chroma 或 numpy 内存映射")
+    parser.add_argument("--dtype", choices=DTYPES, default="float32", help="numpy 后端的向量存储精度")
+    parser.add_argument("--dir", help="目录模式：递归入库该目录下的全部 Markdown 文件")
+    parser.add_argument("--processes", type=int, default=SPLIT_PROCESSES, help="目录模式下切分文件的进程数")
+    parser.add_argument("--write-batch", type=int, default=WRITE_BATCH_SIZE, help="目录模式下每批写入 Chroma 的块数")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="每批向量化的文本条数")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="同时并发的向量化批次数")
+    parser.add_argument("--no-cache", action="store_true", help="不使用本地向量缓存，全部交给 Ollama 重算")
+    parser.add_argument("--no-lexical", action="store_true", help="不维护 BM25 倒排索引 (query.py 的混合检索会用到它)")
+    return parser.parse_args()
+
+def open_collection(args, cache):
+    print(f"\n🔌 正在连接向量数据库 ({args.backend})...")
+    embedding_function = OllamaEmbeddingFunction(
+        model_name=MODEL_NAME, batch_size=args.batch_size, max_workers=args.workers, cache=cache
+    )
+    # 获取或创建集合
+    collection = open_store(
+        args.backend, COLLECTION_NAME, embedding_function=embedding_function,
+        create=True, chroma_path=DB_PATH, dtype=args.dtype,
+    )
+    return collection, embedding_function
+
+def ingest_single_file(args, cache):
     # 检查文件是否存在
     if not os.path.exists(FILE_PATH):
         print(f"❌ 找不到文件：{FILE_PATH}，请确保文件存在！")
-        return
+        return None
 
     # ==========================================
     # 3. 读取并切分 Markdown 文件
@@ -44,77 +370,80 @@ def main():
     with open(FILE_PATH, "r", encoding="utf-8") as f:
         md_text = f.read()
 
-    # 第一刀：按 Markdown 标题切分 (保留结构化语义)
-    headers_to_split_on = [
-        ("#", "一级标题"),
-        ("##", "二级标题"),
-        ("###", "三级标题"),
-    ]
-    markdown_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
-    md_header_splits = markdown_splitter.split_text(md_text)
-
-    # 第二刀：按字符长度细切 (适配 bge-small 的 Token 限制)
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=400,     # 限制每块最大 400 字符
-        chunk_overlap=50    # 重叠 50 字符，防止一句话被生生劈断
-    )
-    final_splits = text_splitter.split_documents(md_header_splits)
-    
+    final_splits = split_markdown(md_text)
     print(f"✂️ 文本切分完毕，共切出 {len(final_splits)} 个数据块。")
 
     # ==========================================
-    # 4. 初始化 ChromaDB 并清理旧数据 (先删)
+    # 4. 数据格式转换 (内容寻址 ID)
     # ==========================================
-    print("\n🔌 正在连接 ChromaDB 向量数据库...")
-    client = chromadb.PersistentClient(path=DB_PATH)
-    
-    # 获取或创建集合
-    collection = client.get_or_create_collection(
-        name=COLLECTION_NAME,
-        embedding_function=OllamaEmbeddingFunction(model_name=MODEL_NAME)
-    )
+    docs_ids, docs_texts, docs_metadatas = build_chunks(final_splits, SOURCE_NAME)
 
-    # 🚨 核心逻辑：清理门户！
-    print(f"🧹 正在清理数据库中旧的 [{SOURCE_NAME}] 数据...")
-    try:
-        collection.delete(where={"source": SOURCE_NAME})
-        print("✨ 旧数据清理完毕 (或原本就没有旧数据)！")
-    except Exception as e:
-        print(f"⚠️ 清理时发生异常 (通常是因为集合是空的): {e}")
+    if not docs_texts:
+        print("⚠️ 警告：没有解析到任何文本内容，入库终止。")
+        return None
 
     # ==========================================
-    # 5. 数据格式转换与入库 (后插)
+    # 5. 初始化 ChromaDB 并入库
     # ==========================================
-    docs_texts = []
-    docs_metadatas = []
-    docs_ids = []
+    collection, embedding_function = open_collection(args, cache)
+    lexical = open_lexical(args, collection)
 
-    for doc in final_splits:
-        # 提取纯文本
-        docs_texts.append(doc.page_content)
-        
-        # 提取并完善 Metadata
-        metadata = doc.metadata if doc.metadata else {}
-        metadata["source"] = SOURCE_NAME  # 戴上“电子脚镣”，方便下次精准删除
-        docs_metadatas.append(metadata)
-        
-        # 生成基于 UUID 的唯一标识符
-        docs_ids.append(str(uuid.uuid4()))
+    if args.full:
+        stats = full_rebuild(collection, SOURCE_NAME, docs_ids, docs_texts, docs_metadatas, lexical)
+    else:
+        stats = incremental_sync(collection, SOURCE_NAME, docs_ids, docs_texts, docs_metadatas, lexical)
+    if lexical is not None:
+        lexical.close()
 
-    if not docs_texts:
-        print("⚠️ 警告：没有解析到任何文本内容，入库终止。")
-        return
+    removed = "-" if stats["removed"] is None else stats["removed"]
+    print(f"📊 新增 {stats['added']} 块 | 保留 {stats['kept']} 块 | 删除 {removed} 块")
+    if stats["added"] or stats["removed"] or stats["removed"] is None:
+        # 知识库变了，query.py 里缓存的旧回答随之作废
+        bump_ingest_stamp()
+    return embedding_function
 
-    print(f"\n🚀 开始将 {len(docs_texts)} 条数据写入数据库 (会自动调用 Ollama 算向量，请耐心等待)...")
-    
-    # 执行写入 (因为前面已经删干净了，这里直接用 add 即可)
-    collection.add(
-        documents=docs_texts,
-        metadatas=docs_metadatas,
-        ids=docs_ids
+def ingest_tree(args, cache):
+    root = os.path.abspath(args.dir)
+    if not os.path.isdir(root):
+        print(f"❌ 找不到目录：{root}")
+        return None
+
+    collection, embedding_function = open_collection(args, cache)
+    lexical = open_lexical(args, collection)
+    mode = "全量重建" if args.full else "增量同步"
+    print(f"📂 目录模式 ({mode})：{root}，{args.processes} 个进程切分，每 {args.write_batch} 块写入一次")
+
+    stats = ingest_directory(
+        collection, root, full=args.full, processes=args.processes, write_batch=args.write_batch,
+        lexical=lexical,
     )
+    if lexical is not None:
+        lexical.close()
+    print(f"📊 文件 {stats['files']} 个 (失败 {stats['failed']}) | "
+          f"新增 {stats['added']} 块 | 保留 {stats['kept']} 块 | 删除 {stats['removed']} 块")
+    if stats["added"] or stats["removed"]:
+        bump_ingest_stamp()
+    return embedding_function
+
+def main():
+    args = parse_args()
+    cache = None if args.no_cache else EmbeddingCache()
+
+    if args.dir:
+        embedding_function = ingest_tree(args, cache)
+    else:
+        embedding_function = ingest_single_file(args, cache)
 
-    print("🎉 入库大功告成！你的 RAG 专属知识库已经准备就绪！")
+    if embedding_function is not None:
+        pipeline = embedding_function.pipeline
+        if pipeline.total_chunks:
+            print(f"⚡ 向量化共 {pipeline.total_chunks} 块，平均吞吐 {pipeline.throughput():.1f} 块/秒")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"🗃️ 向量缓存: 命中 {stats['hits']} | 未命中 {stats['misses']} | 命中率 {stats['hit_rate']:.1%}")
+        cache.close()
+    if embedding_function is not None:
+        print("🎉 入库大功告成！你的 RAG 专属知识库已经准备就绪！")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,347 @@
+import os
+import json
+from contextlib import contextmanager
+
+import numpy as np
+
+# ==========================================
+# 配置
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NUMPY_DB_PATH = os.path.join(BASE_DIR, "my_rag_npy")
+BACKENDS = ("chroma", "numpy")
+DTYPES = ("float32", "float16", "int8")
+
+# ==========================================
+# NumPy 内存映射向量库 (精确检索)
+# ==========================================
+QUERY_BLOCK_ROWS = 8192   # 不缓存 float32 副本时，查询每次只反量化这么多行，临时内存有上限
+
+class NumpyCollection:
+    """
+    用一个内存映射的矩阵存向量，documents/metadatas 放在旁边的 JSON 里。
+    对外只实现入库和查询脚本用到的那部分 Chroma Collection 接口：
+    count / add / upsert / get / delete / query。
+
+    - 向量入库前做 L2 归一化，检索就是一次矩阵乘法，返回的 distance 是余弦距离 (1 - cos)
+    - dtype 可选 float32 / float16 / int8 (int8 每行带一个缩放系数)
+    - 写操作先改内存里的 float32 副本，再落盘；在 bulk() 里的写操作只在退出时落盘一次
+    - 落盘时向量写进带代号的新文件，最后原子替换 meta.json 才算提交，中途崩溃不会新旧混搭
+    - float16/int8 库第一次查询时反量化出一份 float32 副本缓存起来 (写操作后作废)，
+      之后查询和 float32 一样快；内存紧张时传 cache_dense=False，改为每次分块反量化
+    """
+
+    def __init__(self, path, name, embedding_function=None, dtype="float32", cache_dense=True):
+        if dtype not in DTYPES:
+            raise ValueError(f"不支持的 dtype: {dtype}，可选 {DTYPES}")
+        self.name = name
+        self.dir = os.path.join(path, name)
+        self.embedding_function = embedding_function
+        self.dtype = dtype
+        self.cache_dense = cache_dense
+
+        self._meta_path = os.path.join(self.dir, "meta.json")
+        self._generation = 0
+        self._files = {}       # 当前代号的向量/缩放系数文件名
+
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._index = {}
+        self._vectors = None   # np.memmap，形状 (n, dim)
+        self._scales = None    # 仅 int8 使用，形状 (n,)
+        self._staged = None    # 有未落盘的写操作时：float32 缓冲区，前 len(ids) 行有效
+        self._dense_cache = None   # float16/int8 反量化后的 float32 副本，只给查询用
+        self._bulk_depth = 0
+        self._load()
+
+    # ---------- 读写磁盘 ----------
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # 已有的库沿用建库时的精度
+        self.dtype = meta.get("dtype", self.dtype)
+        self._generation = meta.get("generation", 0)
+        # 旧版本的库没有代号，文件名固定
+        self._files = meta.get("files", {"vectors": "vectors.npy", "scales": "scales.npy"})
+        self._ids = meta["ids"]
+        self._documents = meta["documents"]
+        self._metadatas = meta["metadatas"]
+        self._index = {doc_id: i for i, doc_id in enumerate(self._ids)}
+        self._vectors = None
+        self._scales = None
+        self._dense_cache = None
+        if self._ids:
+            self._vectors = np.load(os.path.join(self.dir, self._files["vectors"]), mmap_mode="r")
+            if self.dtype == "int8":
+                self._scales = np.load(os.path.join(self.dir, self._files["scales"]), mmap_mode="r")
+
+    def flush(self):
+        """把内存里的改动落盘；没有改动时什么都不做"""
+        if self._staged is None:
+            return
+        os.makedirs(self.dir, exist_ok=True)
+        generation = self._generation + 1
+        files = {}
+        if self._ids:
+            stored, scales = self._quantize(self._staged[:len(self._ids)])
+            files["vectors"] = f"vectors-{generation}.npy"
+            np.save(os.path.join(self.dir, files["vectors"]), stored)
+            if scales is not None:
+                files["scales"] = f"scales-{generation}.npy"
+                np.save(os.path.join(self.dir, files["scales"]), scales)
+
+        meta = {
+            "dtype": self.dtype,
+            "generation": generation,
+            "files": files,
+            "ids": self._ids,
+            "documents": self._documents,
+            "metadatas": self._metadatas,
+        }
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        # 这一步是提交点：之前崩溃，meta 仍指向旧文件；之后崩溃，新文件已经完整
+        os.replace(tmp, self._meta_path)
+
+        # 先释放内存映射 (否则 Windows 上删不掉)，再清理不再引用的旧文件
+        self._vectors = None
+        self._scales = None
+        self._staged = None
+        self._dense_cache = None
+        current = set(files.values())
+        for name in os.listdir(self.dir):
+            if name.endswith(".npy") and name.startswith(("vectors", "scales")) and name not in current:
+                try:
+                    os.remove(os.path.join(self.dir, name))
+                except OSError:
+                    pass   # 别的进程还映射着，下次落盘再删
+        self._load()
+
+    @contextmanager
+    def bulk(self):
+        """批量写入：with 块里的 upsert/delete 只改内存，退出时统一落盘一次"""
+        self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            self._bulk_depth -= 1
+            if not self._bulk_depth:
+                self.flush()
+
+    def _changed(self):
+        if not self._bulk_depth:
+            self.flush()
+
+    def _quantize(self, vectors_f32):
+        if self.dtype == "float32":
+            return vectors_f32.astype(np.float32), None
+        if self.dtype == "float16":
+            return vectors_f32.astype(np.float16), None
+        scales = np.abs(vectors_f32).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors_f32 / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _dequantize(self, start, stop):
+        block = np.asarray(self._vectors[start:stop], dtype=np.float32)
+        if self.dtype == "int8":
+            block = block * np.asarray(self._scales[start:stop])[:, None]
+        return block
+
+    def _stage(self, rows, dim):
+        """
+        写操作前调用：把向量转成可修改的 float32 缓冲区 (只在第一次写时复制)，
+        并保证至少能放下 rows 行。容量按倍数增长，连续追加是均摊 O(1) 的。
+        """
+        n = len(self._ids)
+        self._dense_cache = None
+        if self._staged is None:
+            if self._vectors is None:
+                self._staged = np.empty((0, dim), dtype=np.float32)
+            else:
+                # np.array 一定会复制，之后替换底层文件也不受影响
+                self._staged = np.array(self._vectors[:n], dtype=np.float32)
+                if self.dtype == "int8":
+                    self._staged *= np.asarray(self._scales[:n])[:, None]
+        if rows > self._staged.shape[0]:
+            grown = np.empty((max(rows, 2 * self._staged.shape[0]), dim), dtype=np.float32)
+            grown[:n] = self._staged[:n]
+            self._staged = grown
+        return self._staged
+
+    def _dense(self, positions):
+        """按位置取 float32 向量 (有未落盘改动时从缓冲区取)"""
+        if self._staged is not None:
+            return self._staged[positions]
+        dense = np.asarray(self._vectors[positions], dtype=np.float32)
+        if self.dtype == "int8":
+            dense = dense * np.asarray(self._scales[positions])[:, None]
+        return dense
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _embed(self, texts):
+        if self.embedding_function is None:
+            raise ValueError("没有配置 embedding_function，请直接传入 embeddings")
+        return self.embedding_function(list(texts))
+
+    def exists(self):
+        return os.path.exists(self._meta_path)
+
+    # ---------- Chroma 兼容接口 ----------
+    def count(self):
+        return len(self._ids)
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        duplicated = [doc_id for doc_id in ids if doc_id in self._index]
+        if duplicated:
+            raise ValueError(f"ID 已存在: {duplicated[:3]}...")
+        self.upsert(ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        ids = list(ids)
+        if not ids:
+            return
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+        if embeddings is None:
+            embeddings = self._embed(documents)
+        new_vectors = self._normalize(embeddings)
+
+        appended = sum(doc_id not in self._index for doc_id in dict.fromkeys(ids))
+        staged = self._stage(len(self._ids) + appended, new_vectors.shape[1])
+        for i, doc_id in enumerate(ids):
+            if doc_id in self._index:
+                pos = self._index[doc_id]
+                self._documents[pos] = documents[i]
+                self._metadatas[pos] = metadatas[i]
+            else:
+                pos = len(self._ids)
+                self._index[doc_id] = pos
+                self._ids.append(doc_id)
+                self._documents.append(documents[i])
+                self._metadatas.append(metadatas[i])
+            staged[pos] = new_vectors[i]
+        self._changed()
+
+    def _match(self, where):
+        """只支持 {"key": value} 这种等值过滤 (脚本里只用到 source / root)"""
+        if not where:
+            return list(range(len(self._ids)))
+        return [
+            i for i, metadata in enumerate(self._metadatas)
+            if all((metadata or {}).get(k) == v for k, v in where.items())
+        ]
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas"), limit=None, offset=None):
+        if ids is not None:
+            positions = [self._index[doc_id] for doc_id in ids if doc_id in self._index]
+        else:
+            positions = self._match(where)
+        start = offset or 0
+        positions = positions[start:start + limit] if limit is not None else positions[start:]
+
+        result = {"ids": [self._ids[i] for i in positions]}
+        if "documents" in include:
+            result["documents"] = [self._documents[i] for i in positions]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadatas[i] for i in positions]
+        if "embeddings" in include:
+            result["embeddings"] = self._dense(np.array(positions, dtype=np.int64)).tolist() if positions else []
+        return result
+
+    def delete(self, ids=None, where=None):
+        if ids is not None:
+            drop = {self._index[doc_id] for doc_id in ids if doc_id in self._index}
+        else:
+            drop = set(self._match(where))
+        if not drop:
+            return
+        keep = np.array([i for i in range(len(self._ids)) if i not in drop], dtype=np.int64)
+        self._staged = self._stage(len(self._ids), dim=None)[keep]
+        self._ids = [self._ids[i] for i in keep]
+        self._documents = [self._documents[i] for i in keep]
+        self._metadatas = [self._metadatas[i] for i in keep]
+        self._index = {doc_id: i for i, doc_id in enumerate(self._ids)}
+        self._changed()
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None):
+        if query_embeddings is None:
+            query_embeddings = self._embed(query_texts)
+        queries = self._normalize(query_embeddings)
+        empty = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        n = len(self._ids)
+        if not n:
+            for key in empty:
+                empty[key] = [[] for _ in range(len(queries))]
+            return empty
+
+        # 矩阵乘法算完所有相似度: (q, dim) @ (dim, n) -> (q, n)
+        if self._staged is not None:
+            sims = queries @ self._staged[:n].T
+        elif self.dtype == "float32":
+            sims = queries @ np.asarray(self._vectors).T
+        elif self.cache_dense:
+            if self._dense_cache is None:
+                self._dense_cache = self._dequantize(0, n)
+            sims = queries @ self._dense_cache.T
+        else:
+            # float16/int8 分块反量化，临时内存只有一个块，不会每次查询都复制整个库
+            sims = np.empty((len(queries), n), dtype=np.float32)
+            for start in range(0, n, QUERY_BLOCK_ROWS):
+                stop = min(start + QUERY_BLOCK_ROWS, n)
+                sims[:, start:stop] = queries @ self._dequantize(start, stop).T
+
+        candidates = None if not where else np.array(self._match(where), dtype=np.int64)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row in sims:
+            if candidates is not None:
+                masked = np.full_like(row, -np.inf)
+                masked[candidates] = row[candidates]
+                row = masked
+            k = min(n_results, len(row))
+            # argpartition 先粗选前 k，再对这 k 个排序，比整体 argsort 快
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            top = [i for i in top if np.isfinite(row[i])]
+            result["ids"].append([self._ids[i] for i in top])
+            result["documents"].append([self._documents[i] for i in top])
+            result["metadatas"].append([self._metadatas[i] for i in top])
+            result["distances"].append([float(1.0 - row[i]) for i in top])
+        return result
+
+# ==========================================
+# 统一的打开入口
+# ==========================================
+def open_collection(backend, name, embedding_function=None, create=False,
+                    chroma_path=None, numpy_path=NUMPY_DB_PATH, dtype="float32"):
+    """
+    按 backend 打开集合，返回的对象对入库/查询脚本来说用法一致。
+    create=False 时集合不存在会抛异常 (和 chroma 的 get_collection 行为一致)。
+    """
+    if backend == "numpy":
+        collection = NumpyCollection(numpy_path, name, embedding_function=embedding_function, dtype=dtype)
+        if not create and not collection.exists():
+            raise FileNotFoundError(f"找不到 NumPy 向量库: {collection.dir}")
+        return collection
+
+    if backend == "chroma":
+        # chromadb 的导入和初始化本身就很慢，只有真的要用时才加载
+        import chromadb
+        client = chromadb.PersistentClient(path=chroma_path)
+        if create:
+            return client.get_or_create_collection(name=name, embedding_function=embedding_function)
+        return client.get_collection(name=name, embedding_function=embedding_function)
+
+    raise ValueError(f"未知的向量库后端: {backend}，可选 {BACKENDS}")
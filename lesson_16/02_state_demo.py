@@ -1,4 +1,5 @@
 import os
+import sys
 import random
 import json
 import operator
@@ -6,8 +7,13 @@ from typing import TypedDict, Annotated
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
 
+# 流式 JSON 解析工具在仓库的 tools 目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+from streaming_json import stream_structured  # noqa: E402
+
 # 加载环境变量
 load_dotenv()
 
@@ -21,6 +27,11 @@ class AgentState(TypedDict):
     result: dict
     status: str  # 专门留给 Edge 读取的标杆："success" 或 "error"
 
+# 大模型返回的 JSON 最后要通过这个模型校验
+class PersonInfo(BaseModel):
+    name: str
+    age: int
+
 # ==========================================
 # 2. 定义 Nodes (打工人：只负责干活并更新黑板)
 # ==========================================
@@ -64,14 +75,34 @@ def node_b_llm(state: AgentState):
     
     prompt = f"请提取以下文本中的信息，并返回JSON格式，必须包含 name 和 age 字段。\n文本：{state['input_text']}"
     message = HumanMessage(content=prompt)
-    
-    response = llm_with_json.invoke([message])
-    parsed_json = json.loads(response.content)
-    
-    # 更新状态：将成功的 JSON 写回黑板，状态标为 success
+
+    # 流式接收：每个字段一生成完就打印，不必等整段 JSON
+    raw_chunks = []
+    def chunks():
+        for chunk in llm_with_json.stream([message]):
+            raw_chunks.append(chunk.content)
+            yield chunk.content
+
+    def on_field(key, value):
+        print(f"  [→] 字段 {key} 已生成: {value}")
+
+    try:
+        person, timings = stream_structured(chunks(), model=PersonInfo, on_field=on_field)
+    except (ValueError, ValidationError) as e:
+        # JSON 不完整或字段不合格，同样交给 Edge 打回重试
+        print(f"  [!] 结构化输出校验失败: {e}")
+        error_result = {"message": "输出格式不对"}
+        return {
+            "messages": [AIMessage(content="".join(raw_chunks))],
+            "result": error_result,
+            "status": "error"
+        }
+    print(f"  [⏱] 首个字段 {timings['first_field_ms']:.0f}ms，完整结果 {timings['total_ms']:.0f}ms")
+
+    # 更新状态：将校验通过的 JSON 写回黑板，状态标为 success
     return {
-        "messages": [response],
-        "result": parsed_json,
+        "messages": [AIMessage(content="".join(raw_chunks))],
+        "result": person.model_dump(),
         "status": "success"
     }
 
@@ -0,0 +1,489 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 借用文件整理助手的规则表生成分类答案。注意：打分用的也是这套规则，所以在模拟服务上测出的
+# “准确率”衡量不了分类能力，只能检查整理流程有没有把模型的答案原样执行 (--misclassify-rate 注入错分)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lesson_06"))
+from agent_tools import classify_filename, FALLBACK_CATEGORY, KEYWORD_RULES, EXTENSION_RULES  # noqa: E402
+
+# ==========================================
+# 1. 配置区域
+# ==========================================
+HOST = "127.0.0.1"
+PORT = 8765
+LATENCY_MS = 300          # 首 token 之前的固定延迟 (模拟排队 + prefill)
+TOKENS_PER_SEC = 60.0     # 输出速度，0 表示不限速
+JITTER = 0.2              # 延迟随机抖动比例
+MAX_AGENT_TURNS = 20      # 模拟 Agent 最多调用多少轮工具后强制收尾
+
+CATEGORIES = sorted({c for _, c in KEYWORD_RULES} | {folder for folder, _, _ in EXTENSION_RULES} | {FALLBACK_CATEGORY})
+
+# ==========================================
+# 2. 小工具：token 估算、从对话里取信息
+# ==========================================
+def estimate_tokens(text):
+    """粗估 token 数：中文大约一字一个，ASCII 大约四个字符一个"""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4 + 1
+
+def content_text(message):
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        # 多段内容格式：[{"type": "text", "text": ...}, ...]
+        content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+def last_message(messages, role):
+    for message in reversed(messages):
+        if message.get("role") == role:
+            return message
+    return None
+
+def tool_name_of(messages, tool_message):
+    """tool 消息不一定带 name，按 tool_call_id 回查 assistant 的调用"""
+    if tool_message.get("name"):
+        return tool_message["name"]
+    for message in messages:
+        for call in message.get("tool_calls") or []:
+            if call.get("id") == tool_message.get("tool_call_id"):
+                return call["function"]["name"]
+    return None
+
+def load_json(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+# ==========================================
+# 3. 回复生成：脚本规则优先，其次是内置的规则引擎
+# ==========================================
+def scripted_reply(rules, messages):
+    """
+    规则文件是一个 JSON 列表，按顺序匹配，第一个命中的生效：
+      {"match": "正则", "role": "user|tool|system|any",
+       "response": {"content": "..."} 或 {"tool_calls": [{"name": ..., "arguments": {...}}]}}
+    正则匹配的是该角色最后一条消息的内容 (any 表示最后一条消息)。
+    """
+    for rule in rules:
+        role = rule.get("role", "any")
+        message = messages[-1] if role == "any" else last_message(messages, role)
+        if message is not None and re.search(rule["match"], content_text(message)):
+            return rule["response"]
+    return None
+
+def mock_category(filename, misclassify_rate=0.0, seed=0):
+    """
+    模拟模型给出的分类：按规则表归类，再按 misclassify_rate 故意分错一部分。
+    是否分错、错成什么只取决于 (seed, 文件名)，同一个文件无论第几次问、走哪种模式，答案都一样。
+    """
+    category = classify_filename(filename) or FALLBACK_CATEGORY
+    if misclassify_rate <= 0:
+        return category
+    digest = hashlib.sha1(f"{seed}:{filename}".encode("utf-8")).digest()
+    if int.from_bytes(digest[:4], "big") / 2 ** 32 >= misclassify_rate:
+        return category
+    others = [c for c in CATEGORIES if c != category]
+    return others[int.from_bytes(digest[4:8], "big") % len(others)]
+
+def organizer_reply(messages, tool_names, misclassify_rate=0.0, seed=0):
+    """
+    模拟 lesson_06 的文件整理 Agent：list_files -> move_files -> list_files 复查 -> 总结。
+    状态全部从对话历史里推断，服务端不保存会话。
+    """
+    turns = sum(1 for m in messages if m.get("role") == "assistant")
+    last = messages[-1]
+    if turns >= MAX_AGENT_TURNS:
+        return {"content": "已达到最大轮数，停止整理。"}
+    if last.get("role") != "tool":
+        return {"tool_calls": [{"name": "list_files", "arguments": {}}]}
+
+    # 同一轮可能有多个 tool 结果，取最后一组里的 list_files
+    batch = []
+    for message in reversed(messages):
+        if message.get("role") != "tool":
+            break
+        batch.append(message)
+    listing = next((load_json(m.get("content")) for m in batch if tool_name_of(messages, m) == "list_files"), None)
+
+    if listing is None:
+        # 刚执行完移动，复查一遍
+        return {"tool_calls": [{"name": "list_files", "arguments": {}}]}
+    files = listing.get("files") or []
+    if not files:
+        return {"content": "✅ 文件夹已经整理完毕，所有文件都放进了对应的分类文件夹。"}
+
+    moves = [{"filename": f, "category": mock_category(f, misclassify_rate, seed)} for f in files]
+    if "move_files" in tool_names:
+        return {"tool_calls": [{"name": "move_files", "arguments": {"moves": moves}}]}
+    return {"tool_calls": [{"name": "move_file", "arguments": m} for m in moves]}
+
+def generic_tool_reply(messages, tools):
+    """普通工具：用户说完话先调第一个工具，拿到结果后给出总结"""
+    if messages[-1].get("role") == "tool":
+        return {"content": f"根据工具返回的信息：{content_text(messages[-1])[:200]}"}
+    function = tools[0]["function"]
+    question = content_text(last_message(messages, "user") or {})
+    arguments = {}
+    properties = (function.get("parameters") or {}).get("properties", {})
+    for name in (function.get("parameters") or {}).get("required", list(properties)):
+        kind = properties.get(name, {}).get("type")
+        arguments[name] = 1 if kind in ("integer", "number") else question[:20]
+    return {"tool_calls": [{"name": function["name"], "arguments": arguments}]}
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_OPTIONS_RE = re.compile(r"[\[【]([^\]】]+)[\]】]")
+
+def _find_schema(messages):
+    """在 system/user 消息里找嵌入的 JSON Schema (例如 lesson_04 的 model_json_schema())"""
+    for message in messages:
+        text = content_text(message)
+        start = text.find('{"')
+        while start != -1:
+            try:
+                schema, _ = json.JSONDecoder().raw_decode(text, start)
+            except ValueError:
+                schema = None
+            if isinstance(schema, dict) and "properties" in schema:
+                return schema
+            start = text.find('{"', start + 1)
+    return None
+
+def fill_schema(schema, text):
+    """按 schema 的字段类型从文本里凑值：数字取第一个数，有候选项的挑文本里出现的那个"""
+    numbers = _NUMBER_RE.findall(text)
+    result = {}
+    for name, spec in schema["properties"].items():
+        kind = spec.get("type")
+        if kind in ("number", "integer"):
+            value = float(numbers[0]) if numbers else 0.0
+            result[name] = int(value) if kind == "integer" else value
+        elif kind == "array":
+            result[name] = []
+        else:
+            # 描述里给了候选项 (例如 “只能从以下选择：[餐饮, 交通, ...]”) 就挑一个
+            options = _OPTIONS_RE.search(spec.get("description", ""))
+            if options:
+                choices = [c.strip() for c in re.split(r"[,，、]", options.group(1)) if c.strip()]
+                result[name] = next((c for c in choices if c in text), choices[-1])
+            else:
+                result[name] = text[:20] or name
+    return result
+
+def json_reply(messages, misclassify_rate=0.0, seed=0):
+    """response_format=json_object：按 schema 或提示词里点名的字段拼一个 JSON"""
+    user_text = content_text(last_message(messages, "user") or {})
+
+    # 文件整理的规划模式：用户消息是 {"files": [...]}，一次性返回整份计划
+    request = load_json(user_text)
+    if isinstance(request, dict) and isinstance(request.get("files"), list):
+        return {"moves": [{"filename": f, "category": mock_category(f, misclassify_rate, seed)}
+                          for f in request["files"]]}
+
+    schema = _find_schema(messages)
+
+    # 打包记账：用户消息是 {"bills": [{"id", "text"}, ...]}，逐条按 schema 填好放进 items
+    if schema and isinstance(request, dict) and isinstance(request.get("bills"), list):
+        return {"items": [{"id": bill.get("id"), **fill_schema(schema, str(bill.get("text", "")))}
+                          for bill in request["bills"] if isinstance(bill, dict)]}
+    if schema:
+        return fill_schema(schema, user_text)
+
+    numbers = _NUMBER_RE.findall(user_text)
+    # 没有 schema：找提示词里 “包含 name 和 age 字段” 这样点名的英文字段
+    prompt = " ".join(content_text(m) for m in messages)
+    named = re.search(r"包含(.{1,60}?)字段", prompt)
+    fields = re.findall(r"[A-Za-z_][A-Za-z0-9_]*", named.group(1)) if named else []
+    if not fields:
+        return {"answer": user_text[:100]}
+    result = {}
+    for field in fields:
+        if field.lower() in ("age", "amount", "count", "price", "total") and numbers:
+            result[field] = float(numbers[0]) if "." in numbers[0] else int(numbers[0])
+        else:
+            match = re.search(r"([一-龥A-Za-z]+)", user_text.split("：")[-1])
+            result[field] = match.group(1) if match else user_text[:20]
+    return result
+
+def build_reply(body, rules, misclassify_rate=0.0, seed=0):
+    """返回 {"content": ...} 或 {"tool_calls": [...]}"""
+    messages = body.get("messages") or []
+    tools = body.get("tools") or []
+    tool_names = {t["function"]["name"] for t in tools}
+
+    reply = scripted_reply(rules, messages) if rules else None
+    if reply is not None:
+        return reply
+    if "list_files" in tool_names:
+        return organizer_reply(messages, tool_names, misclassify_rate, seed)
+    if tools and body.get("tool_choice") != "none":
+        return generic_tool_reply(messages, tools)
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return {"content": json.dumps(json_reply(messages, misclassify_rate, seed), ensure_ascii=False)}
+    question = content_text(last_message(messages, "user") or {})
+    return {"content": f"（模拟回复）收到你的问题：{question[:100]}"}
+
+# ==========================================
+# 4. HTTP 服务：/chat/completions (含流式)、/models、/stats
+# ==========================================
+class MockState:
+    """服务端配置 + 统计，多线程共享"""
+
+    def __init__(self, args):
+        self.args = args
+        self.rules = []
+        if args.script:
+            with open(args.script, "r", encoding="utf-8") as f:
+                self.rules = json.load(f)
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.counter = 0
+        self.seen_prefixes = set()   # 模拟服务端的前缀缓存：见过的 system prompt
+        self.stats = {"requests": 0, "streams": 0, "faults": {}, "prompt_tokens": 0, "completion_tokens": 0,
+                      "in_flight": 0, "max_in_flight": 0}
+
+    def next_id(self):
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    def roll(self):
+        """按配置的概率抽一个故障类型，None 表示正常"""
+        a = self.args
+        with self.lock:
+            x = self.rng.random()
+            jitter = self.rng.uniform(-a.jitter, a.jitter)
+        for fault, rate in (("error", a.error_rate), ("rate_limit", a.rate_limit_rate),
+                            ("timeout", a.timeout_rate), ("malformed", a.malformed_rate)):
+            if x < rate:
+                return fault, jitter
+            x -= rate
+        return None, jitter
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def count_fault(self, fault):
+        with self.lock:
+            self.stats["faults"][fault] = self.stats["faults"].get(fault, 0) + 1
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockLLM/1.0"
+
+    # ---------- 基础 ----------
+    def log_message(self, fmt, *args):
+        if self.server.state.args.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        state = self.server.state
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "deepseek-chat", "object": "model"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            with state.lock:
+                self._send_json(200, {**state.stats, "mock": True, "misclassify_rate": state.args.misclassify_rate})
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        state = self.server.state
+        state.count("requests")
+        with state.lock:
+            state.stats["in_flight"] += 1
+            state.stats["max_in_flight"] = max(state.stats["max_in_flight"], state.stats["in_flight"])
+        try:
+            self._complete(body)
+        finally:
+            state.count("in_flight", -1)
+
+    # ---------- 补全 ----------
+    def _complete(self, body):
+        state = self.server.state
+        args = state.args
+        fault, jitter = state.roll()
+        if fault:
+            state.count_fault(fault)
+
+        time.sleep(max(0.0, args.latency / 1000 * (1 + jitter)))
+        if fault == "error":
+            self._send_json(500, {"error": {"message": "mock: injected server error", "type": "server_error"}})
+            return
+        if fault == "rate_limit":
+            self._send_json(429, {"error": {"message": "mock: rate limit reached", "type": "rate_limit_error"}},
+                            headers={"Retry-After": "1"})
+            return
+        if fault == "timeout":
+            # 挂住不回，直到客户端超时断开
+            time.sleep(args.hang_seconds)
+            self.close_connection = True
+            return
+
+        reply = build_reply(body, state.rules, args.misclassify_rate, args.seed)
+        n = state.next_id()
+        tool_calls = [
+            {"id": f"call_{n}_{i}", "type": "function",
+             "function": {"name": c["name"], "arguments": json.dumps(c.get("arguments", {}), ensure_ascii=False)}}
+            for i, c in enumerate(reply.get("tool_calls") or [])
+        ]
+        content = reply.get("content")
+        if fault == "malformed" and content is not None:
+            content = content[: max(1, len(content) // 2)]   # 截断：JSON 解析会失败
+        if fault == "malformed" and tool_calls:
+            tool_calls[0]["function"]["arguments"] = tool_calls[0]["function"]["arguments"][:-1]
+
+        prompt_tokens = sum(
+            estimate_tokens(content_text(m)) + 4
+            + sum(estimate_tokens(c["function"]["arguments"]) for c in m.get("tool_calls") or [])
+            for m in body.get("messages") or []
+        )
+        completion_tokens = estimate_tokens(content) + sum(
+            estimate_tokens(c["function"]["arguments"]) for c in tool_calls)
+        state.count("prompt_tokens", prompt_tokens)
+        state.count("completion_tokens", completion_tokens)
+        # 和 DeepSeek 一样报告前缀缓存：system prompt 逐字节相同才算命中
+        messages = body.get("messages") or []
+        prefix = content_text(messages[0]) if messages and messages[0].get("role") == "system" else ""
+        with state.lock:
+            cache_hit = prefix in state.seen_prefixes
+            state.seen_prefixes.add(prefix)
+        hit_tokens = estimate_tokens(prefix) if cache_hit else 0
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens,
+                 "prompt_cache_hit_tokens": hit_tokens, "prompt_cache_miss_tokens": prompt_tokens - hit_tokens}
+        meta = {"id": f"chatcmpl-mock-{n}", "created": int(time.time()), "model": body.get("model", "mock")}
+        finish_reason = "tool_calls" if tool_calls else "stop"
+
+        if body.get("stream"):
+            state.count("streams")
+            self._stream(meta, content, tool_calls, finish_reason, usage,
+                         (body.get("stream_options") or {}).get("include_usage"))
+            return
+
+        if args.tokens_per_sec > 0:
+            time.sleep(completion_tokens / args.tokens_per_sec)
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        self._send_json(200, {
+            **meta, "object": "chat.completion",
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage,
+        })
+
+    def _stream(self, meta, content, tool_calls, finish_reason, usage, include_usage):
+        """SSE 流式输出：按 tokens_per_sec 的速度一小段一小段地吐"""
+        rate = self.server.state.args.tokens_per_sec
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def emit(delta, finish=None, extra=None):
+            chunk = {**meta, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            if extra:
+                chunk.update(extra)
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def pace(piece):
+            if rate > 0:
+                time.sleep(estimate_tokens(piece) / rate)
+
+        try:
+            emit({"role": "assistant", "content": ""})
+            for i in range(0, len(content or ""), 4):
+                piece = content[i:i + 4]
+                pace(piece)
+                emit({"content": piece})
+            for index, call in enumerate(tool_calls):
+                emit({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                      "function": {"name": call["function"]["name"], "arguments": ""}}]})
+                arguments = call["function"]["arguments"]
+                for i in range(0, len(arguments), 16):
+                    piece = arguments[i:i + 16]
+                    pace(piece)
+                    emit({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+            emit({}, finish=finish_reason)
+            if include_usage:
+                # 和 OpenAI 一样：最后单独一个 choices 为空、带 usage 的块
+                emit(None, extra={"choices": [], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # 客户端提前断开 (例如取消了流)
+
+# ==========================================
+# 5. 启动
+# ==========================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容的模拟大模型服务 (离线压测 / 性能分析用)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency", type=float, default=LATENCY_MS, help="首 token 前的延迟 (毫秒)")
+    parser.add_argument("--tokens-per-sec", type=float, default=TOKENS_PER_SEC, help="输出速度，0 表示不限速")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="延迟抖动比例，0~1")
+    parser.add_argument("--script", help="规则脚本 (JSON 列表)，命中时优先于内置规则")
+    parser.add_argument("--seed", type=int, default=0, help="抖动和故障注入的随机种子")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="挂起不响应的概率")
+    parser.add_argument("--hang-seconds", type=float, default=60.0, help="模拟超时时挂起多久")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="返回被截断的 JSON / 工具参数的概率")
+    parser.add_argument("--misclassify-rate", type=float, default=0.0,
+                        help="文件整理时故意分错的比例 (按文件名固定)，用来检查整理流程是否原样执行模型的答案")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求的访问日志")
+    return parser.parse_args(argv)
+
+def make_server(args):
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(args)
+    return server
+
+def main():
+    args = parse_args()
+    server = make_server(args)
+    print(f"🧪 模拟大模型服务已启动: http://{args.host}:{args.port}")
+    print(f"   在 .env 里设置 DEEP_SEEK_API_URL = http://{args.host}:{args.port} 即可离线运行各课脚本")
+    print(f"   延迟 {args.latency:.0f}ms | {args.tokens_per_sec:g} tokens/s | "
+          f"故障: 500={args.error_rate} 429={args.rate_limit_rate} 超时={args.timeout_rate} 截断={args.malformed_rate} "
+          f"错分={args.misclassify_rate}")
+    print(f"   统计: GET http://{args.host}:{args.port}/stats ，Ctrl+C 退出")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import json
+import time
+
+# ==========================================
+# 流式结构化输出：边收 JSON 边出字段
+# ==========================================
+# json_object 模式下模型输出的是一个 JSON 对象。等它整段生成完再 json.loads，
+# 用户要一直盯着“正在思考中”；这里逐字符扫描流式返回的片段，
+# 顶层的某个字段一写完就立刻交给调用方显示，最后再整体做 Pydantic 校验。
+
+class StreamingJSONParser:
+    """
+    增量解析一个 JSON 对象，feed() 返回新产生的事件：
+    - ("field", key, value)：顶层字段已经完整 (嵌套的对象/数组整体作为一个值)
+    - ("delta", key, text)：顶层字符串字段新增的文字，用于打字机效果
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.phase = None          # 顶层对象内：key / colon / value / after
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.value_is_string = False
+        self.sent = 0              # 当前字符串字段已经作为 delta 发出去的字数
+        self.done = False
+
+    def feed(self, chunk):
+        events = []
+        self.buf += chunk
+        for i in range(self.pos, len(self.buf)):
+            if self.done:
+                break
+            self._step(i, self.buf[i], events)
+        self.pos = len(self.buf)
+        if self.in_string and self.phase == "value" and self.value_is_string:
+            self._emit_delta(events)
+        return events
+
+    def _step(self, i, c, events):
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif c == "\\":
+                self.escape = True
+            elif c == '"':
+                self.in_string = False
+                if self.depth == 1 and self.phase == "key":
+                    self.key = json.loads(self.buf[self.key_start:i + 1])
+                    self.phase = "colon"
+                elif self.depth == 1 and self.phase == "value":
+                    self._emit_delta(events, end=i)
+                    self._emit_field(events, i + 1)
+            return
+
+        if c == '"':
+            self.in_string = True
+            if self.depth == 1 and self.phase == "key":
+                self.key_start = i
+            elif self.depth == 1 and self.phase == "value":
+                self.value_start, self.value_is_string, self.sent = i, True, 0
+        elif c in "{[":
+            self.depth += 1
+            if self.depth == 1:
+                self.phase = "key"
+            elif self.depth == 2 and self.phase == "value":
+                self.value_start = i
+        elif c in "}]":
+            self.depth -= 1
+            if self.depth == 0:
+                self._finish_scalar(events, i)
+                self.done = True
+            elif self.depth == 1 and self.phase == "value":
+                self._emit_field(events, i + 1)
+        elif self.depth == 1:
+            if c == ":" and self.phase == "colon":
+                self.phase, self.value_start, self.value_is_string = "value", None, False
+            elif c == ",":
+                self._finish_scalar(events, i)
+                self.phase = "key"
+            elif self.phase == "value" and self.value_start is None and not c.isspace():
+                self.value_start = i   # 数字 / true / false / null 的开头
+
+    def _finish_scalar(self, events, end):
+        """数字之类的值没有结束符，遇到逗号或右括号才算写完"""
+        if self.phase == "value" and self.value_start is not None:
+            self._emit_field(events, end)
+
+    def _emit_field(self, events, end):
+        events.append(("field", self.key, json.loads(self.buf[self.value_start:end])))
+        self.phase = "after"
+        self.value_start = None
+
+    def _emit_delta(self, events, end=None):
+        raw = self.buf[self.value_start + 1:end]
+        # 末尾可能是写了一半的转义 (\ 或 \u12)，先不解码这一截
+        cut = raw.rfind("\\")
+        if end is None and cut != -1 and (len(raw) - cut < 2 or (raw[cut + 1] == "u" and len(raw) - cut < 6)):
+            raw = raw[:cut]
+        try:
+            text = json.loads(f'"{raw}"')
+        except ValueError:
+            return
+        if end is None and text and "\ud800" <= text[-1] <= "\udbff":
+            text = text[:-1]   # 😀 这样的代理对只收到前一半，等下一段再一起发
+        if len(text) > self.sent:
+            events.append(("delta", self.key, text[self.sent:]))
+            self.sent = len(text)
+
+    def close(self):
+        """流结束：返回完整解析的对象；JSON 不完整会抛 ValueError"""
+        return json.loads(self.buf)
+
+def openai_content(stream):
+    """把 OpenAI SDK 的流式响应转换成纯文本片段"""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def stream_structured(chunks, model=None, on_field=None, on_delta=None, start=None):
+    """
+    消费文本片段，字段一完整就回调 on_field(key, value)，字符串字段生成中回调 on_delta(key, text)。
+    结束后用 Pydantic 模型 model 校验 (不传则返回字典)，校验失败抛 ValidationError。
+    返回 (结果, 计时)，计时以 start (默认为调用时刻，建议传发请求前的 perf_counter) 为起点：
+    first_token_ms、first_field_ms、fields_ms (每个字段完成的时刻)、total_ms。
+    """
+    start = time.perf_counter() if start is None else start
+    parser = StreamingJSONParser()
+    timings = {"first_token_ms": None, "first_field_ms": None, "fields_ms": {}, "total_ms": None}
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if timings["first_token_ms"] is None:
+            timings["first_token_ms"] = (time.perf_counter() - start) * 1000
+        for kind, key, value in parser.feed(chunk):
+            if kind == "delta":
+                if on_delta:
+                    on_delta(key, value)
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            if timings["first_field_ms"] is None:
+                timings["first_field_ms"] = elapsed
+            timings["fields_ms"][key] = elapsed
+            if on_field:
+                on_field(key, value)
+
+    data = parser.close()
+    timings["total_ms"] = (time.perf_counter() - start) * 1000
+    return (model.model_validate(data) if model else data), timings